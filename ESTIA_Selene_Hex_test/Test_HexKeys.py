@@ -1,10 +1,14 @@
-import pandas as pd
 import pyads
 import time
 import sys
+import csv
 from motionFunctionsLib import *
 import math
 import argparse
+from resultJournal import ResultJournal, loadJournal, applyJournal, writeTable
+from campaignCheckpoint import CampaignCheckpoint, fileHash
+from axisGroup import AxisGroup
+from homingOrchestrator import HomingOrchestrator
 
 AMSNetId='5.82.112.102.1.1'
 rotationVelocity=60
@@ -34,27 +38,67 @@ parser.add_argument('-m', '--manual',
                     action='store_true',     
                     help='Activate manual mode')
 
-args = parser.parse_args()
-
-############################################################################
-#Preparing pandas data
-hexScrews = pd.read_csv('HexKeysPos.txt', header=None)
-hexScrews.columns = ['X-Axis6','Z-Axis7']
-hexScrews['Range-Axis10']='0'
-hexScrews['Range-Axis11']='0'
-print(hexScrews)
+parser.add_argument('--keep-order',
+                    default=False,
+                    action='store_true',
+                    help='Test the positions in file order instead of the fastest route for axes 6 and 7')
+
+parser.add_argument('--journal',
+                    default='HexKeysResults.csv',
+                    metavar='FILE',
+                    help='Append the result of every position to FILE (default HexKeysResults.csv)')
+
+parser.add_argument('--resume',
+                    default=False,
+                    action='store_true',
+                    help='Continue the last campaign from its first position without a result in the journal, if axes 8 to 11 were not homed again or moved since')
+
+parser.add_argument('--checkpoint',
+                    default='HexKeysCheckpoint.json',
+                    metavar='FILE',
+                    help='Checkpoint of the campaign used by --resume (default HexKeysCheckpoint.json)')
+
+parser.add_argument('--symbols',
+                    default='HexKeysSymbols.json',
+                    metavar='FILE',
+                    help='Keep the PLC symbol table in FILE so it is only uploaded after a PLC change (default HexKeysSymbols.json)')
+
+parser.add_argument('--homing-state',
+                    default='HexKeysHoming.json',
+                    metavar='FILE',
+                    help='Positions of the homed axes 8 to 11 at the end of the last run, axes that did not move are not homed again unless a hex key is not fully out (default HexKeysHoming.json)')
+
+parser.add_argument('--rehome',
+                    default=False,
+                    action='store_true',
+                    help='Home axes 8 to 11 even if they are still homed since the last run')
+
+parser.add_argument('--telemetry',
+                    default=None,
+                    metavar='DIR',
+                    help='Record position, velocity, errors and limits of axes 6 to 11 at 1 kHz to DIR (see telemetryRecorder.py)')
 
-Axis6Pos = hexScrews['X-Axis6']
-print(f'{Axis6Pos} \n')
+parser.add_argument('--simulate',
+                    default=None,
+                    nargs='?',
+                    const='',
+                    metavar='HOST:PORT',
+                    help='Run against the simulated PLC, in process or on HOST:PORT (see simulatedPlc.py)')
 
-Axis7Pos = hexScrews['Z-Axis7']
-print(f'{Axis7Pos} \n')
+args = parser.parse_args()
+if args.resume and args.rehome:
+    parser.error("--rehome would change the homing the campaign to resume was measured with")
 
-rangeAxis10 = hexScrews['Range-Axis10']
-print(f'{rangeAxis10} \n')
+############################################################################
+#Reading the positions, pandas is only imported for the table of results at the end
+with open('HexKeysPos.txt', newline='') as f:
+    hexScrews = [(float(row[0]), float(row[1])) for row in csv.reader(f) if row]
 
-rangeAxis11 = hexScrews['Range-Axis11']
-print(f'{rangeAxis11} \n')
+Axis6Pos = [x for x, _ in hexScrews]
+Axis7Pos = [z for _, z in hexScrews]
+print(f'{"":>4} {"X-Axis6":>10} {"Z-Axis7":>10}')
+for index, (x, z) in enumerate(hexScrews):
+    print(f'{index:>4} {x:>10} {z:>10}')
 
 #Position index accoridng to option top, bottom or everything
 screwArrayTop = []
@@ -111,9 +155,23 @@ else:
     positionsIndex = screwArrayTotal
 
 print(f'Array of positions to be tested {positionsIndex}')
+
+#Every result is appended to the journal as soon as it is measured
+journal = ResultJournal(args.journal)
 ############################################################################
 #PLC connection
-plc1=plc(plcAmsNetId=AMSNetId, plcPort=852)
+if args.simulate is None:
+    plc1=plc(plcAmsNetId=AMSNetId, plcPort=852, symbolManifest=args.symbols)
+else:
+    from simulatedPlc import hexTestRig, SimulatedConnection, RemoteSimulatedConnection
+    if args.simulate:
+        simHost, simPort = args.simulate.rsplit(':', 1)
+        simConnection = RemoteSimulatedConnection(simHost, int(simPort))
+    else:
+        simConnection = SimulatedConnection(hexTestRig())
+    plc1=plc(plcAmsNetId=AMSNetId, plcPort=852, connection=simConnection, symbolManifest=args.symbols)
+    #The simulated plc resets bExecute when it takes a command
+    plc1.executeResetByPlc=True
 plc1.connect()
 
 #Axis objects
@@ -123,6 +181,63 @@ axis8=axis(plc1, axisNum=8)
 axis9=axis(plc1, axisNum=9)
 axis10=axis(plc1, axisNum=10)
 axis11=axis(plc1, axisNum=11)
+#Axes 6 and 7 position the hex keys together
+axes6n7=AxisGroup([axis6, axis7])
+#Axes 8 to 11 insert and rotate the hex keys, their homing is part of the checkpoint
+axes8to11=AxisGroup([axis8, axis9, axis10, axis11])
+POSITIONING_TIMEOUT = 600  # s
+
+if args.telemetry:
+    from telemetryRecorder import TelemetryRecorder
+    recorder = TelemetryRecorder(plc1, [axis6, axis7, axis8, axis9, axis10, axis11], args.telemetry)
+    recorder.start()
+
+#Records bHomed and the position of axes 8 to 11 in a checkpoint
+def recordHoming(campaignCheckpoint):
+    status = axes8to11.readStatus()
+    for member in axes8to11.axes:
+        campaignCheckpoint.recordHoming(
+            member.axisNum, status[member]["stStatus.bHomed"], status[member]["stStatus.fActPosition"])
+
+#Checkpoint of this campaign, the finished positions are the ones in the journal
+checkpoint = CampaignCheckpoint(
+    AMSNetId, plc1.getDeviceInfo(), fileHash('HexKeysPos.txt'),
+    10 if args.eight else 11 if args.nine else None, positionsIndex)
+recordHoming(checkpoint)
+if args.resume:
+    lastCheckpoint = CampaignCheckpoint.load(args.checkpoint)
+    if lastCheckpoint is None:
+        print(f"    ERROR: No campaign to resume in {args.checkpoint}")
+        sys.exit()
+    #The ranges of the remaining positions are only comparable without a new homing in between
+    mismatches = lastCheckpoint.mismatches(
+        checkpoint, {member.axisNum: member.getAxisTargetPositionWindow() for member in axes8to11.axes})
+    if mismatches:
+        print(f"    ERROR: The campaign in {args.checkpoint} was run on a different rig, setup or homing:")
+        for mismatch in mismatches:
+            print(f"      {mismatch}")
+        sys.exit()
+    checkpoint = lastCheckpoint
+    positionsIndex = checkpoint.remainingPositions(loadJournal(args.journal))
+    print(f'Resuming the campaign started {checkpoint.started}, '
+          f'{len(checkpoint.positionsIndex) - len(positionsIndex)} of {len(checkpoint.positionsIndex)} positions done')
+    print(f'Array of positions to be tested {positionsIndex}')
+
+elif not args.keep_order:
+    #Order the positions to minimise the positioning time of axes 6 and 7
+    from routePlanner import planRoute
+    positionsOrder, plannedTime, fileOrderTime = planRoute(
+        [axis6.getActPos(), axis7.getActPos()],
+        [[Axis6Pos[k] for k in positionsIndex], [Axis7Pos[k] for k in positionsIndex]],
+        [axis6.getMoveProfileParameters(), axis7.getMoveProfileParameters()])
+    positionsIndex = [positionsIndex[k] for k in positionsOrder]
+    print(f'Route planned for axes 6 and 7: {plannedTime:.1f}s of positioning instead of {fileOrderTime:.1f}s, '
+          f'{fileOrderTime - plannedTime:.1f}s saved')
+    print(f'Array of positions to be tested {positionsIndex}')
+
+if not args.resume:
+    checkpoint.positionsIndex = positionsIndex
+    checkpoint.save(args.checkpoint)
 
 ############################################################################
 #Functions to be used
@@ -140,40 +255,29 @@ def manualMode(manual=args.manual, skipPosition=False):
         return 
 
 
-def waitForAxis6n7inPosition():
-    inPosition = False
-    i = 0
-    timeout = 100000
-    while not inPosition:
-        if axis6.getErrorStatus():
-            print(f"   ERROR while positionnig axis 6")
-            print(f"   ERROR ID: {axis6.getErrorId()}")
-            return False
-        elif axis7.getErrorStatus():
-            print(f"   ERROR while positionnig axis 7")
-            print(f"   ERROR ID: {axis7.getErrorId()}")
-            return False
-        elif i == timeout:
-            print(f"   TIMEOUT: position never reached")
-            return False
-        inPosition = axis6.getInTargetPosition() and axis7.getInTargetPosition()
-        time.sleep(1)
-        i = i + 1
-    if inPosition:
-        print(f" Axes 6 and 7 are in target position")
-        return True
+def waitForAxis6n7inPosition(expectedDuration=None):
+    # One sum read per poll for both axes, the errors are printed per axis
+    timeout = POSITIONING_TIMEOUT if expectedDuration is None else expectedDuration*MOVE_TIME_MARGIN+MOVE_TIME_SLACK
+    if not axes6n7.waitForCommandDone(timeoutDoneTrue=timeout, expectedDuration=expectedDuration):
+        print(f"   ERROR while positioning axes 6 and 7")
+        return False
+    if not axes6n7.waitForAllInTarget(timeout=POSITIONING_TIMEOUT):
+        print(f"   TIMEOUT: position never reached")
+        return False
+    print(f" Axes 6 and 7 are in target position")
+    return True
 
 def axis8and9fullyOut():
-    if (plc1.connection.read_by_name("Hex_Screw_States_8_9.bHexScrewFullyOut8", pyads.PLCTYPE_BOOL)
-     and plc1.connection.read_by_name("Hex_Screw_States_8_9.bHexScrewFullyOut9", pyads.PLCTYPE_BOOL)):
+    if (plc1.readByName("Hex_Screw_States_8_9.bHexScrewFullyOut8", pyads.PLCTYPE_BOOL)
+     and plc1.readByName("Hex_Screw_States_8_9.bHexScrewFullyOut9", pyads.PLCTYPE_BOOL)):
         return True
     else:
         axis8.moveAbsolute(28)
         axis9.moveAbsolute(28)
         fullyOutState = False
-        sleep.time(2)
-        if (plc1.connection.read_by_name("Hex_Screw_States_8_9.bHexScrewInserted8", pyads.PLCTYPE_BOOL)\
-        or plc1.connection.read_by_name("Hex_Screw_States_8_9.bHexScrewInserted9", pyads.PLCTYPE_BOOL)):
+        time.sleep(2)
+        if (plc1.readByName("Hex_Screw_States_8_9.bHexScrewInserted8", pyads.PLCTYPE_BOOL)\
+        or plc1.readByName("Hex_Screw_States_8_9.bHexScrewInserted9", pyads.PLCTYPE_BOOL)):
             print("ERROR: axis 8 or 9 stuck and cannot go fully out")
             print("Fix the proble and press enter to continue")
             manualMode()
@@ -181,15 +285,15 @@ def axis8and9fullyOut():
             axis8.home()
             axis9.home()
         while not fullyOutState:
-            fullyOutState = (plc1.connection.read_by_name("Hex_Screw_States_8_9.bHexScrewFullyOut8", pyads.PLCTYPE_BOOL) 
-                         and plc1.connection.read_by_name("Hex_Screw_States_8_9.bHexScrewFullyOut9", pyads.PLCTYPE_BOOL))
+            fullyOutState = (plc1.readByName("Hex_Screw_States_8_9.bHexScrewFullyOut8", pyads.PLCTYPE_BOOL) 
+                         and plc1.readByName("Hex_Screw_States_8_9.bHexScrewFullyOut9", pyads.PLCTYPE_BOOL))
         if fullyOutState:
             return True
         else: 
             return False
 
 def insertAxis8():
-    if not plc1.connection.read_by_name("Hex_Screw_States_8_9.bHexScrewFulluOut8", pyads.PLCTYPE_BOOL):
+    if not plc1.readByName("Hex_Screw_States_8_9.bHexScrewFullyOut8", pyads.PLCTYPE_BOOL):
         axis8and9fullyOut()
 
     print(f"Axis 8 in position: {axis8.getActPos()}")
@@ -201,21 +305,21 @@ def insertAxis8():
         if axis8.getErrorStatus():
             print(f'   ERROR. axis 8 has error ID = {axis8.getErrorId()}')
             return False
-    if plc1.connection.read_by_name("Hex_Screw_States_8_9.bHexScrewInserted8", pyads.PLCTYPE_BOOL):
+    if plc1.readByName("Hex_Screw_States_8_9.bHexScrewInserted8", pyads.PLCTYPE_BOOL):
         print(f"Hex Screw Axis 8 fully inserted")
         return True
-    elif plc1.connection.read_by_name("Hex_Screw_States_8_9.bHexScrewCollided8", pyads.PLCTYPE_BOOL):
+    elif plc1.readByName("Hex_Screw_States_8_9.bHexScrewCollided8", pyads.PLCTYPE_BOOL):
         print(f"Hex screw Axis 8 in Collided state")
         while tries <= retries:
             axis10.moveRelativeAndWait(30)
-            if plc1.connection.read_by_name("Hex_Screw_States_8_9.bHexScrewInserted8", pyads.PLCTYPE_BOOL):
+            if plc1.readByName("Hex_Screw_States_8_9.bHexScrewInserted8", pyads.PLCTYPE_BOOL):
                 print(f"Hex screw Axis 8 fully inserted")
                 return True
             else:
                 tries = tries + 1
         print(f"   ERROR Axis 8 still in collision state after 5 tries ")
         return False
-    elif plc1.connection.read_by_name("Hex_Screw_States_8_9.bHexScrewMissed8", pyads.PLCTYPE_BOOL):
+    elif plc1.readByName("Hex_Screw_States_8_9.bHexScrewMissed8", pyads.PLCTYPE_BOOL):
         print(f"Axis 8 missed, move to a hex screw insert posiiton")
         return False
     else:
@@ -223,7 +327,7 @@ def insertAxis8():
         return False
 
 def insertAxis9():
-    if not plc1.connection.read_by_name("Hex_Screw_States_8_9.bHexScrewFulluOut9", pyads.PLCTYPE_BOOL):
+    if not plc1.readByName("Hex_Screw_States_8_9.bHexScrewFullyOut9", pyads.PLCTYPE_BOOL):
         axis8and9fullyOut()
 
     print(f"Axis 9 in position: {axis9.getActPos()}")
@@ -235,22 +339,22 @@ def insertAxis9():
         if axis9.getErrorStatus():
             print(f'   ERROR. axis 9 has error ID = {axis9.getErrorId()}')
             return False
-    if plc1.connection.read_by_name("Hex_Screw_States_8_9.bHexScrewInserted9", pyads.PLCTYPE_BOOL):
+    if plc1.readByName("Hex_Screw_States_8_9.bHexScrewInserted9", pyads.PLCTYPE_BOOL):
 
         print(f"Hex Screw Axis 9 fully inserted")
         return True
-    elif plc1.connection.read_by_name("Hex_Screw_States_8_9.bHexScrewCollided9", pyads.PLCTYPE_BOOL):
+    elif plc1.readByName("Hex_Screw_States_8_9.bHexScrewCollided9", pyads.PLCTYPE_BOOL):
         print(f"Hex screw Axis 9 in Collided state")
         while tries <= retries:
             axis10.moveRelativeAndWait(30)
-            if plc1.connection.read_by_name("Hex_Screw_States_8_9.bHexScrewInserted9", pyads.PLCTYPE_BOOL):
+            if plc1.readByName("Hex_Screw_States_8_9.bHexScrewInserted9", pyads.PLCTYPE_BOOL):
                 print(f"Hex screw Axis 9 fully inserted")
                 return True
             else:
                 tries = tries + 1
         print(f"   ERROR Axis 9 still in collision state after 5 tries ")
         return False
-    elif plc1.connection.read_by_name("Hex_Screw_States_8_9.bHexScrewMissed9", pyads.PLCTYPE_BOOL):
+    elif plc1.readByName("Hex_Screw_States_8_9.bHexScrewMissed9", pyads.PLCTYPE_BOOL):
         print(f"Axis 9 missed, move to a hex screw insert posiiton")
         return False
     else:
@@ -339,43 +443,31 @@ def fullRotationAxis11():
     return totalRange
 ############################################################################
 # Initialization
-# Homing axes 8 and 9
+# Homing axes 8 and 9 and, once they are out, axes 10 and 11
 print(f"    INITIALIZING TEST")
-print(f"  Homing axes 8 and 9")
+if initAxes([axis8, axis9, axis10, axis11]):
+    print(f"    ERROR: Cannot initialise axes 8 to 11")
+    sys.exit()
+# Axes 10 and 11 only rotate once the hex keys are fully out, homed isn't enough
+homing = HomingOrchestrator(
+    [axis8, axis9, axis10, axis11],
+    {axis10: [axis8, axis9], axis11: [axis8, axis9]},
+    args.homing_state,
+    clearConditions={
+        axis8: lambda: plc1.readByName("Hex_Screw_States_8_9.bHexScrewFullyOut8", pyads.PLCTYPE_BOOL),
+        axis9: lambda: plc1.readByName("Hex_Screw_States_8_9.bHexScrewFullyOut9", pyads.PLCTYPE_BOOL),
+    })
+print(f"  Homing axes 8, 9, 10 and 11")
 manualMode()
-axis8.axisInit()
-axis8.home()
-axis9.axisInit()
-axis9.home()
-
-if axis8.waitForStatusBit(axis8.getHomedStatus, True) and axis9.waitForStatusBit(axis9.getHomedStatus, True):
-    print(f"Axis 8 and 9 homed")
+if homing.run(force=args.rehome):
+    print(f"Axis 8, 9, 10 and 11 homed")
+    recordHoming(checkpoint)
+    checkpoint.save(args.checkpoint)
     manualMode()
-elif not axis8.getHomedStatus():
-    print(f"    ERROR:  Axis 8 cannot be homed")
-    sys.exit()
-elif not axis9.getHomedStatus():
-    print(f"    ERROR:  Axis 9 cannot be homed")
-    sys.exit()
 else:
-    print(f"    ERROR: when homing")
+    print(f"    ERROR: Cannot home axis {', '.join(str(member.axisNum) for member in homing.outcome.failed())}")
     sys.exit()
 
-
-# Homing axis 10 and 11
-axis10.axisInit()
-axis11.axisInit()
-if not axis10.getHomedStatus() or not axis11.getHomedStatus():
-    axis10.home()
-    axis11.home()
-    time.sleep(1)
-    if axis10.getHomedStatus() and axis11.getHomedStatus():
-        print(f"Axis 10 and 11 homed")
-        manualMode()
-    else:
-        print(f"   ERROR: Cannot home axis 10 or 11")
-        sys.exit()
-
 #Hex screws test sequence
 
 print(f"    Hex position testing ready to begin")
@@ -389,10 +481,11 @@ for i in range(len(positionsIndex)):
     if manualMode(skipPosition=True):
         i=i+1
     else:
-        axis6.moveAbsolute(Axis6Pos[positionsIndex[i]])
-        axis7.moveAbsolute(Axis7Pos[positionsIndex[i]])
+        #Both axes arrive together, the shorter move runs slower
+        expectedDuration = axes6n7.moveAbsoluteSynchronised(
+            [Axis6Pos[positionsIndex[i]], Axis7Pos[positionsIndex[i]]])
     
-        if waitForAxis6n7inPosition():
+        if waitForAxis6n7inPosition(expectedDuration):
             manualSkip = False
             time.sleep(0.5)
             manualMode()
@@ -404,11 +497,11 @@ for i in range(len(positionsIndex)):
                     manualMode()
                     totalRange10=fullRotationAxis10()
                     if totalRange10 is 0:
-                        hexScrews.loc[positionsIndex[i],'Range-Axis10']="FAIL"
+                        journal.append(positionsIndex[i], 10, failure="end not reached")
                         print("Range measurmenet FAILED. Press enter to go to next position")
                         manualMode()
                     else:
-                        hexScrews.loc[positionsIndex[i],'Range-Axis10']=totalRange10
+                        journal.append(positionsIndex[i], 10, totalRange10)
                         print("Going to the middle point ")
                         manualMode()
                         middlePoint10=totalRange10/2
@@ -416,10 +509,10 @@ for i in range(len(positionsIndex)):
                         print("Going to the next position")
                         manualMode()
                 else:
-                    hexScrews.loc[positionsIndex[i],'Range-Axis10']="FAIL"
+                    journal.append(positionsIndex[i], 10, failure="hex key not inserted")
                     print("Range measurmenet FAILED. Press enter to go to next position")
                     manualMode()
-            elif arg.nine:
+            elif args.nine:
                 print("Ready to insert Hex key")
                 manualMode()
                 if insertAxis9():
@@ -427,11 +520,11 @@ for i in range(len(positionsIndex)):
                     manualMode()
                     totalRange11=fullRotationAxis11()
                     if totalRange11 is 0:
-                        hexScrews.loc[positionsIndex[i],'Range-Axis11']="FAIL"
+                        journal.append(positionsIndex[i], 11, failure="end not reached")
                         print("Range measurmenet FAILED. Press enter to go to next position")
                         manualMode()
                     else:
-                        hexScrews.loc[positionsIndex[i],'Range-Axis11']=totalRange11
+                        journal.append(positionsIndex[i], 11, totalRange11)
                         print("Going to the middle point")
                         manualMode()
                         middlePoint11=totalRange11/2
@@ -439,11 +532,26 @@ for i in range(len(positionsIndex)):
                         print("Going to the next position")
                         manualMode()
                 else:
-                    hexScrews.loc[positionsIndex[i],'Range-Axis11']="FAIL"
+                    journal.append(positionsIndex[i], 11, failure="hex key not inserted")
                     print("Range measurmenet FAILED. Press enter to go to next position")
                     manualMode()
             else:
                 print( f"ERROR: No axis selected for the approach")
-        hexScrews.to_csv("HexKeysPosWithRotation.txt", mode='w+') #try using just +
+        elif args.eight or args.nine:
+            journal.append(positionsIndex[i], 10 if args.eight else 11, failure="axes 6 and 7 not in position")
+
+    #Where axes 8 to 11 stand after this position, to be checked by --resume
+    recordHoming(checkpoint)
+    checkpoint.save(args.checkpoint)
+        #Add catch keyboard interrupt and stop all motors.
+
+#The table of the results of this campaign is rebuilt from the journal once at the end
+journal.close()
+homing.saveState()
+import pandas as pd
+resultTable = pd.DataFrame({'X-Axis6': Axis6Pos, 'Z-Axis7': Axis7Pos, 'Range-Axis10': '0', 'Range-Axis11': '0'})
+applyJournal(resultTable, loadJournal(args.journal), since=checkpoint.started)
+writeTable(resultTable, "HexKeysPosWithRotation.txt")
 
-        #Add catch keyboard interrupt and stop all motors.
\ No newline at end of file
+if args.telemetry:
+    recorder.stop()
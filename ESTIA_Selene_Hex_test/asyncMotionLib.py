@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+
+"""
+This file contains asyncio versions of the axis and PneumaticAxis classes
+
+The commands are the ones of motionFunctionsLib, the waits are coroutines that
+are woken by the ADS notifications of the plc so several axes can be moved and
+supervised concurrently in one thread. Every blocking ADS call runs in the
+default executor of the event loop, e.g.:
+
+    await asyncio.gather(asyncAxis6.moveAbsoluteAndWait(100), asyncAxis7.moveAbsoluteAndWait(20))
+"""
+import asyncio
+import functools
+import time
+import pyads as pyads
+from motionFunctionsLib import (
+    getterVariable,
+    HandshakeTracker,
+    E_CommandResult,
+    E_HandshakePhase,
+    NOTIFIED_HANDSHAKE_VARIABLES,
+    ST_AxisStatus,
+    MOVE_TIME_MARGIN,
+    MOVE_TIME_SLACK,
+)
+
+# Interval between reads when notifications are not available
+ASYNC_POLL_INTERVAL = 0.05  # s
+
+
+# Runs a blocking function of motionFunctionsLib in the default executor, so
+# its ADS round trips don't hold up the other coroutines
+async def runBlocking(function, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(function, *args))
+
+
+# Waits until predicate(value1, value2, ...) of the variables is True
+# varNamesAndTypes is a list of (varName, plcVarType)
+# Returns True when the condition is met and False on timeout
+async def waitForCondition(plcConnection, varNamesAndTypes, predicate, timeout):
+    loop = asyncio.get_running_loop()
+    varNames = [varName for varName, _ in varNamesAndTypes]
+    changed = asyncio.Event()
+
+    def listener(varName, value):
+        if varName in varNames:
+            loop.call_soon_threadsafe(changed.set)
+
+    notified = plcConnection.useNotifications and await runBlocking(lambda: all(
+        plcConnection.subscribe(varName, plcVarType) for varName, plcVarType in varNamesAndTypes
+    ))
+    if notified:
+        plcConnection.notificationListeners.append(listener)
+
+    timeLimit = loop.time() + timeout
+    try:
+        while True:
+            changed.clear()
+            if notified:
+                with plcConnection.notificationCondition:
+                    values = [plcConnection.notifiedValues.get(varName) for varName in varNames]
+                    ready = all(varName in plcConnection.notifiedValues for varName in varNames)
+            else:
+                values = await runBlocking(plcConnection.readMany, varNames)
+                ready = True
+            if ready and predicate(*values):
+                return True
+
+            remaining = timeLimit - loop.time()
+            if remaining <= 0:
+                return False
+            if not notified:
+                remaining = min(remaining, ASYNC_POLL_INTERVAL)
+            try:
+                await asyncio.wait_for(changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        if notified:
+            plcConnection.notificationListeners.remove(listener)
+
+
+# Same as waitForCondition for the variable behind a getter, e.g. axis6.getDoneStatus
+# A getter that doesn't read one variable is called in the executor every
+# ASYNC_POLL_INTERVAL instead
+async def waitForGetter(plcConnection, getFunction, predicate, timeout):
+    variable = getterVariable(getFunction)
+    if variable is not None:
+        plcVarPath, plcVarType = variable
+        return await waitForCondition(
+            plcConnection, [(getFunction.__self__.varName(plcVarPath), plcVarType)], predicate, timeout
+        )
+    loop = asyncio.get_running_loop()
+    timeLimit = loop.time() + timeout
+    while True:
+        if predicate(await runBlocking(getFunction)):
+            return True
+        remaining = timeLimit - loop.time()
+        if remaining <= 0:
+            return False
+        await asyncio.sleep(min(remaining, ASYNC_POLL_INTERVAL))
+
+
+class AsyncAxis:
+    def __init__(self, axisObj):
+        self.axis = axisObj
+        self.plc = axisObj.plc
+        self.axisNum = axisObj.axisNum
+
+    ###Motion commands###
+    # The commands return as soon as they are written, use the waits to follow them
+    async def moveAbsolute(self, position):
+        await runBlocking(self.axis.moveAbsolute, position)
+
+    async def moveRelative(self, position):
+        await runBlocking(self.axis.moveRelative, position)
+
+    async def moveVelocity(self, velocity):
+        await runBlocking(self.axis.moveVelocity, velocity)
+
+    async def home(self):
+        await runBlocking(self.axis.home)
+
+    async def haltAxis(self):
+        await runBlocking(self.axis.haltAxis)
+
+    # Return the CommandOutcome of waitForCommandDone, which is True only if the
+    # move is done. A move time that can't be estimated (-1 or inf) gives the
+    # default timeout of HandshakeTracker
+    async def moveAbsoluteAndWait(self, position):
+        expectedDuration = await runBlocking(self.axis.calcTravelTimeForPosition, position, 1)
+        await runBlocking(self.axis.moveAbsolute, position)
+        return await self.waitForCommandDone(
+            timeoutDoneTrue=expectedDuration * MOVE_TIME_MARGIN + MOVE_TIME_SLACK, targetPosition=position)
+
+    async def moveRelativeAndWait(self, position):
+        startPosition = await runBlocking(self.axis.getActPos)
+        expectedDuration = await runBlocking(self.axis.calcTravelTimeForPosition, startPosition + position, 1)
+        await runBlocking(self.axis.moveRelative, position)
+        return await self.waitForCommandDone(
+            timeoutDoneTrue=expectedDuration * MOVE_TIME_MARGIN + MOVE_TIME_SLACK,
+            targetPosition=startPosition + position)
+
+    ###Waits###
+    # Same as axis.waitForStatusBit, e.g. await asyncAxis6.waitForStatusBit(axis6.getHomedStatus, True)
+    async def waitForStatusBit(self, getStatusBitFunction, boolValue, timeout=30):
+        if timeout < 0:
+            timeout = 1
+        if not await waitForGetter(
+            self.plc, getStatusBitFunction, lambda statusBit: statusBit == boolValue, timeout
+        ):
+            print(
+                f"  Axis {self.axisNum}: Timeout error waiting for {getStatusBitFunction.__name__} to return {boolValue}"
+            )
+            return False
+        return True
+
+    # Same as axis.waitForCommandDone: a HandshakeTracker follows bDone low, then
+    # bBusy high, then bDone high from the notifications of the handshake
+    # variables, or from one status snapshot every ASYNC_POLL_INTERVAL
+    # Returns a CommandOutcome, which is True only if the command is done
+    async def waitForCommandDone(self, timeoutDoneFalse=5, timeoutBusyTrue=5, timeoutDoneTrue=30, targetPosition=None):
+        targetPositionWindow = 0.0
+        if targetPosition is not None:
+            targetPositionWindow = await runBlocking(self.axis.getAxisTargetPositionWindow)
+        tracker = HandshakeTracker(
+            timeoutDoneFalse,
+            timeoutBusyTrue,
+            timeoutDoneTrue,
+            targetPosition,
+            targetPositionWindow,
+            self.axis.getActPos,
+            self.plc.executeResetByPlc,
+            self.plc.commandLatency,
+        )
+        notified = self.plc.useNotifications and await runBlocking(lambda: all(
+            self.plc.subscribe(self.axis.varName(plcVarPath), plcVarType)
+            for plcVarPath, plcVarType in NOTIFIED_HANDSHAKE_VARIABLES.items()
+        ))
+        if notified:
+            outcome = await self.trackCommandByNotification(tracker)
+        else:
+            outcome = await self.trackCommandByPolling(tracker)
+        self.axis.reportCommandOutcome(outcome, tracker)
+        return outcome
+
+    # Feeds every notified change of NOTIFIED_HANDSHAKE_VARIABLES to the tracker in order
+    async def trackCommandByNotification(self, tracker):
+        loop = asyncio.get_running_loop()
+        plcVarPaths = {self.axis.varName(plcVarPath): plcVarPath for plcVarPath in NOTIFIED_HANDSHAKE_VARIABLES}
+        changes = asyncio.Queue()
+
+        def listener(varName, value):
+            if varName in plcVarPaths:
+                loop.call_soon_threadsafe(changes.put_nowait, (plcVarPaths[varName], value))
+
+        self.plc.notificationListeners.append(listener)
+        try:
+            status = {
+                plcVarPath: self.plc.getNotifiedValue(varName)
+                for varName, plcVarPath in plcVarPaths.items()
+            }
+            if None in status.values():
+                status.update(zip(
+                    NOTIFIED_HANDSHAKE_VARIABLES,
+                    await runBlocking(self.axis.getGenericVariables, list(NOTIFIED_HANDSHAKE_VARIABLES))))
+            while True:
+                # The tracker would read the position itself to recognise a
+                # command that ran between two notifications
+                if tracker.phase == E_HandshakePhase.eWaitDoneLow and tracker.targetPosition is not None:
+                    status["stStatus.fActPosition"] = await runBlocking(self.axis.getActPos)
+                now = time.monotonic()
+                outcome = tracker.update(status, now)
+                if outcome is not None:
+                    # The notification of nErrorID can come after the one of bError
+                    if outcome.result == E_CommandResult.eError and not outcome.errorId:
+                        outcome.errorId = await runBlocking(self.axis.getErrorId)
+                    return outcome
+                # Wake up now and then to look for a command that finished unnoticed
+                try:
+                    plcVarPath, value = await asyncio.wait_for(
+                        changes.get(), max(min(tracker.timeLeft(now), self.plc.pollIntervalMax), 0))
+                    status[plcVarPath] = value
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.plc.notificationListeners.remove(listener)
+
+    # Feeds one status snapshot every ASYNC_POLL_INTERVAL to the tracker
+    async def trackCommandByPolling(self, tracker):
+        while True:
+            snapshot = await runBlocking(self.axis.getStatusSnapshot)
+            now = time.monotonic()
+            outcome = tracker.update(
+                {f"stStatus.{name}": getattr(snapshot, name) for name, _ in ST_AxisStatus._fields_}, now)
+            if outcome is not None:
+                return outcome
+            await asyncio.sleep(max(min(ASYNC_POLL_INTERVAL, tracker.timeLeft(now)), 0))
+
+    async def waitForStop(self, timeout=30, roundVelDecimalPlaces=2):
+        if timeout < 0:
+            timeout = 1
+        if not await waitForCondition(
+            self.plc,
+            [
+                (self.axis.varName("stStatus.fActVelocity"), pyads.PLCTYPE_LREAL),
+                (self.axis.varName("stStatus.bMoving"), pyads.PLCTYPE_BOOL),
+            ],
+            lambda actVel, moving: round(actVel, roundVelDecimalPlaces) == 0 or not moving,
+            timeout,
+        ):
+            print(
+                f"  Axis {self.axisNum} Error: Timeout of {timeout} exceeded waiting for velocity to be zero"
+            )
+            return False
+        return True
+
+
+class AsyncPneumaticAxis:
+    def __init__(self, pneumaticAxisObj):
+        self.pneumaticAxis = pneumaticAxisObj
+        self.plc = pneumaticAxisObj.plc
+        self.axisNum = pneumaticAxisObj.axisNum
+
+    ###Motion commands###
+    async def extend(self):
+        timeout = await runBlocking(self.pneumaticAxis.getTimeToExtend)
+        await runBlocking(self.pneumaticAxis.extendPneumaticAxis)
+        await self.waitForExtended(timeoutExtended=timeout)
+        return await runBlocking(self.pneumaticAxis.getExtendedStatus)
+
+    async def retract(self):
+        timeout = await runBlocking(self.pneumaticAxis.getTimeToRetract)
+        await runBlocking(self.pneumaticAxis.retractPneumaticAxis)
+        await self.waitForRetracted(timeoutRetracted=timeout)
+        return await runBlocking(self.pneumaticAxis.getRetractedStatus)
+
+    ###Waits###
+    async def waitForStatusBit(self, getStatusBitFunction, boolValue, timeout=30):
+        if timeout < 0:
+            timeout = 1
+        if not await waitForGetter(
+            self.plc, getStatusBitFunction, lambda statusBit: statusBit == boolValue, timeout
+        ):
+            print(
+                f"  Axis {self.axisNum}: Timeout error waiting for {getStatusBitFunction.__name__} to return {boolValue}"
+            )
+            return False
+        return True
+
+    async def waitForExtended(self, timeoutExtended=30, timeoutRetractedFalse=3, timeoutExtending=3):
+        if not await self.waitForStatusBit(
+            self.pneumaticAxis.getRetractedStatus, False, timeout=timeoutRetractedFalse
+        ):
+            print(
+                f"  Axis {self.axisNum} Error: bRetracted status did not go low within {timeoutRetractedFalse} seconds"
+            )
+            return False
+        if not await self.waitForStatusBit(
+            self.pneumaticAxis.getExtendingStatus, True, timeout=timeoutExtending
+        ):
+            print(
+                f"  Axis {self.axisNum} Error: bExtending status did not go high within {timeoutExtending} seconds"
+            )
+            return False
+        if not await self.waitForStatusBit(
+            self.pneumaticAxis.getExtendedStatus, True, timeout=timeoutExtended
+        ):
+            print(
+                f"  Axis {self.axisNum} Error: bExtended status did not go high within {timeoutExtended} seconds"
+            )
+            return False
+        return True
+
+    async def waitForRetracted(self, timeoutRetracted=30, timeoutExtendedFalse=3, timeoutRetracting=3):
+        if not await self.waitForStatusBit(
+            self.pneumaticAxis.getExtendedStatus, False, timeout=timeoutExtendedFalse
+        ):
+            print(
+                f"  Axis {self.axisNum} Error: bExtended status did not go low within {timeoutExtendedFalse} seconds"
+            )
+            return False
+        if not await self.waitForStatusBit(
+            self.pneumaticAxis.getRetractingStatus, True, timeout=timeoutRetracting
+        ):
+            print(
+                f"  Axis {self.axisNum} Error: bRetracting status did not go high within {timeoutRetracting} seconds"
+            )
+            return False
+        if not await self.waitForStatusBit(
+            self.pneumaticAxis.getRetractedStatus, True, timeout=timeoutRetracted
+        ):
+            print(
+                f"  Axis {self.axisNum} Error: bRetracted status did not go high within {timeoutRetracted} seconds"
+            )
+            return False
+        return True
@@ -0,0 +1,439 @@
+#!/usr/bin/env python
+
+"""
+This file contains AxisGroup, a set of axes and pneumatic axes commanded together
+
+A command goes to every member in one ADS sum write and the waits read the
+status of every member in one sum read per poll, so a group operation takes as
+long as its slowest member whatever the number of members, e.g.:
+
+    axes8n9 = AxisGroup([axis8, axis9])
+    axes8n9.home()
+    outcome = axes8n9.waitForCommandDone(timeoutDoneTrue=60)
+    if not outcome:
+        print(outcome.failed())
+"""
+import time
+import pyads as pyads
+from enum import Enum
+from motionFunctionsLib import (
+    axis,
+    PneumaticAxis,
+    E_MotionFunctions,
+    E_CommandResult,
+    E_HandshakePhase,
+    CommandOutcome,
+    HandshakeTracker,
+    PollSchedule,
+    handshakeTimeout,
+    HANDSHAKE_VARIABLES,
+    CACHED_AXIS_VARIABLES,
+    AXIS_INIT_TIMEOUT,
+    initAxes,
+    variableLog,
+)
+
+# Variables read from every member on each poll of the group waits
+AXIS_GROUP_STATUS = tuple(HANDSHAKE_VARIABLES) + (
+    "stStatus.bEnabled",
+    "stStatus.bHomed",
+    "stStatus.bInTargetPosition",
+    "stStatus.fActPosition",
+)
+PNEUMATIC_GROUP_STATUS = (
+    "stPneumaticAxisStatus.bExtending",
+    "stPneumaticAxisStatus.bRetracting",
+    "stPneumaticAxisStatus.bExtended",
+    "stPneumaticAxisStatus.bRetracted",
+    "stPneumaticAxisStatus.bError",
+)
+
+
+# Member predicates, given a member and its status from AxisGroup.readStatus
+def isDone(member, status):
+    if isinstance(member, PneumaticAxis):
+        return not status["stPneumaticAxisStatus.bExtending"] \
+            and not status["stPneumaticAxisStatus.bRetracting"]
+    return status["stStatus.bDone"]
+
+
+def hasError(member, status):
+    if isinstance(member, PneumaticAxis):
+        return status["stPneumaticAxisStatus.bError"]
+    return status["stStatus.bError"]
+
+
+# Pneumatic axes are in target at either end
+def isInTarget(member, status):
+    if isinstance(member, PneumaticAxis):
+        return status["stPneumaticAxisStatus.bExtended"] or status["stPneumaticAxisStatus.bRetracted"]
+    return status["stStatus.bInTargetPosition"]
+
+
+# CommandOutcome of every member of a group command
+# True only if every member is done
+class GroupOutcome:
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+
+    def __bool__(self):
+        return all(self.outcomes.values())
+
+    def __getitem__(self, member):
+        return self.outcomes[member]
+
+    # Outcomes of the members that are not done
+    def failed(self):
+        return {member: outcome for member, outcome in self.outcomes.items() if not outcome}
+
+    def __repr__(self):
+        outcomes = ", ".join(
+            f"{memberName(member)}: {outcome}" for member, outcome in self.outcomes.items()
+        )
+        return f"GroupOutcome({outcomes})"
+
+
+def memberName(member):
+    if isinstance(member, PneumaticAxis):
+        return f"pneumatic axis {member.axisNum}"
+    return f"axis {member.axisNum}"
+
+
+class AxisGroup:
+    # members is a list of axis and PneumaticAxis objects of the same plc
+    def __init__(self, members):
+        self.members = list(members)
+        if not self.members:
+            raise ValueError("An axis group needs at least one member")
+        self.plc = self.members[0].plc
+        if any(member.plc is not self.plc for member in self.members):
+            raise ValueError("The members of an axis group have to be on the same plc")
+        self.axes = [member for member in self.members if isinstance(member, axis)]
+        self.pneumaticAxes = [member for member in self.members if isinstance(member, PneumaticAxis)]
+        # (member, plcVarPath, varName) of the status read by readStatus
+        self.statusVariables = [
+            (member, plcVarPath, member.varName(plcVarPath))
+            for member in self.members
+            for plcVarPath in (
+                PNEUMATIC_GROUP_STATUS if isinstance(member, PneumaticAxis) else AXIS_GROUP_STATUS
+            )
+        ]
+        # Status of the last poll of a wait, {member: {plcVarPath: value}}
+        self.lastStatus = {}
+        # Target positions of the last move of each axis, used by waitForCommandDone
+        self.targetPositions = {}
+        # Status bit each pneumatic axis has to reach after extend/retract
+        self.pneumaticTargets = {}
+        # (velocity, acceleration, deceleration) of the axes running a scaled
+        # profile of moveAbsoluteSynchronised, written back by restoreProfiles
+        self.ownProfiles = {}
+
+    def __iter__(self):
+        return iter(self.members)
+
+    def __len__(self):
+        return len(self.members)
+
+    def __repr__(self):
+        return f"AxisGroup({', '.join(memberName(member) for member in self.members)})"
+
+    ###Writes###
+    # Writes variables of any members in one sum write, in the given order
+    # memberWrites is a list of (member, plcVarPath, value, plcVarType)
+    def writeMembers(self, memberWrites):
+        writes = []
+        for member, plcVarPath, plcVarValue, plcVarType in memberWrites:
+            plcVarName = member.varName(plcVarPath)
+            if isinstance(plcVarValue, Enum):
+                variableLog.write(plcVarName, plcVarValue.name)
+                plcVarValue = plcVarValue.value
+            else:
+                variableLog.write(plcVarName, plcVarValue)
+            writes.append((plcVarName, plcVarValue, plcVarType))
+        self.plc.writeMany(writes)
+        for (member, plcVarPath, _, _), (_, plcVarValue, _) in zip(memberWrites, writes):
+            if isinstance(member, axis) and plcVarPath in CACHED_AXIS_VARIABLES:
+                member.parameterCache.set(plcVarPath, plcVarValue)
+
+    # Values per axis member from a dict {axis: value} or a list in the order of the axes
+    def axisValues(self, values):
+        if isinstance(values, dict):
+            return [(member, values[member]) for member in self.axes if member in values]
+        values = list(values)
+        if len(values) != len(self.axes):
+            raise ValueError(f"{len(values)} values for {len(self.axes)} axes")
+        return list(zip(self.axes, values))
+
+    # Parameters, eCommand and the bExecute edge of every axis in one sum write
+    # parameters is {axis: [(plcVarPath, value, plcVarType), ...]}, axes without
+    # an entry are given the command without parameters.
+    # Only the axes in parameters get the command if onlyParameterAxes is True
+    def executeCommand(self, command, parameters=None, onlyParameterAxes=False):
+        parameters = parameters or {}
+        memberWrites = []
+        for member in self.axes:
+            if onlyParameterAxes and member not in parameters:
+                continue
+            for plcVarPath, plcVarValue, plcVarType in parameters.get(member, ()):
+                memberWrites.append((member, plcVarPath, plcVarValue, plcVarType))
+            memberWrites.append((member, "stControl.eCommand", command, pyads.PLCTYPE_INT))
+            memberWrites.append((member, "stControl.bExecute", True, pyads.PLCTYPE_BOOL))
+        self.writeMembers(memberWrites)
+
+    # Writes the same variable to every axis
+    def setAxesVariable(self, plcVarPath, plcVarValue, plcVarType):
+        self.writeMembers([(member, plcVarPath, plcVarValue, plcVarType) for member in self.axes])
+
+    def setPneumaticAxesVariable(self, plcVarPath, plcVarValue, plcVarType):
+        self.writeMembers([(member, plcVarPath, plcVarValue, plcVarType) for member in self.pneumaticAxes])
+
+    ###Commands###
+    # Disables, resets and enables the axes, see initAxes
+    # Returns the axes that didn't acknowledge a step within timeout
+    def init(self, timeout=AXIS_INIT_TIMEOUT):
+        return initAxes(self.axes, timeout)
+
+    def enable(self):
+        self.setAxesVariable("stControl.bEnable", True, pyads.PLCTYPE_BOOL)
+
+    def disable(self):
+        self.setAxesVariable("stControl.bEnable", False, pyads.PLCTYPE_BOOL)
+
+    def reset(self):
+        self.setAxesVariable("stControl.bReset", True, pyads.PLCTYPE_BOOL)
+
+    def halt(self):
+        self.setAxesVariable("stControl.bHalt", True, pyads.PLCTYPE_BOOL)
+
+    def stop(self):
+        self.setAxesVariable("stControl.bStop", True, pyads.PLCTYPE_BOOL)
+
+    def home(self):
+        print(f"{self}: Home")
+        for member in self.axes:
+            self.targetPositions.pop(member, None)
+        self.executeCommand(E_MotionFunctions.eHome)
+
+    # positions is {axis: position} or a list in the order of the axes
+    # Only the axes given a position move
+    def moveAbsolute(self, positions):
+        axisPositions = self.axisValues(positions)
+        print(f"{self}: Move absolute to " + ", ".join(
+            f"{member.axisNum}: {position:.2f}" for member, position in axisPositions))
+        self.targetPositions.update(axisPositions)
+        self.executeCommand(
+            E_MotionFunctions.eMoveAbsolute,
+            {member: [("stControl.fPosition", position, pyads.PLCTYPE_LREAL)]
+             for member, position in axisPositions},
+            onlyParameterAxes=True,
+        )
+
+    # distances is {axis: distance} or a list in the order of the axes
+    def moveRelative(self, distances):
+        axisDistances = self.axisValues(distances)
+        print(f"{self}: Move relative by " + ", ".join(
+            f"{member.axisNum}: {distance:.2f}" for member, distance in axisDistances))
+        for member, _ in axisDistances:
+            self.targetPositions.pop(member, None)
+        self.executeCommand(
+            E_MotionFunctions.eMoveRelative,
+            {member: [("stControl.fPosition", distance, pyads.PLCTYPE_LREAL)]
+             for member, distance in axisDistances},
+            onlyParameterAxes=True,
+        )
+
+    # Absolute move after which the axes arrive together: the move takes as long
+    # as the slowest axis at its own profile and the others run their profiles
+    # scaled to that time (see moveProfile.synchronisationScales).
+    # The scaled velocity, acceleration and deceleration go out with the command,
+    # waitForCommandDone writes the own ones back once the move is over.
+    # Returns the expected duration of the move
+    def moveAbsoluteSynchronised(self, positions):
+        # NumPy is only imported once a move time is needed, see moveProfile
+        from moveProfile import moveTimes, synchronisationScales
+        axisPositions = self.axisValues(positions)
+        self.restoreProfiles()
+        status = self.readStatus()
+        startPositions = [status[member]["stStatus.fActPosition"] for member, _ in axisPositions]
+        finalPositions = [position for _, position in axisPositions]
+        profiles = [member.getMoveProfileParameters() for member, _ in axisPositions]
+        velocity, acceleration, deceleration, jerk = zip(*profiles)
+        times = moveTimes(startPositions, finalPositions, velocity, acceleration, deceleration, jerk)
+        duration = float(times.max())
+        if duration == float("inf"):
+            print(f"  {self} Error: no move time without velocity, acceleration and deceleration, "
+                  f"moving without synchronisation")
+            self.moveAbsolute(dict(axisPositions))
+            return None
+        scales = synchronisationScales(
+            [final - start for start, final in zip(startPositions, finalPositions)],
+            velocity, acceleration, deceleration, jerk, duration)
+
+        print(f"{self}: Synchronised move absolute in {duration:.2f}s to " + ", ".join(
+            f"{member.axisNum}: {position:.2f}" for member, position in axisPositions))
+        parameters = {}
+        for (member, position), profile, scale in zip(axisPositions, profiles, scales):
+            parameters[member] = [("stControl.fPosition", position, pyads.PLCTYPE_LREAL)]
+            if scale != 1:
+                ownVelocity, ownAcceleration, ownDeceleration, _ = profile
+                # Written back as set, an acceleration or deceleration of 0 stays 0
+                self.ownProfiles[member] = (
+                    member.getVelocity(), member.getAcceleration(), member.getDeceleration())
+                parameters[member] += [
+                    ("stControl.fVelocity", ownVelocity / scale, pyads.PLCTYPE_LREAL),
+                    ("stControl.fAcceleration", ownAcceleration / scale**2, pyads.PLCTYPE_LREAL),
+                    ("stControl.fDeceleration", ownDeceleration / scale**2, pyads.PLCTYPE_LREAL),
+                ]
+        self.targetPositions.update(axisPositions)
+        self.executeCommand(E_MotionFunctions.eMoveAbsolute, parameters, onlyParameterAxes=True)
+        return duration
+
+    # Writes the own profiles back to the axes scaled by moveAbsoluteSynchronised
+    def restoreProfiles(self):
+        memberWrites = []
+        for member, (velocity, acceleration, deceleration) in self.ownProfiles.items():
+            memberWrites += [
+                (member, "stControl.fVelocity", velocity, pyads.PLCTYPE_LREAL),
+                (member, "stControl.fAcceleration", acceleration, pyads.PLCTYPE_LREAL),
+                (member, "stControl.fDeceleration", deceleration, pyads.PLCTYPE_LREAL),
+            ]
+        if memberWrites:
+            self.writeMembers(memberWrites)
+        self.ownProfiles.clear()
+
+    def extend(self):
+        for member in self.pneumaticAxes:
+            self.pneumaticTargets[member] = "stPneumaticAxisStatus.bExtended"
+        self.setPneumaticAxesVariable("stPneumaticAxisControl.bExtend", True, pyads.PLCTYPE_BOOL)
+
+    def retract(self):
+        for member in self.pneumaticAxes:
+            self.pneumaticTargets[member] = "stPneumaticAxisStatus.bRetracted"
+        self.setPneumaticAxesVariable("stPneumaticAxisControl.bRetract", True, pyads.PLCTYPE_BOOL)
+
+    ###Status###
+    # Status of every member in one sum read, {member: {plcVarPath: value}}
+    def readStatus(self):
+        values = self.plc.readMany([varName for _, _, varName in self.statusVariables])
+        status = {member: {} for member in self.members}
+        for (member, plcVarPath, _), value in zip(self.statusVariables, values):
+            status[member][plcVarPath] = value
+        self.lastStatus = status
+        return status
+
+    # Error IDs of the members in error at the last poll, {member: errorId}
+    # Pneumatic axes have no error ID and report 0
+    def errors(self):
+        return {
+            member: memberStatus.get("stStatus.nErrorID", 0)
+            for member, memberStatus in self.lastStatus.items()
+            if hasError(member, memberStatus)
+        }
+
+    ###Waits###
+    # Polls the status of all members until predicate(status) is True
+    # Returns True when it is met and False on timeout, lastStatus has the status
+    def waitUntil(self, predicate, timeout=30, sleepInterval=None, expectedDuration=None):
+        return self.plc.pollFor(
+            lambda: predicate(self.readStatus()), timeout, sleepInterval, expectedDuration)
+
+    # True when every member is done, False on timeout or as soon as a member has an error
+    def waitForAllDone(self, timeout=30, sleepInterval=None, expectedDuration=None):
+        return self.waitForAll(isDone, timeout, sleepInterval, expectedDuration)
+
+    # True when every member is in its target position, False on timeout or error
+    def waitForAllInTarget(self, timeout=30, sleepInterval=None, expectedDuration=None):
+        return self.waitForAll(isInTarget, timeout, sleepInterval, expectedDuration)
+
+    # True as soon as a member has an error, see errors(), False on timeout
+    def waitForAnyError(self, timeout=30, sleepInterval=None):
+        return self.waitUntil(
+            lambda status: any(hasError(member, status[member]) for member in self.members),
+            timeout, sleepInterval)
+
+    def waitForAll(self, memberPredicate, timeout, sleepInterval=None, expectedDuration=None):
+        def predicate(status):
+            return any(hasError(member, status[member]) for member in self.members) or all(
+                memberPredicate(member, status[member]) for member in self.members)
+
+        if not self.waitUntil(predicate, timeout, sleepInterval, expectedDuration):
+            return False
+        return not self.errors()
+
+    # Follows the last command of every member to its end with one sum read per
+    # poll: the eCommand/bExecute handshake of the axes (see HandshakeTracker)
+    # and the end switch bit of the pneumatic axes after extend/retract.
+    # Returns a GroupOutcome with the CommandOutcome of every member
+    def waitForCommandDone(
+        self,
+        timeoutDoneFalse=5,
+        timeoutBusyTrue=5,
+        timeoutDoneTrue=30,
+        sleepInterval=None,
+        expectedDuration=None,
+    ):
+        trackers = {}
+        for member in self.axes:
+            targetPosition = self.targetPositions.get(member)
+            trackers[member] = HandshakeTracker(
+                timeoutDoneFalse,
+                timeoutBusyTrue,
+                timeoutDoneTrue,
+                targetPosition,
+                member.getAxisTargetPositionWindow() if targetPosition is not None else 0.0,
+                member.getActPos,
+                self.plc.executeResetByPlc,
+                self.plc.commandLatency,
+            )
+        if self.pneumaticAxes:
+            timeoutDoneTrue = handshakeTimeout(timeoutDoneTrue, E_HandshakePhase.eWaitDoneHigh)
+        startTime = time.monotonic()
+        schedule = None
+        if sleepInterval is None:
+            schedule = PollSchedule(
+                expectedDuration, self.plc.pollIntervalMin, self.plc.pollIntervalMax, self.plc.pollLeadTime
+            )
+
+        outcomes = {}
+        while True:
+            status = self.readStatus()
+            now = time.monotonic()
+            for member, tracker in trackers.items():
+                if member not in outcomes:
+                    outcome = tracker.update(status[member], now)
+                    if outcome is not None:
+                        outcomes[member] = outcome
+            for member in self.pneumaticAxes:
+                if member not in outcomes:
+                    outcome = self.pneumaticOutcome(member, status[member], now - startTime, timeoutDoneTrue)
+                    if outcome is not None:
+                        outcomes[member] = outcome
+            if len(outcomes) == len(self.members):
+                break
+            timeLeft = min(
+                [tracker.timeLeft(now) for member, tracker in trackers.items() if member not in outcomes]
+                + [startTime + timeoutDoneTrue - now]
+            )
+            interval = sleepInterval if schedule is None else schedule.nextInterval(now)
+            if interval > 0:
+                time.sleep(max(min(interval, timeLeft), 0))
+
+        self.restoreProfiles()
+        groupOutcome = GroupOutcome({member: outcomes[member] for member in self.members})
+        for member, outcome in groupOutcome.failed().items():
+            if outcome.result == E_CommandResult.eError:
+                print(f"  {memberName(member)} Error: command failed with error ID {outcome.errorId:#x}")
+            else:
+                print(f"  {memberName(member)} Error: command {outcome.result.name[1:].lower()}")
+        return groupOutcome
+
+    def pneumaticOutcome(self, member, status, elapsed, timeout):
+        phase = E_HandshakePhase.eWaitDoneHigh
+        if status["stPneumaticAxisStatus.bError"]:
+            return CommandOutcome(E_CommandResult.eError, phase, 0, elapsed)
+        target = self.pneumaticTargets.get(member)
+        if (status[target] if target is not None else isDone(member, status)):
+            return CommandOutcome(E_CommandResult.eDone, phase, 0, elapsed)
+        if elapsed >= timeout:
+            return CommandOutcome(E_CommandResult.eTimeout, phase, 0, elapsed)
+        return None
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+"""
+This file contains the checkpoint of a hex key campaign
+
+The checkpoint records which rig, positions file and axis a campaign runs with,
+the order of its positions and whether the axes the ranges are measured with
+are homed and where they stand. Which positions are finished is taken from the
+result journal (see resultJournal.py), so a campaign can be resumed from the
+first position without a result, as long as the axes weren't homed again or
+moved in between.
+"""
+import os
+import json
+import hashlib
+from datetime import datetime
+
+
+# SHA-256 of a file, to notice when the positions file changed
+def fileHash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class CampaignCheckpoint:
+    # Fields that have to match for a campaign to be resumed
+    RIG_FIELDS = ("amsNetId", "deviceInfo", "positionsHash", "axisNum")
+
+    def __init__(self, amsNetId, deviceInfo, positionsHash, axisNum, positionsIndex, started=None, homing=None):
+        self.amsNetId = amsNetId
+        self.deviceInfo = deviceInfo
+        self.positionsHash = positionsHash
+        self.axisNum = axisNum
+        self.positionsIndex = [int(position) for position in positionsIndex]
+        self.started = started or datetime.now().isoformat(timespec="milliseconds")
+        # {str(axisNum): {"homed": bHomed, "position": fActPosition}}
+        self.homing = homing or {}
+
+    # Replaces the checkpoint file atomically
+    def save(self, path):
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.__dict__, f, indent=1)
+        os.replace(path + ".tmp", path)
+
+    # Returns None if there is no checkpoint
+    @staticmethod
+    def load(path):
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return CampaignCheckpoint(**json.load(f))
+
+    def recordHoming(self, axisNum, homed, position):
+        self.homing[str(axisNum)] = {"homed": bool(homed), "position": float(position)}
+
+    # Descriptions of the rig fields and homing states that differ from other,
+    # empty if it's the same rig and its axes weren't homed again or moved.
+    # positionWindows is {axisNum: tolerance of the position}
+    def mismatches(self, other, positionWindows=None):
+        mismatches = [
+            f"{field}: {getattr(self, field)} instead of {getattr(other, field)}"
+            for field in self.RIG_FIELDS
+            if getattr(self, field) != getattr(other, field)
+        ]
+        positionWindows = positionWindows or {}
+        for axisNum, state in self.homing.items():
+            otherState = other.homing.get(axisNum)
+            if otherState is None:
+                mismatches.append(f"axis {axisNum}: homing state not recorded")
+            elif state["homed"] != otherState["homed"]:
+                mismatches.append(f"axis {axisNum}: homed {state['homed']} instead of {otherState['homed']}")
+            elif state["homed"] and \
+                    abs(state["position"] - otherState["position"]) > positionWindows.get(int(axisNum), 0):
+                mismatches.append(
+                    f"axis {axisNum}: position {state['position']:.3f} instead of {otherState['position']:.3f}")
+        return mismatches
+
+    # Positions of the campaign in order that have no result in the journal
+    # records is a DataFrame of resultJournal.loadJournal, failed positions
+    # count as finished since their failure has been recorded
+    def remainingPositions(self, records):
+        finished = set(
+            records.loc[
+                (records["axis"] == self.axisNum) & (records["timestamp"] >= self.started),
+                "position",
+            ]
+        )
+        return [position for position in self.positionsIndex if position not in finished]
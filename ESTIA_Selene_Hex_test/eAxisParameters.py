@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 from enum import *
+from collections import namedtuple
 
 class E_AxisParameters(Enum):
     # PLCopen specific parameters Index-Group 0x4000 + ID
@@ -129,3 +130,127 @@ class E_AxisParameters(Enum):
     # new since 1/2011
     NcSafCycleTime = 4000  # lreal IndexOffset= 16#0000_0010
     NcSvbCycleTime = 4001  # lreal IndexOffset= 16#0000_0012
+
+
+# Index groups of the NC, the ID of the axis has to be added to them
+NC_AXIS_PARAMETER_GROUP = 0x4000
+NC_AXIS_STATE_GROUP = 0x4100  # read only
+NC_AXIS_FUNCTION_GROUP = 0x4200
+
+# ADS address of a NC axis parameter, the same as in the comments of E_AxisParameters
+# dataType is "lreal", "bool" or "dword"; bool and dword are 4 bytes on the NC
+# Parameters are written at their read address unless a write address is given,
+# the ones in NC_AXIS_STATE_GROUP can't be written
+NcParameterAddress = namedtuple(
+    "NcParameterAddress",
+    ["indexGroup", "indexOffset", "dataType", "writeIndexGroup", "writeIndexOffset"],
+    defaults=(None, None),
+)
+
+# The parameters taken from NcToPlc and the NC task parameters (NcSafCycleTime,
+# NcSvbCycleTime) have no axis address and can only be read with eReadParameter
+NC_AXIS_PARAMETER_ADDRESSES = {
+    E_AxisParameters.SWLimitFwd: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_000E, "lreal"),
+    E_AxisParameters.SWLimitBwd: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_000D, "lreal"),
+    E_AxisParameters.EnableLimitFwd: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_000C, "bool"),
+    E_AxisParameters.EnableLimitBwd: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_000B, "bool"),
+    E_AxisParameters.EnablePosLagMonitoring: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0002_0010, "bool"),
+    E_AxisParameters.MaxPositionLag: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0002_0012, "lreal"),
+    E_AxisParameters.AxisMaxVelocity: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0027, "lreal"),
+    E_AxisParameters.AxisDefaultAcceleration: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0101, "lreal"),
+    E_AxisParameters.AxisDefaultDeceleration: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0102, "lreal"),
+    E_AxisParameters.AxisDefaultJerk: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0103, "lreal"),
+    E_AxisParameters.AxisId: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0001, "lreal"),
+    E_AxisParameters.AxisManVelSlow: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0008, "lreal"),
+    E_AxisParameters.AxisManVelFast: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0009, "lreal"),
+    E_AxisParameters.AxisRapidTraverseVelocity: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_000A, "lreal"),
+    E_AxisParameters.AxisVelocityToCam: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0006, "lreal"),
+    E_AxisParameters.AxisVelocityFromCam: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0007, "lreal"),
+    E_AxisParameters.AxisJogIncrementForward: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0018, "lreal"),
+    E_AxisParameters.AxisJogIncrementBackward: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0019, "lreal"),
+    E_AxisParameters.AxisMaxPosLagFilterTime: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0002_0013, "lreal"),
+    E_AxisParameters.AxisEnPositionRangeMonitoring: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_000F, "bool"),
+    E_AxisParameters.AxisPositionRangeWindow: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0010, "lreal"),
+    E_AxisParameters.AxisEnTargetPositionMonitoring: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0015, "bool"),
+    E_AxisParameters.AxisTargetPositionWindow: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0016, "lreal"),
+    E_AxisParameters.AxisTargetPositionMonitoringTime: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0017, "lreal"),
+    E_AxisParameters.AxisEnInTargetTimeout: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0029, "bool"),
+    E_AxisParameters.AxisInTargetTimeout: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_002A, "lreal"),
+    E_AxisParameters.AxisEnMotionMonitoring: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0011, "bool"),
+    E_AxisParameters.AxisMotionMonitoringWindow: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0028, "lreal"),
+    E_AxisParameters.AxisMotionMonitoringTime: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0012, "lreal"),
+    E_AxisParameters.AxisDelayTimeVeloPosition: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0104, "lreal"),
+    E_AxisParameters.AxisEnLoopingDistance: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0013, "bool"),
+    E_AxisParameters.AxisLoopingDistance: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0014, "lreal"),
+    E_AxisParameters.AxisEnBacklashCompensation: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_002B, "bool"),
+    E_AxisParameters.AxisBacklash: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_002C, "lreal"),
+    E_AxisParameters.AxisEnDataPersistence: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0030, "bool"),
+    E_AxisParameters.AxisRefVeloOnRefOutput: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0003_0101, "lreal"),
+    E_AxisParameters.AxisOverrideType: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0105, "lreal"),
+    E_AxisParameters.AxisEncoderOffset: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_0007, "lreal"),
+    E_AxisParameters.AxisEncoderDirectionInverse: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_0008, "bool"),
+    E_AxisParameters.AxisEncoderMask: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_0015, "dword"),
+    E_AxisParameters.AxisEncoderModuloValue: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_0009, "lreal"),
+    E_AxisParameters.AxisModuloToleranceWindow: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_001B, "lreal"),
+    E_AxisParameters.AxisEnablePosCorrection: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_0016, "bool"),
+    E_AxisParameters.AxisPosCorrectionFilterTime: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_0017, "lreal"),
+    E_AxisParameters.AxisUnitInterpretation: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0026, "lreal"),
+    E_AxisParameters.AxisMotorDirectionInverse: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0003_0006, "bool"),
+    E_AxisParameters.AxisCycleTime: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0004, "lreal"),
+    E_AxisParameters.AxisFastStopSignalType: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_001E, "dword"),
+    E_AxisParameters.AxisFastAcc: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_010A, "lreal"),
+    E_AxisParameters.AxisFastDec: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_010B, "lreal"),
+    E_AxisParameters.AxisFastJerk: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_010C, "lreal"),
+    E_AxisParameters.AxisEncoderScalingNumerator: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_0023, "lreal"),
+    E_AxisParameters.AxisEncoderScalingDenominator: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_0024, "lreal"),
+    E_AxisParameters.AxisMaximumAcceleration: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_00F1, "lreal"),
+    E_AxisParameters.AxisMaximumDeceleration: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_00F2, "lreal"),
+    E_AxisParameters.AxisVeloJumpFactor: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0106, "lreal"),
+    E_AxisParameters.AxisToleranceBallAuxAxis: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0108, "lreal"),
+    E_AxisParameters.AxisMaxPositionDeviationAuxAxis: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0109, "lreal"),
+    E_AxisParameters.AxisErrorPropagationMode: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_001A, "dword"),
+    E_AxisParameters.AxisErrorPropagationDelay: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_001B, "lreal"),
+    E_AxisParameters.AxisCoupleSlaveToActualValues: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_001C, "bool"),
+    E_AxisParameters.AxisAllowMotionCmdToSlaveAxis: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0020, "bool"),
+    E_AxisParameters.AxisAllowMotionCmdToExtSetAxis: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0000_0021, "bool"),
+    E_AxisParameters.AxisEncoderSubMask: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_0108, "dword"),
+    E_AxisParameters.AxisEncoderReferenceSystem: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_0019, "dword"),
+    E_AxisParameters.AxisEncoderPositionFilterPT1: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_0010, "lreal"),
+    E_AxisParameters.AxisEncoderVelocityFilterPT1: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_0011, "lreal"),
+    E_AxisParameters.AxisEncoderAccelerationFilterPT1: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_0012, "lreal"),
+    E_AxisParameters.AxisEncoderMode: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_000A, "dword"),
+    E_AxisParameters.AxisEncoderHomingInvDirCamSearch: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_0101, "bool"),
+    E_AxisParameters.AxisEncoderHomingInvDirSyncSearch: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_0102, "bool"),
+    E_AxisParameters.AxisEncoderHomingCalibValue: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_0103, "lreal"),
+    E_AxisParameters.AxisEncoderReferenceMode: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0001_0107, "dword"),
+    E_AxisParameters.AxisRefVeloOutputRatio: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0003_0102, "lreal"),
+    E_AxisParameters.AxisDrivePositionOutputScaling: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0003_0109, "lreal"),
+    E_AxisParameters.AxisDriveVelocityOutputScaling: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0003_0105, "lreal"),
+    E_AxisParameters.AxisDriveVelocityOutputDelay: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0003_010D, "lreal"),
+    E_AxisParameters.AxisDriveMinOutputLimitation: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0003_000B, "lreal"),
+    E_AxisParameters.AxisDriveMaxOutputLimitation: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0003_000C, "lreal"),
+    E_AxisParameters.AxisTorqueInputScaling: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0003_0031, "lreal"),
+    E_AxisParameters.AxisTorqueInputFilterPT1: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0003_0032, "lreal"),
+    E_AxisParameters.AxisTorqueDerivationInputFilterPT1: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0003_0033, "lreal"),
+    E_AxisParameters.AxisTorqueOutputScaling: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0003_010B, "lreal"),
+    E_AxisParameters.AxisTorqueOutputDelay: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0003_010F, "lreal"),
+    E_AxisParameters.AxisAccelerationOutputScaling: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0003_010A, "lreal"),
+    E_AxisParameters.AxisAccelerationOutputDelay: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0003_010E, "lreal"),
+    E_AxisParameters.AxisDrivePositionOutputSmoothFilterType: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0003_0110, "dword"),
+    E_AxisParameters.AxisDrivePositionOutputSmoothFilterTime: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0003_0111, "lreal"),
+    E_AxisParameters.AxisDrivePositionOutputSmoothFilterOrder: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0003_0112, "dword"),
+    E_AxisParameters.AxisDriveMode: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0003_000A, "dword"),
+    E_AxisParameters.AxisDriftCompensationOffset: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0003_0104, "lreal"),
+    E_AxisParameters.AxisPositionControlKv: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0002_0102, "lreal"),
+    E_AxisParameters.AxisCtrlVelocityPreCtrlWeight: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0002_000B, "lreal"),
+    E_AxisParameters.AxisControllerMode: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0002_000A, "dword"),
+    E_AxisParameters.AxisCtrlAutoOffset: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0002_0110, "bool"),
+    E_AxisParameters.AxisCtrlAutoOffsetTimer: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0002_0115, "lreal"),
+    E_AxisParameters.AxisCtrlAutoOffsetLimit: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0002_0114, "lreal"),
+    E_AxisParameters.AxisSlaveCouplingControlKcp: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0002_010F, "lreal"),
+    E_AxisParameters.AxisCtrlOutputLimit: NcParameterAddress(NC_AXIS_PARAMETER_GROUP, 0x0002_0100, "lreal"),
+    E_AxisParameters.AxisTargetPosition: NcParameterAddress(NC_AXIS_STATE_GROUP, 0x0000_0013, "lreal"),
+    E_AxisParameters.AxisRemainingTimeToGo: NcParameterAddress(NC_AXIS_STATE_GROUP, 0x0000_0014, "lreal"),
+    E_AxisParameters.AxisRemainingDistanceToGo: NcParameterAddress(NC_AXIS_STATE_GROUP, 0x0000_0022, "lreal"),
+    E_AxisParameters.AxisGearRatio: NcParameterAddress(NC_AXIS_STATE_GROUP, 0x0000_0022, "lreal", NC_AXIS_FUNCTION_GROUP, 0x0000_0042),
+}
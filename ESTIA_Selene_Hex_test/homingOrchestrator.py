@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+
+"""
+This file contains the homing orchestrator of a set of axes
+
+HomingOrchestrator homes axes in parallel as far as a dependency graph allows,
+e.g. the rotation axes 10 and 11 only after the hex key axes 8 and 9, and
+follows all of them with one sum read per poll. Each axis starts homing as soon
+as the axes it depends on are homed and clear: homed is not enough if e.g. a
+hex key can still be in a screw, so an axis can have a clear condition that has
+to hold as well. Axes that are still homed and stand where they stood at the
+end of the last session (see HomingState) are not homed again, unless they
+aren't clear:
+
+    homing = HomingOrchestrator(
+        [axis8, axis9, axis10, axis11],
+        {axis10: [axis8, axis9], axis11: [axis8, axis9]},
+        clearConditions={axis8: hexKey8FullyOut, axis9: hexKey9FullyOut},
+    )
+    if not homing.run():
+        print(homing.outcome.failed())
+"""
+import os
+import json
+import time
+from datetime import datetime
+from axisGroup import AxisGroup, GroupOutcome, memberName
+from motionFunctionsLib import (
+    E_MotionFunctions,
+    E_CommandResult,
+    E_HandshakePhase,
+    CommandOutcome,
+    HandshakeTracker,
+    PollSchedule,
+)
+
+HOMING_STATE_FILE = "HomingState.json"
+HOMING_TIMEOUT = 120  # s, from the start of the homing of one axis
+# Time an axis has to be clear in after it was homed, before the axes that
+# depend on it are aborted
+HOMING_CLEAR_TIMEOUT = 10  # s
+
+
+# Positions of the homed axes of a plc at the end of the last session
+class HomingState:
+    # Fields that have to match for the positions to be used
+    RIG_FIELDS = ("amsNetId", "deviceInfo")
+
+    def __init__(self, amsNetId, deviceInfo, axes=None):
+        self.amsNetId = amsNetId
+        self.deviceInfo = deviceInfo
+        # {str(axisNum): {"position": fActPosition, "saved": time}}
+        self.axes = axes or {}
+
+    # Replaces the state file atomically
+    def save(self, path):
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.__dict__, f, indent=1)
+        os.replace(path + ".tmp", path)
+
+    # Returns None if there is no state file
+    @staticmethod
+    def load(path):
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return HomingState(**json.load(f))
+
+    def sameRig(self, other):
+        return all(getattr(self, field) == getattr(other, field) for field in self.RIG_FIELDS)
+
+    def record(self, axisNum, position):
+        self.axes[str(axisNum)] = {
+            "position": position,
+            "saved": datetime.now().isoformat(timespec="milliseconds"),
+        }
+
+    def forget(self, axisNum):
+        self.axes.pop(str(axisNum), None)
+
+    # Position of the axis at the end of the last session, None if it wasn't homed
+    def position(self, axisNum):
+        entry = self.axes.get(str(axisNum))
+        return None if entry is None else entry["position"]
+
+
+class HomingOrchestrator:
+    # axes is a list of axis objects of the same plc, dependencies is
+    # {axis: [axes that have to be homed before it]}, clearConditions is
+    # {axis: function returning True once the axes depending on it may move}.
+    # Raises ValueError if a dependency or clear condition isn't for one of
+    # the axes or the graph has a cycle
+    def __init__(self, axes, dependencies=None, statePath=HOMING_STATE_FILE, clearConditions=None):
+        self.group = AxisGroup(axes)
+        self.axes = self.group.axes
+        self.plc = self.group.plc
+        dependencies = dependencies or {}
+        self.dependencies = {member: list(dependencies.get(member, ())) for member in self.axes}
+        for member, required in self.dependencies.items():
+            for dependency in required:
+                if dependency not in self.dependencies:
+                    raise ValueError(f"{memberName(member)} depends on {memberName(dependency)}, which isn't homed here")
+        self.clearConditions = dict(clearConditions or {})
+        for member in self.clearConditions:
+            if member not in self.dependencies:
+                raise ValueError(f"Clear condition for {memberName(member)}, which isn't homed here")
+        self.checkOrder()
+        self.statePath = statePath
+        self.state = None
+        # Axes that were not homed again by the last run
+        self.skipped = []
+        # GroupOutcome of the last run
+        self.outcome = None
+
+    # Raises ValueError if the axes can't be homed in any order
+    def checkOrder(self):
+        ordered = set()
+        remaining = list(self.axes)
+        while remaining:
+            ready = [member for member in remaining if all(d in ordered for d in self.dependencies[member])]
+            if not ready:
+                raise ValueError(
+                    "The homing dependencies of " + ", ".join(memberName(m) for m in remaining) + " form a cycle")
+            ordered.update(ready)
+            remaining = [member for member in remaining if member not in ready]
+
+    # State of the last session, a new one if there is none or it's from another plc
+    def loadState(self):
+        state = HomingState(self.plc.plcAmsNetId, self.plc.getDeviceInfo())
+        lastState = HomingState.load(self.statePath)
+        if lastState is not None and lastState.sameRig(state):
+            state = lastState
+        self.state = state
+        return state
+
+    # Records the positions of the homed axes, to be called at the end of a session
+    def saveState(self, status=None):
+        if self.state is None:
+            self.loadState()
+        if status is None:
+            status = self.group.readStatus()
+        for member in self.axes:
+            if status[member]["stStatus.bHomed"]:
+                self.state.record(member.axisNum, status[member]["stStatus.fActPosition"])
+            else:
+                self.state.forget(member.axisNum)
+        self.state.save(self.statePath)
+
+    # True if the axes depending on member may move, always without a clear condition
+    def isClear(self, member):
+        condition = self.clearConditions.get(member)
+        return condition is None or bool(condition())
+
+    # True if the axis is homed and stands within its target position window of
+    # where it stood at the end of the last session, i.e. the encoder hasn't moved
+    def stillHomed(self, member, status):
+        if not status["stStatus.bHomed"]:
+            return False
+        position = self.state.position(member.axisNum)
+        return position is not None and \
+            abs(status["stStatus.fActPosition"] - position) <= member.getAxisTargetPositionWindow()
+
+    # Homes every axis that isn't still homed and clear (all of them if force),
+    # each as soon as its dependencies are homed and clear, and saves the
+    # positions afterwards. Axes whose dependency failed or wasn't clear within
+    # clearTimeout are not started and get an eAborted outcome.
+    # Returns a GroupOutcome, true if every axis is homed
+    def run(self, force=False, timeout=HOMING_TIMEOUT, timeoutDoneFalse=5, timeoutBusyTrue=5,
+            clearTimeout=HOMING_CLEAR_TIMEOUT):
+        self.loadState()
+        status = self.group.readStatus()
+        self.skipped = []
+        for member in [] if force else self.axes:
+            if not self.stillHomed(member, status[member]):
+                continue
+            if self.isClear(member):
+                self.skipped.append(member)
+            else:
+                print(f"  {memberName(member)} still homed but not clear, homing again")
+        if self.skipped:
+            print("  " + ", ".join(memberName(member) for member in self.skipped)
+                  + " still homed since the last session, not homing again")
+
+        startTime = time.monotonic()
+        outcomes = {member: CommandOutcome(E_CommandResult.eDone, E_HandshakePhase.eWaitDoneLow)
+                    for member in self.skipped}
+        # time.monotonic() when each axis was homed, to time out its clear condition
+        homedTimes = {member: startTime for member in self.skipped}
+        # Homed axes that are clear, and the ones that weren't within clearTimeout
+        cleared = set()
+        notCleared = set()
+        trackers = {}
+        # Axes seen unhomed, a rising bHomed of a started one means its homing is
+        # done even if the whole handshake ran between two polls
+        unhomed = set()
+        # Also paces the polls while axes wait for a dependency to be clear
+        schedule = PollSchedule(None, self.plc.pollIntervalMin, self.plc.pollIntervalMax, self.plc.pollLeadTime)
+        while True:
+            now = time.monotonic()
+            for member, tracker in trackers.items():
+                if member in outcomes:
+                    continue
+                outcome = tracker.update(status[member], now)
+                if outcome is None and member in unhomed and tracker.phase == E_HandshakePhase.eWaitDoneLow \
+                        and status[member]["stStatus.bHomed"] and not status[member]["stStatus.bMoving"]:
+                    outcome = tracker.outcome(E_CommandResult.eDone, now)
+                if outcome and not status[member]["stStatus.bHomed"]:
+                    outcome = tracker.outcome(E_CommandResult.eError, now)
+                if outcome is not None:
+                    outcomes[member] = outcome
+                    homedTimes[member] = now
+                    if outcome:
+                        print(f"  {memberName(member)} homed in {outcome.elapsed:.2f}s")
+                    elif outcome.result == E_CommandResult.eError:
+                        print(f"  {memberName(member)} Error: homing failed with error ID {outcome.errorId:#x}")
+                    else:
+                        print(f"  {memberName(member)} Error: homing {outcome.result.name[1:].lower()}")
+
+            unhomed.update(member for member in self.axes if not status[member]["stStatus.bHomed"])
+            waiting = [member for member in self.axes if member not in outcomes and member not in trackers]
+            # Homed axes some waiting axis depends on and that aren't known to be clear yet
+            for dependency in {d for member in waiting for d in self.dependencies[member]}:
+                if not outcomes.get(dependency) or dependency in cleared or dependency in notCleared:
+                    continue
+                if self.isClear(dependency):
+                    cleared.add(dependency)
+                elif now - homedTimes[dependency] >= clearTimeout:
+                    print(f"  {memberName(dependency)} Error: not clear {clearTimeout}s after homing")
+                    notCleared.add(dependency)
+            ready = []
+            for member in waiting:
+                required = [outcomes.get(dependency) for dependency in self.dependencies[member]]
+                if any(outcome is not None and not outcome for outcome in required):
+                    print(f"  {memberName(member)} Error: not homed, an axis it depends on failed")
+                    outcomes[member] = CommandOutcome(E_CommandResult.eAborted, E_HandshakePhase.eWaitDoneLow)
+                elif any(dependency in notCleared for dependency in self.dependencies[member]):
+                    print(f"  {memberName(member)} Error: not homed, an axis it depends on isn't clear")
+                    outcomes[member] = CommandOutcome(E_CommandResult.eAborted, E_HandshakePhase.eWaitDoneLow)
+                elif all(dependency in cleared for dependency in self.dependencies[member]):
+                    ready.append(member)
+            if ready:
+                print("  Homing " + ", ".join(memberName(member) for member in ready))
+                self.group.executeCommand(
+                    E_MotionFunctions.eHome, {member: [] for member in ready}, onlyParameterAxes=True)
+                for member in ready:
+                    trackers[member] = HandshakeTracker(
+                        timeoutDoneFalse, timeoutBusyTrue, timeout, executeAcknowledged=self.plc.executeResetByPlc)
+                # Polls fast again after the start of a homing
+                schedule = PollSchedule(
+                    None, self.plc.pollIntervalMin, self.plc.pollIntervalMax, self.plc.pollLeadTime)
+
+            if len(outcomes) == len(self.axes):
+                break
+            interval = schedule.nextInterval(time.monotonic())
+            timeLeft = min(
+                [tracker.timeLeft(time.monotonic()) for member, tracker in trackers.items() if member not in outcomes]
+                or [interval]
+            )
+            time.sleep(max(min(interval, timeLeft), 0))
+            status = self.group.readStatus()
+
+        self.outcome = GroupOutcome({member: outcomes[member] for member in self.axes})
+        self.saveState(status)
+        print(f"  Homing finished in {time.monotonic() - startTime:.2f}s")
+        return self.outcome
@@ -8,9 +8,22 @@ It contains functions that interact with tc_mca_std_lib on a Beckhoff PLC.
 import sys, os
 from datetime import datetime
 import pyads as pyads
+from pyads.errorcodes import ERROR_CODES
 import time
+import math
+import ctypes
+import threading
+import collections
+import types
+import queue
 from enum import *
-from eAxisParameters import E_AxisParameters
+from eAxisParameters import (
+    E_AxisParameters,
+    NC_AXIS_PARAMETER_ADDRESSES,
+    NC_AXIS_STATE_GROUP,
+)
+from symbolTable import uploadSymbolTable, symbolTableKey, readSymbolVersion, saveManifest, loadManifest
+from plantState import PlantState, PLANT_STATE_INTERVAL, PLANT_STATE_MAX_AGE
 
 
 class E_MotionFunctions(Enum):
@@ -54,16 +67,609 @@ class E_PneumaticAxisErrors(Enum):
     eNoPSSPermit = 6 
     eAirPressureError = 7 
 
+class E_CommandResult(Enum):
+    eDone = 0
+    eAborted = 1
+    eError = 2
+    eTimeout = 3
+
+# Phases of the eCommand/bExecute handshake: bDone low, bBusy high, bDone high
+class E_HandshakePhase(Enum):
+    eWaitDoneLow = 0
+    eWaitBusyHigh = 1
+    eWaitDoneHigh = 2
+
+# Mirrors ST_AxisStatus of tc_mca_std_lib with the default TwinCAT pack mode
+# Fields behind the last one listed here are simply not read. The layout is
+# checked against the symbol table at connect, see MIRRORED_STRUCTS
+class ST_AxisStatus(ctypes.Structure):
+    _fields_ = [
+        ("bEnabled", ctypes.c_bool),
+        ("bCommandAborted", ctypes.c_bool),
+        ("bBusy", ctypes.c_bool),
+        ("bDone", ctypes.c_bool),
+        ("bHomed", ctypes.c_bool),
+        ("bMoving", ctypes.c_bool),
+        ("bMovingForward", ctypes.c_bool),
+        ("bMovingBackward", ctypes.c_bool),
+        ("bFwEnabled", ctypes.c_bool),
+        ("bBwEnabled", ctypes.c_bool),
+        ("bInterlockedFwd", ctypes.c_bool),
+        ("bInterlockedBwd", ctypes.c_bool),
+        ("bInTargetPosition", ctypes.c_bool),
+        ("bGeared", ctypes.c_bool),
+        ("bCoupledGear1", ctypes.c_bool),
+        ("bCoupledGear2", ctypes.c_bool),
+        ("bCoupledGear3", ctypes.c_bool),
+        ("bCoupledGear4", ctypes.c_bool),
+        ("fActPosition", ctypes.c_double),
+        ("fActVelocity", ctypes.c_double),
+        ("bError", ctypes.c_bool),
+        ("nErrorID", ctypes.c_uint32),
+    ]
+
+
+# Mirrors ST_AxisInputs of tc_mca_std_lib
+class ST_AxisInputs(ctypes.Structure):
+    _fields_ = [
+        ("bLimitFwd", ctypes.c_bool),
+        ("bLimitBwd", ctypes.c_bool),
+        ("bHome", ctypes.c_bool),
+    ]
+
+
+# Mirrors of the structs of ST_PneumaticAxis of the project, they give the
+# types of the PneumaticAxis variables, see PNEUMATIC_AXIS_VARIABLES
+class ST_PneumaticAxisControl(ctypes.Structure):
+    _fields_ = [
+        ("bExtend", ctypes.c_bool),
+        ("bRetract", ctypes.c_bool),
+        ("bInterlock", ctypes.c_bool),
+        ("bReset", ctypes.c_bool),
+    ]
+
+
+class ST_PneumaticAxisStatus(ctypes.Structure):
+    _fields_ = [
+        ("bExtending", ctypes.c_bool),
+        ("bRetracting", ctypes.c_bool),
+        ("bExtended", ctypes.c_bool),
+        ("bRetracted", ctypes.c_bool),
+        ("bSolenoidActive", ctypes.c_bool),
+        ("bInterlocked", ctypes.c_bool),
+        ("bPSSPermitOK", ctypes.c_bool),
+        ("bError", ctypes.c_bool),
+        ("nTimeElapsedExtend", ctypes.c_uint32),
+        ("nTimeElapsedRetract", ctypes.c_uint32),
+        ("sStatus", ctypes.c_char * 81),
+    ]
+
+
+class ST_PneumaticAxisConfig(ctypes.Structure):
+    _fields_ = [
+        ("nTimeToExtend", ctypes.c_int16),
+        ("nTimeToRetract", ctypes.c_int16),
+    ]
+
+
+class ST_PneumaticAxisInputs(ctypes.Structure):
+    _fields_ = [
+        ("bEndSwitchFwd", ctypes.c_bool),
+        ("bEndSwitchBwd", ctypes.c_bool),
+        ("bSolenoidActive", ctypes.c_bool),
+        ("bPSSPermit", ctypes.c_bool),
+        ("bPressureExtend", ctypes.c_bool),
+        ("bPressureRetract", ctypes.c_bool),
+        ("bOpenManual", ctypes.c_bool),
+        ("bCloseManual", ctypes.c_bool),
+        ("nAirPressureValve", ctypes.c_int16),
+        ("nPressureValue", ctypes.c_int16),
+    ]
+
+
+class ST_PneumaticAxisOutputs(ctypes.Structure):
+    _fields_ = [
+        ("bValveOn", ctypes.c_bool),
+        ("bAirPressureOn", ctypes.c_bool),
+    ]
+
+
+class ST_PneumaticAxis(ctypes.Structure):
+    _fields_ = [
+        ("stPneumaticAxisControl", ST_PneumaticAxisControl),
+        ("stPneumaticAxisStatus", ST_PneumaticAxisStatus),
+        ("stPneumaticAxisConfig", ST_PneumaticAxisConfig),
+        ("stPneumaticAxisInputs", ST_PneumaticAxisInputs),
+        ("stPneumaticAxisOutputs", ST_PneumaticAxisOutputs),
+    ]
+
+
+# ctypes mirrors of PLC types by their PLC name. plc.connect refuses a PLC whose
+# symbol table has them laid out differently
+MIRRORED_STRUCTS = {
+    "ST_AxisStatus": ST_AxisStatus,
+    "ST_AxisInputs": ST_AxisInputs,
+    "ST_PneumaticAxisControl": ST_PneumaticAxisControl,
+    "ST_PneumaticAxisStatus": ST_PneumaticAxisStatus,
+    "ST_PneumaticAxisConfig": ST_PneumaticAxisConfig,
+    "ST_PneumaticAxisInputs": ST_PneumaticAxisInputs,
+    "ST_PneumaticAxisOutputs": ST_PneumaticAxisOutputs,
+    "ST_PneumaticAxis": ST_PneumaticAxis,
+}
+
+# Type of every variable of a pneumatic axis by its path in ST_PneumaticAxis,
+# e.g. "stPneumaticAxisStatus.nTimeElapsedExtend": PLCTYPE_UDINT. It is used
+# for variables that aren't in the symbol table, strings are read as PLCTYPE_STRING
+PNEUMATIC_AXIS_VARIABLES = {
+    f"{structName}.{name}": pyads.PLCTYPE_STRING if issubclass(fieldType, ctypes.Array) else fieldType
+    for structName, structType in ST_PneumaticAxis._fields_
+    for name, fieldType in structType._fields_
+}
+
+
+# Immutable copy of stStatus and stInputs of one axis taken in a single read
+# Values are looked up with the same paths the getters use, e.g. "stStatus.bDone"
+class AxisStatusSnapshot:
+    __slots__ = (
+        ("axisNum", "timestamp")
+        + tuple(name for name, _ in ST_AxisStatus._fields_)
+        + tuple(name for name, _ in ST_AxisInputs._fields_)
+    )
+
+    def __init__(self, axisNum, timestamp, status, inputs):
+        object.__setattr__(self, "axisNum", axisNum)
+        object.__setattr__(self, "timestamp", timestamp)
+        for name, _ in ST_AxisStatus._fields_:
+            object.__setattr__(self, name, getattr(status, name))
+        for name, _ in ST_AxisInputs._fields_:
+            object.__setattr__(self, name, getattr(inputs, name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("AxisStatusSnapshot is read only")
+
+    def __delattr__(self, name):
+        raise AttributeError("AxisStatusSnapshot is read only")
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={getattr(self, name)}" for name in self.__slots__)
+        return f"AxisStatusSnapshot({values})"
+
+    def get(self, plcVarPath):
+        structName, _, varName = plcVarPath.partition(".")
+        if structName not in ("stStatus", "stInputs") or varName not in self.__slots__:
+            raise KeyError(f"{plcVarPath} is not part of the status snapshot")
+        return getattr(self, varName)
+
+
 # SLEEP_INTERVAL is the default that the software will sleep while waiting
 # for a bit to change state
 # Most if not all functions can specify this as an optional parameter if you
 # want a different sleep time for one particular function.
 # If not specified this is the default.
 SLEEP_INTERVAL = 1  # s
+# When a wait function is not given a sleepInterval and notifications are not
+# available it polls adaptively between POLL_INTERVAL_MIN and POLL_INTERVAL_MAX:
+# at most every POLL_INTERVAL_MAX until POLL_LEAD_TIME before the expected end
+# of the move, then every POLL_INTERVAL_MIN, backing off by POLL_BACKOFF after it
+POLL_INTERVAL_MIN = 0.02  # s
+POLL_INTERVAL_MAX = SLEEP_INTERVAL
+POLL_LEAD_TIME = 0.2  # s
+POLL_BACKOFF = 1.5
+# ADS errors after which every cached symbol handle has to be fetched again
+# 0x710 symbol not found, 0x711 symbol version invalid (e.g. online change)
+HANDLE_INVALID_ERRORS = (0x710, 0x711)
+# The symbol version is read again before every write by index group/offset and
+# at most this often before reads, see plc.checkSymbolVersion
+SYMBOL_VERSION_CHECK_INTERVAL = 1  # s
+# Time the plc takes at most to take a command written by ADS, two cycles of a
+# 10 ms motion task. An axis standing at the target isn't taken as done before,
+# so an error the plc raises when it takes the command isn't missed
+COMMAND_LATENCY = 0.02  # s
+# read_list_by_name returns the text of the ADS error instead of the value of a
+# variable it couldn't read, this maps the text back to the error code
+ADS_ERROR_CODES_BY_TEXT = {text: code for code, text in sorted(ERROR_CODES.items(), reverse=True)}
+# ctypes of the data types of NC_AXIS_PARAMETER_ADDRESSES
+NC_PARAMETER_TYPES = {
+    "lreal": ctypes.c_double,
+    "bool": ctypes.c_uint32,
+    "dword": ctypes.c_uint32,
+}
 MARGIN_OF_SAFETY = 2
+# Move times are calculated exactly by moveProfile, the timeout of a move only
+# allows MOVE_TIME_MARGIN for the NC and MOVE_TIME_SLACK for the command handshake
+MOVE_TIME_MARGIN = 1.1
+MOVE_TIME_SLACK = 1  # s
+# Time the plc has to acknowledge each step of initAxes
+AXIS_INIT_TIMEOUT = 5  # s
 verboseMode = True
 dateTimeObj = datetime.now()
-prevPrintString = "Empty"
+
+# Levels of the variable log
+LOG_QUIET = 0  # nothing is printed, value transitions are only kept in the ring buffer
+LOG_CHANGES = 1  # reads are printed when the value of the variable changed, writes always
+LOG_ALL = 2  # every read and write is printed
+# Number of transitions kept in the ring buffer of the variable log, 0 to disable it
+LOG_BUFFER_SIZE = 1000
+
+
+# Log of the variables read and written by the axis classes
+# The value of every variable is compared with the last one read of the same
+# variable, so only transitions are printed and recorded. Records are kept as
+# (timestamp, varName, operator, value) and only formatted when printed.
+# A read of an unchanged value costs one dict lookup unless the level is LOG_ALL.
+class VariableLog:
+    def __init__(self, level=LOG_CHANGES, bufferSize=LOG_BUFFER_SIZE):
+        self.level = level
+        self.lastValues = {}
+        self.lock = threading.Lock()
+        # Ring buffer of the latest transitions and writes, None if disabled
+        self.buffer = collections.deque(maxlen=bufferSize) if bufferSize > 0 else None
+
+    def setLevel(self, level):
+        self.level = level
+
+    def setBufferSize(self, bufferSize):
+        with self.lock:
+            if bufferSize <= 0:
+                self.buffer = None
+            else:
+                self.buffer = collections.deque(self.buffer or (), maxlen=bufferSize)
+
+    def read(self, varName, value):
+        if self.lastValues.get(varName) == value:
+            if self.level >= LOG_ALL:
+                self.emit((time.time(), varName, "=:", value))
+            return
+        record = (time.time(), varName, "=:", value)
+        with self.lock:
+            self.lastValues[varName] = value
+            if self.buffer is not None:
+                self.buffer.append(record)
+        if self.level >= LOG_CHANGES:
+            self.emit(record)
+
+    def write(self, varName, value):
+        record = (time.time(), varName, "=", value)
+        with self.lock:
+            if self.buffer is not None:
+                self.buffer.append(record)
+        if self.level >= LOG_CHANGES:
+            self.emit(record)
+
+    # Records of the ring buffer, optionally only those of one variable
+    def records(self, varName=None):
+        with self.lock:
+            records = list(self.buffer or ())
+        if varName is None:
+            return records
+        return [record for record in records if record[1] == varName]
+
+    def clear(self):
+        with self.lock:
+            self.lastValues.clear()
+            if self.buffer is not None:
+                self.buffer.clear()
+
+    @staticmethod
+    def format(record):
+        timestamp, varName, operator, value = record
+        if operator == "=:":
+            return f"{datetime.fromtimestamp(timestamp)} {varName}=: {value}"
+        return f"{datetime.fromtimestamp(timestamp)} {varName}={value}"
+
+    def emit(self, record):
+        print(self.format(record))
+
+    def dump(self, varName=None):
+        for record in self.records(varName):
+            print(self.format(record))
+
+
+# Shared by all axes, e.g. variableLog.setLevel(LOG_QUIET) for tight polling loops
+variableLog = VariableLog()
+
+
+# NC parameters that are also shown in stConfig
+NC_PARAMETER_CONFIG_VARIABLES = {
+    E_AxisParameters.SWLimitFwd: "stConfig.fMaxSoftPosLimit",
+    E_AxisParameters.SWLimitBwd: "stConfig.fMinSoftPosLimit",
+    E_AxisParameters.EnableLimitFwd: "stConfig.bEnMaxSoftPosLimit",
+    E_AxisParameters.EnableLimitBwd: "stConfig.bEnMinSoftPosLimit",
+    E_AxisParameters.EnablePosLagMonitoring: "stConfig.bEnPositionLagMonitoring",
+    E_AxisParameters.MaxPositionLag: "stConfig.fMaxPosLagValue",
+    E_AxisParameters.AxisMaxVelocity: "stConfig.fVeloMax",
+    E_AxisParameters.AxisManVelSlow: "stConfig.fVelocityDefaultSlow",
+    E_AxisParameters.AxisManVelFast: "stConfig.fVelocityDefaultFast",
+    E_AxisParameters.AxisVelocityToCam: "stConfig.fHomingVelToCam",
+    E_AxisParameters.AxisVelocityFromCam: "stConfig.fHomingVelFromCam",
+    E_AxisParameters.AxisEnTargetPositionMonitoring: "stConfig.bEnTargetPositionMonitoring",
+    E_AxisParameters.AxisTargetPositionWindow: "stConfig.fTargetPositionWindow",
+    E_AxisParameters.AxisMaximumAcceleration: "stConfig.fMaxAcc",
+    E_AxisParameters.AxisMaximumDeceleration: "stConfig.fMaxDec",
+}
+
+# Variables of the axis struct that only change when they are written, their
+# values are cached per axis and updated by the setters
+CACHED_AXIS_VARIABLES = {
+    "stControl.fVelocity": pyads.PLCTYPE_LREAL,
+    "stControl.fAcceleration": pyads.PLCTYPE_LREAL,
+    "stControl.fDeceleration": pyads.PLCTYPE_LREAL,
+    "stConfig.eHomeSeq": pyads.PLCTYPE_INT,
+    "stConfig.fHomePosition": pyads.PLCTYPE_LREAL,
+    "stConfig.fHomeFinishDistance": pyads.PLCTYPE_LREAL,
+    "stConfig.fHomingVelToCam": pyads.PLCTYPE_LREAL,
+    "stConfig.fHomingVelFromCam": pyads.PLCTYPE_LREAL,
+    "stConfig.fVeloMax": pyads.PLCTYPE_LREAL,
+    "stConfig.fMaxAcc": pyads.PLCTYPE_LREAL,
+    "stConfig.fMaxDec": pyads.PLCTYPE_LREAL,
+    "stConfig.fMaxSoftPosLimit": pyads.PLCTYPE_LREAL,
+    "stConfig.fMinSoftPosLimit": pyads.PLCTYPE_LREAL,
+    "stConfig.bEnMaxSoftPosLimit": pyads.PLCTYPE_BOOL,
+    "stConfig.bEnMinSoftPosLimit": pyads.PLCTYPE_BOOL,
+    "stConfig.fVelocityDefaultFast": pyads.PLCTYPE_LREAL,
+    "stConfig.fVelocityDefaultSlow": pyads.PLCTYPE_LREAL,
+    "stConfig.bEnPositionLagMonitoring": pyads.PLCTYPE_BOOL,
+    "stConfig.fMaxPosLagValue": pyads.PLCTYPE_LREAL,
+    "stConfig.bEnTargetPositionMonitoring": pyads.PLCTYPE_BOOL,
+    "stConfig.fTargetPositionWindow": pyads.PLCTYPE_LREAL,
+}
+# NC parameters that change while the axis moves and are never cached
+LIVE_NC_PARAMETERS = (
+    E_AxisParameters.CommandedPosition,
+    E_AxisParameters.ActualVelocity,
+    E_AxisParameters.CommandedVelocity,
+)
+# Seconds a cached value stays valid, None to keep it until refresh()
+PARAMETER_CACHE_TTL = 60  # s
+
+
+# Values keyed by a variable path or E_AxisParameters with the time they were stored
+class ParameterCache:
+    def __init__(self, ttl=PARAMETER_CACHE_TTL):
+        self.ttl = ttl
+        self.values = {}
+        self.lock = threading.Lock()
+
+    # Returns (True, value) if the value is cached and not expired, (False, None) otherwise
+    def get(self, key):
+        entry = self.values.get(key)
+        if entry is None:
+            return False, None
+        value, storeTime = entry
+        if self.ttl is not None and time.monotonic() - storeTime > self.ttl:
+            return False, None
+        return True, value
+
+    def set(self, key, value):
+        with self.lock:
+            self.values[key] = (value, time.monotonic())
+
+    def invalidate(self, key=None):
+        with self.lock:
+            if key is None:
+                self.values.clear()
+            else:
+                self.values.pop(key, None)
+
+
+# Intervals between the reads of an adaptive poll, see POLL_INTERVAL_MIN
+# expectedDuration is the expected time until the condition is met, e.g. the
+# travel time of a move, or None if it isn't known
+class PollSchedule:
+    def __init__(
+        self,
+        expectedDuration=None,
+        minInterval=POLL_INTERVAL_MIN,
+        maxInterval=POLL_INTERVAL_MAX,
+        leadTime=POLL_LEAD_TIME,
+    ):
+        self.minInterval = minInterval
+        self.maxInterval = maxInterval
+        self.leadTime = leadTime
+        self.interval = minInterval
+        self.expectedEnd = None
+        if expectedDuration is not None and expectedDuration > 0:
+            self.expectedEnd = time.monotonic() + expectedDuration
+
+    def nextInterval(self, now):
+        if self.expectedEnd is not None and now < self.expectedEnd:
+            untilFastPolling = self.expectedEnd - self.leadTime - now
+            if untilFastPolling > 0:
+                return max(min(untilFastPolling, self.maxInterval), self.minInterval)
+            return self.minInterval
+        interval = self.interval
+        self.interval = min(self.interval * POLL_BACKOFF, self.maxInterval)
+        return interval
+
+
+# Timeouts in s of the phases of HandshakeTracker, used for invalid ones
+HANDSHAKE_DEFAULT_TIMEOUTS = {
+    E_HandshakePhase.eWaitDoneLow: 5,
+    E_HandshakePhase.eWaitBusyHigh: 5,
+    E_HandshakePhase.eWaitDoneHigh: 30,
+}
+
+
+# Returns timeout, or the default timeout of phase if it isn't a positive finite
+# number, e.g. from a move time that couldn't be estimated (-1 or inf)
+def handshakeTimeout(timeout, phase):
+    if 0 < timeout < math.inf:
+        return timeout
+    print(f"  Invalid timeout {timeout} for {phase.name}, using {HANDSHAKE_DEFAULT_TIMEOUTS[phase]} seconds")
+    return HANDSHAKE_DEFAULT_TIMEOUTS[phase]
+
+
+# Status variables followed by HandshakeTracker
+HANDSHAKE_VARIABLES = {
+    "stStatus.bDone": pyads.PLCTYPE_BOOL,
+    "stStatus.bBusy": pyads.PLCTYPE_BOOL,
+    "stStatus.bError": pyads.PLCTYPE_BOOL,
+    "stStatus.nErrorID": pyads.PLCTYPE_UDINT,
+    "stStatus.bCommandAborted": pyads.PLCTYPE_BOOL,
+    "stStatus.bMoving": pyads.PLCTYPE_BOOL,
+    # Reset by the plc when it takes the command, if plc.executeResetByPlc
+    "stControl.bExecute": pyads.PLCTYPE_BOOL,
+}
+# The notifications of one plc cycle can come in any order, a reset bExecute
+# could be seen before bDone went low, so it's only used from sum reads
+NOTIFIED_HANDSHAKE_VARIABLES = {
+    plcVarPath: plcVarType
+    for plcVarPath, plcVarType in HANDSHAKE_VARIABLES.items()
+    if plcVarPath != "stControl.bExecute"
+}
+
+
+# Result of a command followed by HandshakeTracker
+# It is True only if the command is done, so it can be used like the bool
+# the wait functions return
+class CommandOutcome:
+    def __init__(self, result, phase, errorId=0, elapsed=0.0):
+        self.result = result
+        # Phase the handshake was in when it finished or timed out
+        self.phase = phase
+        self.errorId = errorId
+        self.elapsed = elapsed
+
+    def __bool__(self):
+        return self.result == E_CommandResult.eDone
+
+    def __repr__(self):
+        return (
+            f"CommandOutcome({self.result.name}, {self.phase.name}, "
+            f"errorId={self.errorId:#x}, elapsed={self.elapsed:.3f})"
+        )
+
+
+# State machine of the eCommand/bExecute handshake of one command
+# update() is given the latest values of HANDSHAKE_VARIABLES, keyed by their
+# path in the axis struct, and returns a CommandOutcome once the command is
+# finished or a phase timed out, None otherwise.
+# Edges missed between two updates are inferred from the next state: bBusy
+# high means bDone went low, bDone high after bDone low means the command
+# finished. If the whole command ran between two updates, it is done when
+# the plc has taken it and the axis stands still within the target position
+# window of targetPosition, or, with executeAcknowledged, as soon as the plc
+# has taken it (bExecute reset). Without a reset bExecute the plc counts as
+# having taken the command commandLatency after the tracker was created.
+# Only pass executeAcknowledged for a plc that resets bExecute itself, see
+# plc.executeResetByPlc: otherwise bExecute stays set and proves nothing.
+# A timeout that isn't a positive finite number, e.g. from a move time that
+# couldn't be estimated, is replaced by the default timeout of its phase.
+class HandshakeTracker:
+    def __init__(
+        self,
+        timeoutDoneFalse=5,
+        timeoutBusyTrue=5,
+        timeoutDoneTrue=30,
+        targetPosition=None,
+        targetPositionWindow=0.0,
+        getActPos=None,
+        executeAcknowledged=False,
+        commandLatency=COMMAND_LATENCY,
+    ):
+        self.timeouts = {
+            E_HandshakePhase.eWaitDoneLow: timeoutDoneFalse,
+            E_HandshakePhase.eWaitBusyHigh: timeoutBusyTrue,
+            E_HandshakePhase.eWaitDoneHigh: timeoutDoneTrue,
+        }
+        for phase, timeout in self.timeouts.items():
+            self.timeouts[phase] = handshakeTimeout(timeout, phase)
+        self.executeAcknowledged = executeAcknowledged
+        self.commandLatency = commandLatency
+        self.targetPosition = targetPosition
+        self.targetPositionWindow = targetPositionWindow
+        self.getActPos = getActPos
+        self.startTime = time.monotonic()
+        self.phase = E_HandshakePhase.eWaitDoneLow
+        self.phaseStartTime = self.startTime
+
+    def setPhase(self, phase, now):
+        self.phase = phase
+        self.phaseStartTime = now
+
+    # Seconds until the tracker has to be updated even without a new status:
+    # the current phase times out or an axis at the target can be taken as done
+    def timeLeft(self, now):
+        timeLeft = self.phaseStartTime + self.timeouts[self.phase] - now
+        latencyLeft = self.startTime + self.commandLatency - now
+        if self.phase == E_HandshakePhase.eWaitDoneLow and self.targetPosition is not None and latencyLeft > 0:
+            return min(timeLeft, latencyLeft)
+        return timeLeft
+
+    def outcome(self, result, now, errorId=0):
+        return CommandOutcome(result, self.phase, errorId, now - self.startTime)
+
+    def atTarget(self, status):
+        if self.targetPosition is None:
+            return False
+        actPos = status.get("stStatus.fActPosition")
+        if actPos is None:
+            actPos = self.getActPos()
+        return abs(actPos - self.targetPosition) <= self.targetPositionWindow
+
+    def update(self, status, now=None):
+        if now is None:
+            now = time.monotonic()
+        done = status["stStatus.bDone"]
+        busy = status["stStatus.bBusy"]
+
+        if status["stStatus.bError"]:
+            return self.outcome(E_CommandResult.eError, now, status["stStatus.nErrorID"])
+
+        if self.phase == E_HandshakePhase.eWaitDoneLow:
+            if busy:
+                self.setPhase(E_HandshakePhase.eWaitDoneHigh, now)
+            elif not done:
+                self.setPhase(E_HandshakePhase.eWaitBusyHigh, now)
+            elif not status["stStatus.bMoving"] and (
+                (self.executeAcknowledged and not status.get("stControl.bExecute", True))
+                or (now - self.startTime >= self.commandLatency and self.atTarget(status))
+            ):
+                return self.outcome(E_CommandResult.eDone, now)
+        elif self.phase == E_HandshakePhase.eWaitBusyHigh:
+            if busy:
+                self.setPhase(E_HandshakePhase.eWaitDoneHigh, now)
+            elif done:
+                return self.outcome(E_CommandResult.eDone, now)
+
+        # bCommandAborted of the previous command stays set until bBusy went high
+        if self.phase == E_HandshakePhase.eWaitDoneHigh and not busy:
+            if status["stStatus.bCommandAborted"]:
+                return self.outcome(E_CommandResult.eAborted, now)
+            if done:
+                return self.outcome(E_CommandResult.eDone, now)
+
+        if self.timeLeft(now) <= 0:
+            return self.outcome(E_CommandResult.eTimeout, now)
+        return None
+
+
+# Stands in for an axis when a getter is called on it and records which
+# variable the getter reads instead of reading it
+class VariablePathRecorder:
+    # The PneumaticAxis getters leave the type to PNEUMATIC_AXIS_VARIABLES
+    def getGenericVariable(self, plcVarPath, plcVarType=None, snapshot=None):
+        if plcVarType is None:
+            plcVarType = PNEUMATIC_AXIS_VARIABLES[plcVarPath]
+        return (plcVarPath, plcVarType)
+
+    def getCachedVariable(self, plcVarPath, plcVarType, cached=True):
+        return (plcVarPath, plcVarType)
+
+
+# Returns (plcVarPath, plcVarType) of the variable read by a bound getter of an
+# axis or PneumaticAxis, e.g. axis6.getDoneStatus, or None for anything else
+def getterVariable(getFunction):
+    owner = getattr(getFunction, "__self__", None)
+    if not isinstance(owner, (axis, PneumaticAxis)) or not getFunction.__name__.startswith("get"):
+        return None
+    try:
+        variable = getFunction.__func__(VariablePathRecorder())
+    except (TypeError, AttributeError):
+        return None
+    if isinstance(variable, tuple):
+        return variable
+    return None
 
 
 class plc:
@@ -80,7 +686,8 @@ class plc:
         hostname=None,
         username="Administrator",
         password="1", 
-        connection=None
+        connection=None,
+        symbolManifest=None
     ):
     
         print("Constructor for PLC")
@@ -93,10 +700,61 @@ class plc:
         self.hostname = hostname
         self.username = username
         self.password = password
-        self.connection = pyads.Connection(self.plcAmsNetId, self.plcPort)
-        
+        # A simulated connection (see simulatedPlc) can be injected instead of the real PLC
+        if connection is not None:
+            self.connection = connection
+        else:
+            self.connection = pyads.Connection(self.plcAmsNetId, self.plcPort)
+        # Symbol handles of this connection keyed by the full variable path
+        self.handles = {}
+        # Symbol and data type table uploaded at connect. Variables in it are read and
+        # written by index group/offset with the types declared in the PLC, the
+        # others by handle. Set useSymbolTable to False before connect to always use handles
+        self.useSymbolTable = True
+        self.symbolTable = None
+        # Symbol version the symbol table belongs to and time.monotonic() of its last check
+        self.symbolVersion = None
+        self.symbolVersionCheckTime = 0.0
+        # TypedAccessor of every variable used so far, None if it isn't in the table
+        self.accessors = {}
+        # File the symbol table is kept in between sessions, None to upload it every time
+        self.symbolManifest = symbolManifest
+        # Background reads of all axes, see startPlantState
+        self.plantState = None
+        # time.monotonic() after the last write or notification,
+        # plant state snapshots read before it aren't used
+        self.lastEventTime = 0.0
+        # Intervals of the adaptive polling of the wait functions
+        self.pollIntervalMin = POLL_INTERVAL_MIN
+        self.pollIntervalMax = POLL_INTERVAL_MAX
+        self.pollLeadTime = POLL_LEAD_TIME
+        # NC parameters are read and written directly by index group/offset when
+        # this is True, otherwise with the eReadParameter/eWriteParameter handshake
+        self.directNcAccess = True
+        # Set to True if the plc resets stControl.bExecute when it takes a command
+        # (the simulated plc does). HandshakeTracker then also recognises commands
+        # that ran completely between two polls by their reset bExecute
+        self.executeResetByPlc = False
+        # Passed to HandshakeTracker, see COMMAND_LATENCY
+        self.commandLatency = COMMAND_LATENCY
+        # The wait functions are woken by ADS device notifications when this is True
+        # and fall back to polling when it is False or a notification can't be added
+        self.useNotifications = True
+        self.notificationHandles = {}
+        self.notifiedValues = {}
+        self.notificationCondition = threading.Condition()
+        # Called as listener(varName, value) from the notification thread on every change
+        self.notificationListeners = []
+
     def __del__(self):
         print("Destructor for PLC: Close connection")
+        self.close()
+
+    def close(self):
+        self.stopPlantState()
+        if self.connection.is_open:
+            self.unsubscribeAll()
+            self.releaseHandles()
         self.connection.close()
 
     def connect(self):
@@ -129,107 +787,622 @@ class plc:
         print(f"is_open()={self.connection.is_open}")
 
         #pyads.set_local_address(self.senderAmsNetId)
-        print(f"get_local_address()={pyads.get_local_address()}")
+        if isinstance(self.connection, pyads.Connection):
+            print(f"get_local_address()={pyads.get_local_address()}")
 
         # If the connection was not successful this command will fail
-        print(f"read_device_info()={self.connection.read_device_info()}")
-        self.noOfAxes = self.connection.read_by_name(
-            "GVL_APP.nAXIS_NUM", pyads.PLCTYPE_INT
-        )
+        deviceInfo = self.getDeviceInfo()
+        print(f"read_device_info()={deviceInfo}")
+        if self.useSymbolTable:
+            self.loadSymbolTable(deviceInfo)
+        if self.symbolTable is not None:
+            self.checkStructLayouts()
+        self.noOfAxes = self.readByName("GVL_APP.nAXIS_NUM", pyads.PLCTYPE_INT)
         print(f"GVL_APP.nAXIS_NUM={self.noOfAxes}")
 
         return self
-    # For reading and writing any variable you can use the pyads function of the plc:
-    # E.g.: plc_obj.connection.read_by_name("varName", pyads.PLCTYPE_XXX)
-    # E.g.: plc_obj.connection.write_by_name("varName", value, pyads.PLCTYPE_XXX)
+
+    # Name and version of the PLC as one string, e.g. "Plc30 App 3.1.4024"
+    def getDeviceInfo(self):
+        name, version = self.connection.read_device_info()
+        if hasattr(version, "build"):
+            version = f"{version.version}.{version.revision}.{version.build}"
+        return f"{name} {version}"
+
+    # Loads the symbol and data type tables of the PLC from symbolManifest if they
+    # were saved for this PLC, its device info and its current symbol version,
+    # otherwise uploads them and saves them to symbolManifest
+    # If the upload fails the variables are accessed by handle
+    def loadSymbolTable(self, deviceInfo=None):
+        self.accessors.clear()
+        self.symbolTable = None
+        try:
+            # Read first, a change during the upload is caught by the next check
+            self.symbolVersion = readSymbolVersion(self.connection)
+            self.symbolVersionCheckTime = time.monotonic()
+            if self.symbolManifest is not None:
+                if deviceInfo is None:
+                    deviceInfo = self.getDeviceInfo()
+                key = symbolTableKey(self.connection, f"{self.plcAmsNetId} {deviceInfo}")
+                self.symbolTable = loadManifest(self.symbolManifest, key)
+                if self.symbolTable is not None:
+                    print(f"Symbol table loaded from {self.symbolManifest}")
+                    return
+            self.symbolTable = uploadSymbolTable(self.connection)
+        except (pyads.ADSError, AttributeError) as e:
+            print(f"Could not upload the symbol table, using handles: {e}")
+            self.symbolTable = None
+            return
+        print(
+            f"Symbol table: {len(self.symbolTable.symbols)} symbols, "
+            f"{len(self.symbolTable.dataTypes)} data types"
+        )
+        if self.symbolManifest is not None:
+            try:
+                saveManifest(self.symbolTable, self.symbolManifest, key)
+            except OSError as e:
+                print(f"Could not save the symbol table to {self.symbolManifest}: {e}")
+
+    # Raises ValueError if a struct of MIRRORED_STRUCTS is laid out differently
+    # in the symbol table. Types the PLC doesn't declare aren't checked
+    def checkStructLayouts(self):
+        for typeName, structType in MIRRORED_STRUCTS.items():
+            try:
+                mismatches = self.symbolTable.layoutMismatches(typeName, structType)
+            except KeyError:
+                continue
+            if mismatches:
+                raise ValueError(
+                    f"{typeName} of the PLC doesn't match the one of motionFunctionsLib, "
+                    f"{', '.join(mismatches)} differ"
+                )
+
+    # Drops the symbol table if the symbol version of the PLC changed since it was
+    # loaded (download or online change), its index offsets may point at other
+    # variables now. The variables are then accessed by handle until
+    # loadSymbolTable is called again.
+    # Reads the version at most every SYMBOL_VERSION_CHECK_INTERVAL unless force
+    # or the plant state saw it change
+    def checkSymbolVersion(self, force=False):
+        if self.symbolTable is None:
+            return
+        now = time.monotonic()
+        if self.plantState is not None and self.plantState.symbolVersionChanged:
+            force = True
+        if not force and now - self.symbolVersionCheckTime < SYMBOL_VERSION_CHECK_INTERVAL:
+            return
+        symbolVersion = readSymbolVersion(self.connection)
+        self.symbolVersionCheckTime = now
+        if symbolVersion == self.symbolVersion:
+            return
+        print(
+            f"Symbol version of the PLC changed from {self.symbolVersion} to {symbolVersion}, "
+            f"using handles until the symbol table is loaded again"
+        )
+        self.stopPlantState()
+        self.symbolTable = None
+        self.accessors.clear()
+
+    # Returns the cached TypedAccessor of a variable, None without a symbol table
+    # or if the variable isn't in it
+    def getAccessor(self, varName):
+        self.checkSymbolVersion()
+        if self.symbolTable is None:
+            return None
+        if varName not in self.accessors:
+            try:
+                self.accessors[varName] = self.symbolTable.resolve(varName)
+            except KeyError:
+                self.accessors[varName] = None
+        return self.accessors[varName]
+
+    # (indexGroup, indexOffset, ctypesType) of a variable for sumRead
+    # The type is the one of the symbol table if the variable is in it, dataType otherwise
+    def getAddress(self, varName, dataType):
+        accessor = self.getAccessor(varName)
+        if accessor is not None:
+            return accessor.indexGroup, accessor.indexOffset, accessor.dataType
+        return pyads.constants.ADSIGRP_SYM_VALBYHND, self.getHandle(varName), dataType
+
+    # Reads a whole struct, e.g. GVL.astAxes[6], in one request as the ctypes
+    # structure built from the symbol table. Raises KeyError if it isn't in the table
+    def readStruct(self, varName):
+        accessor = self.getAccessor(varName)
+        if accessor is None:
+            raise KeyError(f"{varName} not in the symbol table")
+        return accessor.read(self.connection)
+
+    # Starts reading all axes in the background (see plantState.py) so the getters
+    # of the axes take their values from snapshots no older than maxAge
+    # Needs the symbol table, raises KeyError without it
+    def startPlantState(self, interval=PLANT_STATE_INTERVAL, maxAge=PLANT_STATE_MAX_AGE):
+        if self.plantState is None:
+            self.plantState = PlantState(self, interval, maxAge).start()
+        return self.plantState
+
+    def stopPlantState(self):
+        if self.plantState is not None:
+            self.plantState.stop()
+            self.plantState = None
+
+    # Latest plant state snapshot the getters may use: younger than the staleness
+    # bound and read after the last write and the last notification of this plc,
+    # so a script never sees older values than it already acted on.
+    # None without a running plant state
+    def getPlantSnapshot(self):
+        if self.plantState is None:
+            return None
+        snapshot = self.plantState.latest()
+        if snapshot is None or snapshot.readTime < self.lastEventTime:
+            return None
+        return snapshot
+
+    # Reads a variable from the plant state if a usable snapshot has it, else from the PLC
+    def readLatest(self, varName, plcVarType):
+        snapshot = self.getPlantSnapshot()
+        if snapshot is not None and self.plantState.locate(varName) is not None:
+            return snapshot.get(varName)
+        return self.readByName(varName, plcVarType)
+
+    # Returns the cached symbol handle of a variable, getting it on first use
+    def getHandle(self, varName):
+        handle = self.handles.get(varName)
+        if handle is None:
+            handle = self.connection.get_handle(varName)
+            self.handles[varName] = handle
+        return handle
+
+    # Gets the handles of a list of variables up front
+    def prepareHandles(self, varNames):
+        for varName in varNames:
+            self.getHandle(varName)
+
+    def releaseHandles(self):
+        for varName, handle in self.handles.items():
+            try:
+                self.connection.release_handle(handle)
+            except pyads.ADSError as e:
+                print(f"Could not release handle of {varName}: {e}")
+        self.handles.clear()
+
+    # Calls call(handle) with the cached handle of varName. If the PLC invalidated
+    # the cached handles (online change) they are released and fetched again once.
+    # A handle fetched for this call isn't retried: get_handle fails with the same
+    # errors for a variable that doesn't exist
+    def callWithHandle(self, varName, call):
+        cached = varName in self.handles
+        handle = self.getHandle(varName)
+        try:
+            return call(handle)
+        except pyads.ADSError as e:
+            if not cached or e.err_code not in HANDLE_INVALID_ERRORS:
+                raise
+        self.releaseHandles()
+        return call(self.getHandle(varName))
+
+    # Read and write a variable by its address in the symbol table or else by its
+    # cached handle. With the symbol table the type declared in the PLC is used
+    # A write first checks the symbol table still belongs to the PLC, see checkSymbolVersion
+    def readByName(self, varName, plcVarType):
+        accessor = self.getAccessor(varName)
+        if accessor is not None:
+            return accessor.read(self.connection)
+        return self.callWithHandle(
+            varName, lambda handle: self.connection.read_by_name(varName, plcVarType, handle=handle))
+
+    def writeByName(self, varName, value, plcVarType):
+        self.checkSymbolVersion(force=True)
+        accessor = self.getAccessor(varName)
+        if accessor is not None:
+            accessor.write(self.connection, value)
+            self.lastEventTime = time.monotonic()
+            return
+        self.callWithHandle(
+            varName, lambda handle: self.connection.write_by_name(varName, value, plcVarType, handle=handle))
+        self.lastEventTime = time.monotonic()
+
+    # Writes several variables in one ADS sum command by their addresses in the
+    # symbol table or else their cached handles
+    # The PLC processes the writes in the given order within the same cycle
+    # varNamesValuesTypes is a list of (varName, value, plcVarType)
+    def writeMany(self, varNamesValuesTypes):
+        self.checkSymbolVersion(force=True)
+        handleVarNames = [varName for varName, _, _ in varNamesValuesTypes if self.getAccessor(varName) is None]
+        # Retried only if a cached handle may be the invalid one, see callWithHandle
+        cached = any(varName in self.handles for varName in handleVarNames)
+        self.prepareHandles(handleVarNames)
+
+        def sumWriteByHandle():
+            requests = []
+            for varName, value, plcVarType in varNamesValuesTypes:
+                accessor = self.getAccessor(varName)
+                if accessor is not None:
+                    requests.append((accessor.indexGroup, accessor.indexOffset,
+                                     accessor.dataType, accessor.encode(value)))
+                else:
+                    requests.append((pyads.constants.ADSIGRP_SYM_VALBYHND,
+                                     self.getHandle(varName), plcVarType, value))
+            self.sumWrite(requests)
+
+        try:
+            sumWriteByHandle()
+        except pyads.ADSError as e:
+            if not cached or e.err_code not in HANDLE_INVALID_ERRORS:
+                raise
+            self.releaseHandles()
+            sumWriteByHandle()
+
+    # Keeps notifiedValues[varName] up to date with an ADS device notification
+    # Returns False if the variable can't be watched this way
+    def subscribe(self, varName, plcVarType):
+        if varName in self.notificationHandles:
+            return True
+        if plcVarType == pyads.PLCTYPE_STRING:
+            return False
+        accessor = self.getAccessor(varName)
+        if accessor is not None and issubclass(accessor.dataType, ctypes._SimpleCData):
+            plcVarType = accessor.dataType
+
+        def callback(notification, data):
+            _, _, value = self.connection.parse_notification(notification, plcVarType)
+            self.lastEventTime = time.monotonic()
+            with self.notificationCondition:
+                self.notifiedValues[varName] = value
+                self.notificationCondition.notify_all()
+            for listener in list(self.notificationListeners):
+                listener(varName, value)
+
+        try:
+            self.notificationHandles[varName] = self.connection.add_device_notification(
+                varName, pyads.NotificationAttrib(ctypes.sizeof(plcVarType)), callback
+            )
+        except pyads.ADSError as e:
+            print(f"Could not add notification for {varName}: {e}")
+            return False
+        return True
+
+    def unsubscribeAll(self):
+        for varName, (notificationHandle, userHandle) in self.notificationHandles.items():
+            try:
+                self.connection.del_device_notification(notificationHandle, userHandle)
+            except pyads.ADSError as e:
+                print(f"Could not delete notification of {varName}: {e}")
+        self.notificationHandles.clear()
+        with self.notificationCondition:
+            self.notifiedValues.clear()
+
+    # Blocks until predicate(value1, value2, ...) of the watched variables is True
+    # varNamesAndTypes is a list of (varName, plcVarType)
+    # Returns True when the condition is met, False on timeout and None if
+    # notifications are not available so the caller has to poll instead
+    def waitForCondition(self, varNamesAndTypes, predicate, timeout):
+        if not self.useNotifications:
+            return None
+        for varName, plcVarType in varNamesAndTypes:
+            if not self.subscribe(varName, plcVarType):
+                return None
+
+        varNames = [varName for varName, _ in varNamesAndTypes]
+        timeLimit = time.time() + timeout
+        with self.notificationCondition:
+            while True:
+                if all(varName in self.notifiedValues for varName in varNames) and predicate(
+                    *[self.notifiedValues[varName] for varName in varNames]
+                ):
+                    return True
+                remaining = timeLimit - time.time()
+                if remaining <= 0:
+                    return False
+                self.notificationCondition.wait(remaining)
+
+    # Same as waitForCondition for the variable behind a getter, e.g. axis6.getDoneStatus
+    def waitForGetter(self, getFunction, predicate, timeout):
+        variable = getterVariable(getFunction)
+        if variable is None:
+            return None
+        plcVarPath, plcVarType = variable
+        return self.waitForCondition(
+            [(getFunction.__self__.varName(plcVarPath), plcVarType)], predicate, timeout
+        )
+
+    # Calls condition() until it returns True or the timeout expires
+    # Polls every sleepInterval, or adaptively if sleepInterval is None
+    # Returns True when the condition is met and False on timeout
+    def pollFor(self, condition, timeout, sleepInterval=None, expectedDuration=None):
+        schedule = None
+        if sleepInterval is None:
+            schedule = PollSchedule(
+                expectedDuration, self.pollIntervalMin, self.pollIntervalMax, self.pollLeadTime
+            )
+        timeLimit = time.monotonic() + timeout
+        while True:
+            if condition():
+                return True
+            now = time.monotonic()
+            if now >= timeLimit:
+                return False
+            interval = sleepInterval if schedule is None else schedule.nextInterval(now)
+            if interval > 0:
+                time.sleep(min(interval, timeLimit - now))
+
+    # Latest value received by notification, None if the variable isn't watched
+    def getNotifiedValue(self, varName):
+        with self.notificationCondition:
+            return self.notifiedValues.get(varName)
+
+    # Reads any list of variables in one ADS sum command
+    # The values are typed from the PLC symbol info and returned in the order of varNames
+    # Raises pyads.ADSError if any of them couldn't be read
+    def readMany(self, varNames):
+        snapshot = self.getPlantSnapshot()
+        if snapshot is not None and all(self.plantState.locate(varName) is not None for varName in varNames):
+            return [snapshot.get(varName) for varName in varNames]
+        accessors = [self.getAccessor(varName) for varName in varNames]
+        if accessors and all(accessor is not None for accessor in accessors):
+            values = self.sumRead([
+                (accessor.indexGroup, accessor.indexOffset, accessor.dataType)
+                for accessor in accessors
+            ])
+            return [accessor.value(value) for accessor, value in zip(accessors, values)]
+        values = self.connection.read_list_by_name(list(varNames))
+        for varName in varNames:
+            if isinstance(values[varName], str) and values[varName] in ADS_ERROR_CODES_BY_TEXT:
+                raise pyads.ADSError(ADS_ERROR_CODES_BY_TEXT[values[varName]], f"Could not read {varName}")
+        return [values[varName] for varName in varNames]
+
+    # Reads several index group/offset areas in one ADS sum command
+    # requests is a list of (indexGroup, indexOffset, ctypesType)
+    # Returns a list with one ctypes value per request
+    def sumRead(self, requests):
+        sumRequests = (pyads.structs.SAdsSumRequest * len(requests))()
+        for i, (indexGroup, indexOffset, dataType) in enumerate(requests):
+            sumRequests[i].iGroup = indexGroup
+            sumRequests[i].iOffset = indexOffset
+            sumRequests[i].size = ctypes.sizeof(dataType)
+        response = bytes(self.connection.read_write(
+            pyads.constants.ADSIGRP_SUMUP_READ,
+            len(requests),
+            None,
+            sumRequests,
+            None,
+            return_ctypes=True,
+        ))
+
+        values = []
+        dataOffset = 4 * len(requests)
+        for i, (_, _, dataType) in enumerate(requests):
+            errorCode = int.from_bytes(response[4 * i:4 * i + 4], "little")
+            if errorCode:
+                raise pyads.ADSError(errorCode)
+            values.append(dataType.from_buffer_copy(response, dataOffset))
+            dataOffset += ctypes.sizeof(dataType)
+        return values
+
+    # Writes several index group/offset areas in one ADS sum command
+    # requests is a list of (indexGroup, indexOffset, ctypesType, value)
+    # value can also be a ctypesType instance already
+    def sumWrite(self, requests):
+        sumRequests = (pyads.structs.SAdsSumRequest * len(requests))()
+        data = b""
+        for i, (indexGroup, indexOffset, dataType, value) in enumerate(requests):
+            sumRequests[i].iGroup = indexGroup
+            sumRequests[i].iOffset = indexOffset
+            sumRequests[i].size = ctypes.sizeof(dataType)
+            data += bytes(value if isinstance(value, dataType) else dataType(value))
+        response = bytes(self.connection.read_write(
+            pyads.constants.ADSIGRP_SUMUP_WRITE,
+            len(requests),
+            None,
+            bytearray(bytes(sumRequests) + data),
+            None,
+            return_ctypes=True,
+        ))
+        self.lastEventTime = time.monotonic()
+
+        for i in range(len(requests)):
+            errorCode = int.from_bytes(response[4 * i:4 * i + 4], "little")
+            if errorCode:
+                raise pyads.ADSError(errorCode)
+
+    # Reads NC axis parameters directly from the NC in one ADS sum command,
+    # without the eReadParameter handshake of the axis function block
+    # requests is a list of (ncAxisId, axisParam), the values are returned as float
+    # like fReadAxisParameter. Raises KeyError for a parameter without an address
+    def readNcParameters(self, requests):
+        addresses = [NC_AXIS_PARAMETER_ADDRESSES[axisParam] for _, axisParam in requests]
+        values = self.sumRead([
+            (address.indexGroup + ncAxisId, address.indexOffset, NC_PARAMETER_TYPES[address.dataType])
+            for (ncAxisId, _), address in zip(requests, addresses)
+        ])
+        return [float(value.value) for value in values]
+
+    # Writes NC axis parameters directly to the NC in one ADS sum command
+    # requests is a list of (ncAxisId, axisParam, value)
+    # Raises KeyError for a parameter without an address and ValueError for a read only one
+    def writeNcParameters(self, requests):
+        sumRequests = []
+        for ncAxisId, axisParam, value in requests:
+            address = NC_AXIS_PARAMETER_ADDRESSES[axisParam]
+            if address.writeIndexGroup is not None:
+                indexGroup, indexOffset = address.writeIndexGroup, address.writeIndexOffset
+            elif address.indexGroup == NC_AXIS_STATE_GROUP:
+                raise ValueError(f"{axisParam.name} is read only")
+            else:
+                indexGroup, indexOffset = address.indexGroup, address.indexOffset
+            dataType = NC_PARAMETER_TYPES[address.dataType]
+            if dataType is not ctypes.c_double:
+                value = int(value)
+            sumRequests.append((indexGroup + ncAxisId, indexOffset, dataType, value))
+        self.sumWrite(sumRequests)
+
+    # For reading and writing any variable you can use the handle cached functions of the plc:
+    # E.g.: plc_obj.readByName("varName", pyads.PLCTYPE_XXX)
+    # E.g.: plc_obj.writeByName("varName", value, pyads.PLCTYPE_XXX)
     
 class axis:
     def __init__(self, plcConnection, axisNum):
         print("Constructor for axis")
         self.plc = plcConnection
         self.axisNum = axisNum
+        # Full variable names keyed by the path inside the axis struct
+        self.varNames = {}
+        # ID of the NC axis behind Axis, read on first use
+        self.ncAxisId = None
+        # Config values and NC parameters, see CACHED_AXIS_VARIABLES
+        self.parameterCache = ParameterCache()
 
     def __del__(self):
         print("Destructor for axis: Resetting jog commands")
         self.jogStop()
 
+    # Full name of a variable of this axis, e.g. GVL.astAxes[7].stStatus.bDone
+    def varName(self, plcVarPath):
+        plcVarName = self.varNames.get(plcVarPath)
+        if plcVarName is None:
+            plcVarName = f"GVL.astAxes[{self.axisNum}].{plcVarPath}"
+            self.varNames[plcVarPath] = plcVarName
+        return plcVarName
+
     # Generic function for getting any variable on the Axis
-    def getGenericVariable(self, plcVarPath, plcVarType):
-        plcVarName = f"GVL.astAxes[{self.axisNum}].{plcVarPath}"
-        returnValue = self.plc.connection.read_by_name(plcVarName, plcVarType)
-        global prevPrintString
-        printString = f"{plcVarName}=: {returnValue}"
-        if prevPrintString != printString:
-            print(f"{dateTimeObj.now()} {printString}")
-        prevPrintString = printString
+    # If a status snapshot is given the value is taken from it instead of the PLC
+    def getGenericVariable(self, plcVarPath, plcVarType, snapshot=None):
+        plcVarName = self.varName(plcVarPath)
+        if snapshot is not None:
+            returnValue = snapshot.get(plcVarPath)
+        else:
+            returnValue = self.plc.readLatest(plcVarName, plcVarType)
+        variableLog.read(plcVarName, returnValue)
         return returnValue
 
+    # Reads several variables of this axis in one ADS round trip
+    def getGenericVariables(self, plcVarPaths):
+        return self.plc.readMany([self.varName(plcVarPath) for plcVarPath in plcVarPaths])
+
+    # Same as getGenericVariable for the variables of CACHED_AXIS_VARIABLES
+    # The PLC is only read if the value isn't cached or expired, or if cached is False
+    def getCachedVariable(self, plcVarPath, plcVarType, cached=True):
+        if cached:
+            found, value = self.parameterCache.get(plcVarPath)
+            if found:
+                return value
+        value = self.getGenericVariable(plcVarPath, plcVarType)
+        self.parameterCache.set(plcVarPath, value)
+        return value
+
+    # Drops the cached values and reads all CACHED_AXIS_VARIABLES again in one round trip
+    def refresh(self):
+        self.parameterCache.invalidate()
+        plcVarPaths = list(CACHED_AXIS_VARIABLES)
+        for plcVarPath, value in zip(plcVarPaths, self.getGenericVariables(plcVarPaths)):
+            self.parameterCache.set(plcVarPath, value)
+
+    def setCacheTtl(self, ttl):
+        self.parameterCache.ttl = ttl
+
+    # Reads stStatus and stInputs in one ADS round trip
+    # The result can be passed to the status getters, e.g. getDoneStatus(snapshot)
+    # With a plant state (see plc.startPlantState) it is taken from its latest snapshot
+    def getStatusSnapshot(self):
+        plantSnapshot = self.plc.getPlantSnapshot()
+        if plantSnapshot is not None and self.plc.plantState.locate(self.varName("stStatus")) is not None:
+            return AxisStatusSnapshot(
+                self.axisNum,
+                plantSnapshot.timestamp,
+                plantSnapshot.get(self.varName("stStatus")),
+                plantSnapshot.get(self.varName("stInputs")),
+            )
+        accessors = [self.plc.getAccessor(self.varName("stStatus")), self.plc.getAccessor(self.varName("stInputs"))]
+        if None not in accessors:
+            status, inputs = self.plc.sumRead(
+                [(accessor.indexGroup, accessor.indexOffset, accessor.dataType) for accessor in accessors])
+            return AxisStatusSnapshot(self.axisNum, time.time(), status, inputs)
+        # Without the symbol table the layout of the structs can't be checked,
+        # every field is read by its own handle instead, still in one sum read
+        fields = [
+            (structName, name, fieldType)
+            for structName, structType in (("stStatus", ST_AxisStatus), ("stInputs", ST_AxisInputs))
+            for name, fieldType in structType._fields_
+        ]
+        values = self.plc.sumRead([
+            (pyads.constants.ADSIGRP_SYM_VALBYHND, self.plc.getHandle(self.varName(f"{structName}.{name}")), fieldType)
+            for structName, name, fieldType in fields
+        ])
+        structs = {"stStatus": types.SimpleNamespace(), "stInputs": types.SimpleNamespace()}
+        for (structName, name, _), value in zip(fields, values):
+            setattr(structs[structName], name, value.value)
+        return AxisStatusSnapshot(self.axisNum, time.time(), structs["stStatus"], structs["stInputs"])
+
+    # Reads the whole ST_AxisStruct of the axis in one request, laid out as in the PLC
+    # Needs the symbol table of the plc, raises KeyError without it
+    def readAxisStruct(self):
+        return self.plc.readStruct(f"GVL.astAxes[{self.axisNum}]")
+
     # Get ST_Status variables
-    def getEnabledStatus(self):
-        return self.getGenericVariable("stStatus.bEnabled", pyads.PLCTYPE_BOOL)
+    def getEnabledStatus(self, snapshot=None):
+        return self.getGenericVariable("stStatus.bEnabled", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getCommandAbortedStatus(self):
-        return self.getGenericVariable("stStatus.bCommandAborted", pyads.PLCTYPE_BOOL)
+    def getCommandAbortedStatus(self, snapshot=None):
+        return self.getGenericVariable("stStatus.bCommandAborted", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getBusyStatus(self):
-        return self.getGenericVariable("stStatus.bBusy", pyads.PLCTYPE_BOOL)
+    def getBusyStatus(self, snapshot=None):
+        return self.getGenericVariable("stStatus.bBusy", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getDoneStatus(self):
-        return self.getGenericVariable("stStatus.bDone", pyads.PLCTYPE_BOOL)
+    def getDoneStatus(self, snapshot=None):
+        return self.getGenericVariable("stStatus.bDone", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getHomedStatus(self):
-        return self.getGenericVariable("stStatus.bHomed", pyads.PLCTYPE_BOOL)
+    def getHomedStatus(self, snapshot=None):
+        return self.getGenericVariable("stStatus.bHomed", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getMovingStatus(self):
-        return self.getGenericVariable("stStatus.bMoving", pyads.PLCTYPE_BOOL)
+    def getMovingStatus(self, snapshot=None):
+        return self.getGenericVariable("stStatus.bMoving", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getMovingFwdStatus(self):
-        return self.getGenericVariable("stStatus.bMovingForward", pyads.PLCTYPE_BOOL)
+    def getMovingFwdStatus(self, snapshot=None):
+        return self.getGenericVariable("stStatus.bMovingForward", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getMovingBwdStatus(self):
-        return self.getGenericVariable("stStatus.bMovingBackward", pyads.PLCTYPE_BOOL)
+    def getMovingBwdStatus(self, snapshot=None):
+        return self.getGenericVariable("stStatus.bMovingBackward", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getFwdEnabled(self):
-        return self.getGenericVariable("stStatus.bFwEnabled", pyads.PLCTYPE_BOOL)
+    def getFwdEnabled(self, snapshot=None):
+        return self.getGenericVariable("stStatus.bFwEnabled", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getBwdEnabled(self):
-        return self.getGenericVariable("stStatus.bBwEnabled", pyads.PLCTYPE_BOOL)
+    def getBwdEnabled(self, snapshot=None):
+        return self.getGenericVariable("stStatus.bBwEnabled", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getInterlockedFwd(self):
-        return self.getGenericVariable("stStatus.bInterlockedFwd", pyads.PLCTYPE_BOOL)
+    def getInterlockedFwd(self, snapshot=None):
+        return self.getGenericVariable("stStatus.bInterlockedFwd", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getInterlockedBwd(self):
-        return self.getGenericVariable("stStatus.bInterlockedBwd", pyads.PLCTYPE_BOOL)
+    def getInterlockedBwd(self, snapshot=None):
+        return self.getGenericVariable("stStatus.bInterlockedBwd", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getInTargetPosition(self):
-        return self.getGenericVariable("stStatus.bInTargetPosition", pyads.PLCTYPE_BOOL)
+    def getInTargetPosition(self, snapshot=None):
+        return self.getGenericVariable("stStatus.bInTargetPosition", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getGearedStatus(self):
-        return self.getGenericVariable("stStatus.bGeared", pyads.PLCTYPE_BOOL)
+    def getGearedStatus(self, snapshot=None):
+        return self.getGenericVariable("stStatus.bGeared", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getCoupledGear1(self):
-        return self.getGenericVariable("stStatus.bCoupledGear1", pyads.PLCTYPE_BOOL)
+    def getCoupledGear1(self, snapshot=None):
+        return self.getGenericVariable("stStatus.bCoupledGear1", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getCoupledGear2(self):
-        return self.getGenericVariable("stStatus.bCoupledGear2", pyads.PLCTYPE_BOOL)
+    def getCoupledGear2(self, snapshot=None):
+        return self.getGenericVariable("stStatus.bCoupledGear2", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getCoupledGear3(self):
-        return self.getGenericVariable("stStatus.bCoupledGear3", pyads.PLCTYPE_BOOL)
+    def getCoupledGear3(self, snapshot=None):
+        return self.getGenericVariable("stStatus.bCoupledGear3", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getCoupledGear4(self):
-        return self.getGenericVariable("stStatus.bCoupledGear4", pyads.PLCTYPE_BOOL)
+    def getCoupledGear4(self, snapshot=None):
+        return self.getGenericVariable("stStatus.bCoupledGear4", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getActPos(self):
-        return self.getGenericVariable("stStatus.fActPosition", pyads.PLCTYPE_LREAL)
+    def getActPos(self, snapshot=None):
+        return self.getGenericVariable("stStatus.fActPosition", pyads.PLCTYPE_LREAL, snapshot)
 
-    def getActVel(self):
-        return self.getGenericVariable("stStatus.fActVelocity", pyads.PLCTYPE_LREAL)
+    def getActVel(self, snapshot=None):
+        return self.getGenericVariable("stStatus.fActVelocity", pyads.PLCTYPE_LREAL, snapshot)
 
-    def getErrorStatus(self):
-        return self.getGenericVariable("stStatus.bError", pyads.PLCTYPE_BOOL)
+    def getErrorStatus(self, snapshot=None):
+        return self.getGenericVariable("stStatus.bError", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getErrorId(self):
-        return self.getGenericVariable("stStatus.nErrorID", pyads.PLCTYPE_UDINT)
+    def getErrorId(self, snapshot=None):
+        return self.getGenericVariable("stStatus.nErrorID", pyads.PLCTYPE_UDINT, snapshot)
     
     #Status of the ST_AxisStatus of the AXIS_REF
     def getConstantVelocityStatus(self):
@@ -245,23 +1418,23 @@ class axis:
         return self.getGenericVariable("Axis.Status.Standstill", pyads.PLCTYPE_BOOL)
 
     # Get ST_Config variables
-    def getHomeSequence(self):
-        return self.getGenericVariable("stConfig.eHomeSeq", pyads.PLCTYPE_INT)
+    def getHomeSequence(self, cached=True):
+        return self.getCachedVariable("stConfig.eHomeSeq", pyads.PLCTYPE_INT, cached)
 
-    def getHomePosition(self):
-        return self.getGenericVariable("stConfig.fHomePosition", pyads.PLCTYPE_LREAL)
+    def getHomePosition(self, cached=True):
+        return self.getCachedVariable("stConfig.fHomePosition", pyads.PLCTYPE_LREAL, cached)
 
-    def getHomeFinishDistance(self):
-        return self.getGenericVariable("stConfig.fHomeFinishDistance", pyads.PLCTYPE_LREAL)
+    def getHomeFinishDistance(self, cached=True):
+        return self.getCachedVariable("stConfig.fHomeFinishDistance", pyads.PLCTYPE_LREAL, cached)
 
-    def getVelocity(self):
-        return self.getGenericVariable("stControl.fVelocity", pyads.PLCTYPE_LREAL)
+    def getVelocity(self, cached=True):
+        return self.getCachedVariable("stControl.fVelocity", pyads.PLCTYPE_LREAL, cached)
 
-    def getAcceleration(self):
-        return self.getGenericVariable("stControl.fAcceleration", pyads.PLCTYPE_LREAL)
+    def getAcceleration(self, cached=True):
+        return self.getCachedVariable("stControl.fAcceleration", pyads.PLCTYPE_LREAL, cached)
 
-    def getDeceleration(self):
-        return self.getGenericVariable("stControl.fDeceleration", pyads.PLCTYPE_LREAL)
+    def getDeceleration(self, cached=True):
+        return self.getCachedVariable("stControl.fDeceleration", pyads.PLCTYPE_LREAL, cached)
 
     def getPosition(self):
         return self.getGenericVariable("stControl.fPosition", pyads.PLCTYPE_LREAL)
@@ -288,76 +1461,98 @@ class axis:
         return self.getGenericVariable(
             f"stConfig.afMultiSlaveAxisRatio[{slaveNum}]", pyads.PLCTYPE_LREAL)
 
-    def getVelocityHomeToCam(self):
-        return self.getGenericVariable("stConfig.fHomingVelToCam", pyads.PLCTYPE_LREAL)
+    def getVelocityHomeToCam(self, cached=True):
+        return self.getCachedVariable("stConfig.fHomingVelToCam", pyads.PLCTYPE_LREAL, cached)
 
-    def getVelocityHomeFromCam(self):
-        return self.getGenericVariable(
-            "stConfig.fHomingVelFromCam", pyads.PLCTYPE_LREAL)
+    def getVelocityHomeFromCam(self, cached=True):
+        return self.getCachedVariable("stConfig.fHomingVelFromCam", pyads.PLCTYPE_LREAL, cached)
 
-    def getVelocityMax(self):
-        return self.getGenericVariable("stConfig.fVeloMax", pyads.PLCTYPE_LREAL)
+    def getVelocityMax(self, cached=True):
+        return self.getCachedVariable("stConfig.fVeloMax", pyads.PLCTYPE_LREAL, cached)
     
-    def getAccelMax(self):
-        return self.getGenericVariable("stConfig.fMaxAcc", pyads.PLCTYPE_LREAL)
+    def getAccelMax(self, cached=True):
+        return self.getCachedVariable("stConfig.fMaxAcc", pyads.PLCTYPE_LREAL, cached)
 
-    def getDecelMax(self):
-        return self.getGenericVariable("stConfig.fMaxDec", pyads.PLCTYPE_LREAL)
+    def getDecelMax(self, cached=True):
+        return self.getCachedVariable("stConfig.fMaxDec", pyads.PLCTYPE_LREAL, cached)
 
-    def getSoftLimitFwdValue(self):
-        return self.getGenericVariable("stConfig.fMaxSoftPosLimit", pyads.PLCTYPE_LREAL)
+    def getSoftLimitFwdValue(self, cached=True):
+        return self.getCachedVariable("stConfig.fMaxSoftPosLimit", pyads.PLCTYPE_LREAL, cached)
 
-    def getSoftLimitBwdValue(self):
-        return self.getGenericVariable("stConfig.fMinSoftPosLimit", pyads.PLCTYPE_LREAL)
+    def getSoftLimitBwdValue(self, cached=True):
+        return self.getCachedVariable("stConfig.fMinSoftPosLimit", pyads.PLCTYPE_LREAL, cached)
 
-    def getSoftLimitFwdEnableStatus(self):
-        return self.getGenericVariable(
-            "stConfig.bEnMaxSoftPosLimit", pyads.PLCTYPE_BOOL)
+    def getSoftLimitFwdEnableStatus(self, cached=True):
+        return self.getCachedVariable("stConfig.bEnMaxSoftPosLimit", pyads.PLCTYPE_BOOL, cached)
 
-    def getSoftLimitBwdEnableStatus(self):
-        return self.getGenericVariable(
-            "stConfig.bEnMinSoftPosLimit", pyads.PLCTYPE_BOOL)
+    def getSoftLimitBwdEnableStatus(self, cached=True):
+        return self.getCachedVariable("stConfig.bEnMinSoftPosLimit", pyads.PLCTYPE_BOOL, cached)
 
-    def getAxisVeloManFast(self):
-        return self.getGenericVariable(
-            "stConfig.fVelocityDefaultFast", pyads.PLCTYPE_LREAL)
+    def getAxisVeloManFast(self, cached=True):
+        return self.getCachedVariable("stConfig.fVelocityDefaultFast", pyads.PLCTYPE_LREAL, cached)
 
-    def getAxisVeloManSlow(self):
-        return self.getGenericVariable(
-            "stConfig.fVelocityDefaultSlow", pyads.PLCTYPE_LREAL)
+    def getAxisVeloManSlow(self, cached=True):
+        return self.getCachedVariable("stConfig.fVelocityDefaultSlow", pyads.PLCTYPE_LREAL, cached)
 
-    def getAxisEnPositionLagMonitoring(self):
-        return self.getGenericVariable(
-            "stConfig.bEnPositionLagMonitoring", pyads.PLCTYPE_BOOL)
+    def getAxisEnPositionLagMonitoring(self, cached=True):
+        return self.getCachedVariable("stConfig.bEnPositionLagMonitoring", pyads.PLCTYPE_BOOL, cached)
 
-    def getAxisPositionLagValue(self):
-        return self.getGenericVariable("stConfig.fMaxPosLagValue", pyads.PLCTYPE_LREAL)
+    def getAxisPositionLagValue(self, cached=True):
+        return self.getCachedVariable("stConfig.fMaxPosLagValue", pyads.PLCTYPE_LREAL, cached)
 
-    def getAxisEnTargetPositionMonitoring(self):
-        return self.getGenericVariable(
-            "stConfig.bEnTargetPositionMonitoring", pyads.PLCTYPE_BOOL
-        )
+    def getAxisEnTargetPositionMonitoring(self, cached=True):
+        return self.getCachedVariable("stConfig.bEnTargetPositionMonitoring", pyads.PLCTYPE_BOOL, cached)
 
-    def getAxisTargetPositionWindow(self):
-        return self.getGenericVariable(
-            "stConfig.fTargetPositionWindow", pyads.PLCTYPE_LREAL
-        )
+    def getAxisTargetPositionWindow(self, cached=True):
+        return self.getCachedVariable("stConfig.fTargetPositionWindow", pyads.PLCTYPE_LREAL, cached)
 
     # Get ST_Input variables
-    def getLimitFwd(self):
-        return self.getGenericVariable("stInputs.bLimitFwd", pyads.PLCTYPE_BOOL)
+    def getLimitFwd(self, snapshot=None):
+        return self.getGenericVariable("stInputs.bLimitFwd", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getLimitBwd(self):
-        return self.getGenericVariable("stInputs.bLimitBwd", pyads.PLCTYPE_BOOL)
+    def getLimitBwd(self, snapshot=None):
+        return self.getGenericVariable("stInputs.bLimitBwd", pyads.PLCTYPE_BOOL, snapshot)
 
-    def getHomeSwitch(self):
-        return self.getGenericVariable("stInputs.bHome", pyads.PLCTYPE_BOOL)
+    def getHomeSwitch(self, snapshot=None):
+        return self.getGenericVariable("stInputs.bHome", pyads.PLCTYPE_BOOL, snapshot)
 
     # Generic function for setting any variable on the plc
     def setGenericVariable(self, plcVarPath, plcVarValue, plcVarType):
-        plcVarName = f"GVL.astAxes[{self.axisNum}].{plcVarPath}"
-        print(f"{dateTimeObj.now()} {plcVarName}={plcVarValue}")
-        self.plc.connection.write_by_name(plcVarName, plcVarValue, plcVarType)
+        plcVarName = self.varName(plcVarPath)
+        variableLog.write(plcVarName, plcVarValue)
+        self.plc.writeByName(plcVarName, plcVarValue, plcVarType)
+        if plcVarPath in CACHED_AXIS_VARIABLES:
+            self.parameterCache.set(plcVarPath, plcVarValue)
+
+    # Sets several variables in one ADS round trip, in the given order
+    # plcVarPathsValuesTypes is a list of (plcVarPath, value, plcVarType)
+    # Enum values like E_MotionFunctions are written as their value
+    def setGenericVariables(self, plcVarPathsValuesTypes):
+        writes = []
+        for plcVarPath, plcVarValue, plcVarType in plcVarPathsValuesTypes:
+            plcVarName = self.varName(plcVarPath)
+            if isinstance(plcVarValue, Enum):
+                variableLog.write(plcVarName, plcVarValue.name)
+                plcVarValue = plcVarValue.value
+            else:
+                variableLog.write(plcVarName, plcVarValue)
+            writes.append((plcVarName, plcVarValue, plcVarType))
+        self.plc.writeMany(writes)
+        for (plcVarPath, _, _), (_, plcVarValue, _) in zip(plcVarPathsValuesTypes, writes):
+            if plcVarPath in CACHED_AXIS_VARIABLES:
+                self.parameterCache.set(plcVarPath, plcVarValue)
+
+    # Parameters, eCommand and the bExecute edge of a command in one sum write
+    # so the PLC never sees the new eCommand with stale parameters
+    # parameters is a list of (plcVarPath, value, plcVarType)
+    def executeCommand(self, command, parameters=()):
+        self.setGenericVariables(
+            list(parameters)
+            + [
+                ("stControl.eCommand", command, pyads.PLCTYPE_INT),
+                ("stControl.bExecute", True, pyads.PLCTYPE_BOOL),
+            ]
+        )
 
     # Set ST_Control variables
     def executeAxis(self):
@@ -369,6 +1564,14 @@ class axis:
     def haltAxis(self):
         self.setGenericVariable("stControl.bHalt", True, pyads.PLCTYPE_BOOL)
 
+    # Halts the axis and waits until the plc took the halt (bHalt reset, at most
+    # SLEEP_INTERVAL), so it can't stop the next command, and the axis stands still
+    def haltAxisAndWait(self, timeout=30):
+        self.haltAxis()
+        self.plc.pollFor(
+            lambda: not self.getGenericVariable("stControl.bHalt", pyads.PLCTYPE_BOOL), SLEEP_INTERVAL)
+        return self.waitForStop(timeout)
+
     def stopAxis(self):
         self.setGenericVariable("stControl.bStop", True, pyads.PLCTYPE_BOOL)
 
@@ -379,9 +1582,9 @@ class axis:
         self.setGenericVariable("stControl.bEnable", False, pyads.PLCTYPE_BOOL)
 
     def setMotionCommand(self, command): #Called by the functions regarding a move
-        plcVarName = f"GVL.astAxes[{self.axisNum}].stControl.eCommand"
-        print(f"{dateTimeObj.now()} {plcVarName}={command.name}")
-        self.plc.connection.write_by_name(plcVarName, command.value, pyads.PLCTYPE_INT)
+        plcVarName = self.varName("stControl.eCommand")
+        variableLog.write(plcVarName, command.name)
+        self.plc.writeByName(plcVarName, command.value, pyads.PLCTYPE_INT)
 
     def setVelocity(self, value):
         self.setGenericVariable("stControl.fVelocity", value, pyads.PLCTYPE_LREAL)
@@ -409,9 +1612,10 @@ class axis:
         self.setGenericVariable("stConfig.fHomeFinishDistance", value, pyads.PLCTYPE_LREAL)
 
     def setHomeSequence(self, sequence): #Called by the function home() and homeSpecific()
-        plcVarName = f"GVL.astAxes[{self.axisNum}].stConfig.eHomeSeq"
-        print(f"{dateTimeObj.now()} {plcVarName}={sequence.name}")
-        self.plc.connection.write_by_name(plcVarName, sequence.value, pyads.PLCTYPE_INT)
+        plcVarName = self.varName("stConfig.eHomeSeq")
+        variableLog.write(plcVarName, sequence.name)
+        self.plc.writeByName(plcVarName, sequence.value, pyads.PLCTYPE_INT)
+        self.parameterCache.set("stConfig.eHomeSeq", sequence.value)
 
     def setMultiMasterAxis(self, masterNum, masterAxisNum, gearRatio):
         self.setGenericVariable(
@@ -467,41 +1671,45 @@ class axis:
     ###Motion commands###
     def moveAbsolute(self, position):
         print(f"Axis {self.axisNum}: Move absolute to position {position:.2f}")
-        self.setPosition(position)
-        self.setMotionCommand(E_MotionFunctions.eMoveAbsolute)
-        self.executeAxis()
+        self.executeCommand(
+            E_MotionFunctions.eMoveAbsolute, [("stControl.fPosition", position, pyads.PLCTYPE_LREAL)])
 
     def moveAbsoluteAndWait(self, position):
+        expectedDuration = self.calcTravelTimeForPosition(position, marginOfSafety=1)
         self.moveAbsolute(position)
-        timeout = self.calcTravelTimeForMove()+1
-        self.waitForCommandDone(timeoutDoneTrue=timeout)
+        timeout = expectedDuration*MOVE_TIME_MARGIN+MOVE_TIME_SLACK
+        self.waitForCommandDone(
+            timeoutDoneTrue=timeout, expectedDuration=expectedDuration, targetPosition=position)
         return self.getDoneStatus()
 
     def moveRelative(self, position):
         print(f"Axis {self.axisNum}: Move relative to position {position:.2f}")
-        self.setPosition(position)
-        self.setMotionCommand(E_MotionFunctions.eMoveRelative)
-        self.executeAxis()
+        self.executeCommand(
+            E_MotionFunctions.eMoveRelative, [("stControl.fPosition", position, pyads.PLCTYPE_LREAL)])
 
     def moveRelativeAndWait(self, position):
+        startPosition = self.getActPos()
+        expectedDuration = self.calcTravelTimeForPosition(startPosition + position, marginOfSafety=1)
         self.moveRelative(position)
-        timeout = self.calcTravelTimeForMove()+1
-        self.waitForCommandDone(timeoutDoneTrue=timeout)
+        timeout = expectedDuration*MOVE_TIME_MARGIN+MOVE_TIME_SLACK
+        self.waitForCommandDone(
+            timeoutDoneTrue=timeout, expectedDuration=expectedDuration,
+            targetPosition=startPosition + position)
         return self.getDoneStatus()
 
     def jogFwd(self):
         #self.setMotionCommand(E_MotionFunctions.eJog)
         #self.setGenericVariable("stControl.bJogFwd", True, pyads.PLCTYPE_BOOL)
-        self.setVelocity(self.getAxisVeloManSlow())
-        self.setMotionCommand(E_MotionFunctions.eMoveVelocity)
-        self.executeAxis()
+        self.executeCommand(
+            E_MotionFunctions.eMoveVelocity,
+            [("stControl.fVelocity", self.getAxisVeloManSlow(), pyads.PLCTYPE_LREAL)])
 
     def jogBwd(self):
         #self.setMotionCommand(E_MotionFunctions.eJog)
         #self.setGenericVariable("stControl.bJogBwd", True, pyads.PLCTYPE_BOOL)
-        self.setVelocity(-(self.getAxisVeloManSlow()))
-        self.setMotionCommand(E_MotionFunctions.eMoveVelocity)
-        self.executeAxis()
+        self.executeCommand(
+            E_MotionFunctions.eMoveVelocity,
+            [("stControl.fVelocity", -(self.getAxisVeloManSlow()), pyads.PLCTYPE_LREAL)])
 
     def jogStop(self):
         #self.setGenericVariable("stControl.bJogFwd", False, pyads.PLCTYPE_BOOL)
@@ -510,100 +1718,105 @@ class axis:
 
     def moveVelocity(self, velocity):
         print(f"Axis {self.axisNum}: Move velocity with speed {velocity:.2f}")
-        self.setVelocity(velocity)
-        self.setMotionCommand(E_MotionFunctions.eMoveVelocity)
-        self.executeAxis()
-
-    def moveToSwitchFwd(self, velo, timeout):
-        print(f"    Activate moving to Forward Limit Switch sequence...")
-        if self.getSoftLimitFwdEnableStatus():
-            print(' Disabling soft limits forward...')
-            self.setFwdSoftLimitsOff()
-            time.sleep(SLEEP_INTERVAL)
-            self.setBwdSoftLimitsOff()
-            time.sleep(SLEEP_INTERVAL)
-            if self.getSoftLimitFwdEnableStatus() or self.getSoftLimitBwdEnableStatus():
-                print(f'    Error: Failed to disable soft limits')
-                return False
-              
-        else:
+        self.executeCommand(
+            E_MotionFunctions.eMoveVelocity, [("stControl.fVelocity", velocity, pyads.PLCTYPE_LREAL)])
+
+    # Switches both soft limits off so the axis can reach its limit switches
+    # Returns False if the plc doesn't show them off within timeout
+    # The enables are read from the plc, not the cache: they can have been
+    # switched on again from the plc or HMI since they were cached
+    def disableSoftLimits(self, timeout=SLEEP_INTERVAL):
+        if not self.getSoftLimitFwdEnableStatus(cached=False) and not self.getSoftLimitBwdEnableStatus(cached=False):
             print(f"    Soft limits disabled, starting movement")
-
-        if not self.getLimitFwd():
-            print("     Axis possibly on the limit switch, moving away of it...")
-            for i in range(3):
-                if self.moveRelativeAndWait(-3):
-                    time.sleep(1)
-                    if self.getLimitFwd():
-                        print("     Axis not on the limit switch anymore...")
-                        break
-                    else:
-                        i += 1
-                if i == 3:
-                    print("     ERROR: Timeout. Possibly limit without Power")
-                    return False
-                    
-        print('     Moving to Fwd Swtich...')
-        time.sleep(SLEEP_INTERVAL)
-        self.moveVelocity(velo)
-        
-        if self.waitForStatusBit(self.getLimitFwd, False, timeout):
-            print('     Fwd Limit reached...')
-            self.haltAxis()
-            time.sleep(SLEEP_INTERVAL)
             return True
-        else:
-            print(f'    ERROR: Axis {self.axisNum}: Timeout error waiting for LimitFwd to return False')
-            self.haltAxis()
+        print(' Disabling soft limits...')
+        self.setFwdSoftLimitsOff()
+        self.setBwdSoftLimitsOff()
+        if self.plc.pollFor(
+            lambda: not self.getSoftLimitFwdEnableStatus(cached=False)
+            and not self.getSoftLimitBwdEnableStatus(cached=False),
+            timeout,
+        ):
+            return True
+        print(f'    Error: Failed to disable soft limits')
+        return False
+
+    # Waits until the limit switch input limitVarPath reads limitValue and returns
+    # the actual position read with it, None on timeout or an axis error.
+    # The edge is caught by polling every pollIntervalMin: the input, bError and
+    # the position come from the same sum read, i.e. the same plc cycle, which
+    # notifications can't guarantee
+    def waitForSwitch(self, limitVarPath, limitValue, timeout):
+        varNames = [
+            self.varName(limitVarPath),
+            self.varName("stStatus.bError"),
+            self.varName("stStatus.fActPosition"),
+        ]
+        latched = []
+
+        def switchReached():
+            limit, error, position = self.plc.readMany(varNames)
+            if error or limit == limitValue:
+                latched.append((error, position))
+                return True
             return False
-    
-    def moveToSwitchBwd(self, velo, timeout):
-        if velo is None: 
-            velo = axis1.getJogVelocity()
-
-        print(f"    Activate moving to Backward Limit Switch sequence...")
-        if self.getSoftLimitFwdEnableStatus() or self.getSoftLimitBwdEnableStatus():
-            print(' Disabling soft limits...')
-            self.setFwdSoftLimitsOff()
-            time.sleep(SLEEP_INTERVAL)
-            self.setBwdSoftLimitsOff()
-            time.sleep(SLEEP_INTERVAL)
-            if self.getSoftLimitFwdEnableStatus() or self.getSoftLimitBwdEnableStatus():
-                print(f'    Error: Failed to disable soft limits')
-                return False
-                
-        else:
-            print(f"    Soft limits disabled, starting movement")
-
-        if not self.getLimitBwd():
-            print("     Axis possibly on the limit switch, moving away of it...")
-            for i in range(3):
-                if self.moveRelativeAndWait(3):
-                    time.sleep(1)
-                    if self.getLimitBwd():
-                        print("     Axis not on the limit switch anymore...")
-                        break
-                    else:
-                        i += 1
-                if i == 3:
-                    print("     ERROR: Timeout. Possibly limit without Power")
-                    return False
-                    
-        print('     Moving to Bwd Swtich...')
-        time.sleep(SLEEP_INTERVAL)
-        self.moveVelocity(-velo)
 
-        if self.waitForStatusBit(self.getLimitBwd, False, timeout):
-            print('     Bwd Limit reached...')
-            self.haltAxis()
-            time.sleep(SLEEP_INTERVAL)
-            return True
+        if not self.plc.pollFor(switchReached, timeout, self.plc.pollIntervalMin):
+            return None
+        error, position = latched[0]
+        if error:
+            print(f"  Axis {self.axisNum} Error: axis error while searching the limit switch")
+            return None
+        return position
+
+    # Position of a limit switch (direction 1 forward, -1 backward) found in two
+    # passes: towards it at fastVelo, back at slowVelo until it's released and
+    # towards it again at slowVelo, so the edge is always crossed the same way
+    # at the same speed. The velocities default to the manual fast and slow
+    # velocities of the axis. Returns None if a pass times out
+    def searchSwitch(self, direction, fastVelo=None, slowVelo=None, timeout=30):
+        limitVarPath = "stInputs.bLimitFwd" if direction > 0 else "stInputs.bLimitBwd"
+        switchName = "Fwd" if direction > 0 else "Bwd"
+        fastVelo = abs(fastVelo or self.getAxisVeloManFast())
+        slowVelo = abs(slowVelo or self.getAxisVeloManSlow())
+        print(f"    Activate moving to {switchName} Limit Switch sequence...")
+        if not self.disableSoftLimits():
+            return None
+
+        # The limit switches are normally closed, the input is False on the switch
+        if self.getGenericVariable(limitVarPath, pyads.PLCTYPE_BOOL):
+            print(f'     Moving to {switchName} Switch...')
+            self.moveVelocity(direction * fastVelo)
+            if self.waitForSwitch(limitVarPath, False, timeout) is None:
+                print(f'    ERROR: Axis {self.axisNum}: Timeout error waiting for Limit{switchName} to return False')
+                self.haltAxisAndWait()
+                return None
+            self.haltAxisAndWait()
         else:
-            print(f'    ERROR: Axis {self.axisNum}: Timeout error waiting for LimitFwd to return False')
-            self.haltAxis()
-            return False
-            
-            
+            print("     Axis on the limit switch, moving away of it...")
+
+        self.moveVelocity(-direction * slowVelo)
+        if self.waitForSwitch(limitVarPath, True, timeout) is None:
+            print("     ERROR: Timeout. Possibly limit without Power")
+            self.haltAxisAndWait()
+            return None
+        self.haltAxisAndWait()
+
+        self.moveVelocity(direction * slowVelo)
+        switchPosition = self.waitForSwitch(limitVarPath, False, timeout)
+        self.haltAxisAndWait()
+        if switchPosition is None:
+            print(f'    ERROR: Axis {self.axisNum}: Timeout error waiting for Limit{switchName} to return False')
+            return None
+        print(f'     {switchName} Limit reached at {switchPosition:.3f}')
+        return switchPosition
+
+    def moveToSwitchFwd(self, velo=None, timeout=30, slowVelo=None):
+        return self.searchSwitch(1, velo, slowVelo, timeout) is not None
+
+    def moveToSwitchBwd(self, velo=None, timeout=30, slowVelo=None):
+        return self.searchSwitch(-1, velo, slowVelo, timeout) is not None
+
     def gearInMultiMaster(
         self,
         master1=None,
@@ -621,120 +1834,151 @@ class axis:
         print(f"MasterAxis3 = {master3} with GearRatio3 = {ratio3}")
         print(f"MasterAxis4 = {master4} with GearRatio4 = {ratio4}")
 
-        self.setMotionCommand(E_MotionFunctions.eGearInMultiMaster)
-        if not master1 == None:
-            self.setMultiMasterAxis(1, master1, ratio1)
-        if not master2 == None:
-            self.setMultiMasterAxis(2, master2, ratio2)
-        if not master3 == None:
-            self.setMultiMasterAxis(3, master3, ratio3)
-        if not master4 == None:
-            self.setMultiMasterAxis(4, master4, ratio4)
-
-        self.executeAxis()
+        parameters = []
+        for masterNum, masterAxisNum, gearRatio in (
+            (1, master1, ratio1), (2, master2, ratio2), (3, master3, ratio3), (4, master4, ratio4)
+        ):
+            if not masterAxisNum == None:
+                parameters += [
+                    (f"stConfig.astMultiMasterAxis[{masterNum}].nIndex", masterAxisNum, pyads.PLCTYPE_UINT),
+                    (f"stConfig.astMultiMasterAxis[{masterNum}].fRatio", gearRatio, pyads.PLCTYPE_LREAL),
+                ]
+        self.executeCommand(E_MotionFunctions.eGearInMultiMaster, parameters)
 
     def gearOut(self):
         print(f"Axis {self.axisNum}: Gear Out")
-        self.setMotionCommand(E_MotionFunctions.eGearOut)
-        self.executeAxis()
+        self.executeCommand(E_MotionFunctions.eGearOut)
 
     def homeSpecific(self, homeSeq, homePos=0, homeFinishDist=0):
         print(f"Axis {self.axisNum}: Home with HomeSeq={homeSeq}, HomePos={homePos}, HomeFinishDistance={homeFinishDist}")
-        self.setHomeSequence(E_HomingRoutines(homeSeq))
-        self.setHomePosition(homePos)
-        self.setHomeFinishDistance(homeFinishDist)
-        self.setMotionCommand(E_MotionFunctions.eHome)
-        self.executeAxis()
+        self.executeCommand(
+            E_MotionFunctions.eHome,
+            [
+                ("stConfig.eHomeSeq", E_HomingRoutines(homeSeq), pyads.PLCTYPE_INT),
+                ("stConfig.fHomePosition", homePos, pyads.PLCTYPE_LREAL),
+                ("stConfig.fHomeFinishDistance", homeFinishDist, pyads.PLCTYPE_LREAL),
+            ],
+        )
 
     def home(self):
         self.homeSeq = self.getHomeSequence()
         self.homePos = self.getHomePosition()
         self.homeFinishDist = self.getHomeFinishDistance()
         print(f"Axis {self.axisNum}: Home with HomeSeq={self.homeSeq}, HomePos={self.homePos}, HomeFinishDistance={self.homeFinishDist}")
-        self.setMotionCommand(E_MotionFunctions.eHome)
-        self.executeAxis()
+        self.executeCommand(E_MotionFunctions.eHome)
+
+    # The NC axis ID isn't necessarily the index in GVL.astAxes
+    def getNcAxisId(self):
+        if self.ncAxisId is None:
+            self.ncAxisId = self.plc.readByName(
+                self.varName("Axis.NcToPlc.AxisId"), pyads.PLCTYPE_UDINT)
+        return self.ncAxisId
+
+    # Reads NC parameters straight from the NC in one round trip
+    # Returns a dict of the values keyed by E_AxisParameters
+    def readNcAxisParams(self, axisParams):
+        axisParams = list(axisParams)
+        ncAxisId = self.getNcAxisId()
+        values = self.plc.readNcParameters([(ncAxisId, axisParam) for axisParam in axisParams])
+        for axisParam, value in zip(axisParams, values):
+            variableLog.read(f"{self.varName('Axis')}.{axisParam.name}", value)
+            self.cacheNcAxisParam(axisParam, value)
+        return dict(zip(axisParams, values))
+
+    # Writes NC parameters straight to the NC in one round trip
+    # axisParamValues is a dict of the values keyed by E_AxisParameters
+    def writeNcAxisParams(self, axisParamValues):
+        ncAxisId = self.getNcAxisId()
+        for axisParam, value in axisParamValues.items():
+            variableLog.write(f"{self.varName('Axis')}.{axisParam.name}", value)
+        self.plc.writeNcParameters(
+            [(ncAxisId, axisParam, value) for axisParam, value in axisParamValues.items()])
+        for axisParam, value in axisParamValues.items():
+            self.cacheNcAxisParam(axisParam, value)
+
+    # Keeps the cached NC parameter and the stConfig variable showing it up to date
+    def cacheNcAxisParam(self, axisParam, value):
+        if axisParam in LIVE_NC_PARAMETERS:
+            return
+        self.parameterCache.set(axisParam, value)
+        plcVarPath = NC_PARAMETER_CONFIG_VARIABLES.get(axisParam)
+        if plcVarPath is not None:
+            if CACHED_AXIS_VARIABLES[plcVarPath] == pyads.PLCTYPE_BOOL:
+                value = bool(value)
+            self.parameterCache.set(plcVarPath, value)
 
     def setNcAxisParam(self, axisParam, writeAxisParam):
-        self.setMotionCommand(E_MotionFunctions.eWriteParameter)
-
-        plcVarName = f"GVL.astAxes[{self.axisNum}].stConfig.eAxisParameters"
-        print(f"{dateTimeObj.now()} {plcVarName}={axisParam.name}")
-        self.plc.connection.write_by_name(
-            plcVarName, axisParam.value, pyads.PLCTYPE_INT
+        if self.plc.directNcAccess and axisParam in NC_AXIS_PARAMETER_ADDRESSES:
+            try:
+                self.writeNcAxisParams({axisParam: writeAxisParam})
+                return
+            except (pyads.ADSError, ValueError) as e:
+                print(f"  Axis {self.axisNum}: Direct write of {axisParam.name} failed ({e}), using eWriteParameter")
+        self.executeCommand(
+            E_MotionFunctions.eWriteParameter,
+            [
+                ("stConfig.eAxisParameters", axisParam, pyads.PLCTYPE_INT),
+                ("stConfig.fWriteAxisParameter", writeAxisParam, pyads.PLCTYPE_LREAL),
+            ],
         )
-
-        plcVarName = f"GVL.astAxes[{self.axisNum}].stConfig.fWriteAxisParameter"
-        print(f"{dateTimeObj.now()} {plcVarName}={writeAxisParam}")
-        self.plc.connection.write_by_name(
-            plcVarName, writeAxisParam, pyads.PLCTYPE_LREAL
-        )
-
-        self.executeAxis()
         time.sleep(0.05)
-
-    def getNcAxisParam(self, axisParam):
-        self.setMotionCommand(E_MotionFunctions.eReadParameter)
-
-        plcVarName = f"GVL.astAxes[{self.axisNum}].stConfig.eAxisParameters"
-        print(f"{dateTimeObj.now()} {plcVarName}={axisParam.name}")
-        self.plc.connection.write_by_name(
-            plcVarName, axisParam.value, pyads.PLCTYPE_INT
+        self.cacheNcAxisParam(axisParam, writeAxisParam)
+
+    def getNcAxisParam(self, axisParam, cached=True):
+        if cached:
+            found, value = self.parameterCache.get(axisParam)
+            if found:
+                return value
+        if self.plc.directNcAccess and axisParam in NC_AXIS_PARAMETER_ADDRESSES:
+            try:
+                return self.readNcAxisParams([axisParam])[axisParam]
+            except pyads.ADSError as e:
+                print(f"  Axis {self.axisNum}: Direct read of {axisParam.name} failed ({e}), using eReadParameter")
+        self.executeCommand(
+            E_MotionFunctions.eReadParameter,
+            [("stConfig.eAxisParameters", axisParam, pyads.PLCTYPE_INT)],
         )
-        self.executeAxis()
         time.sleep(SLEEP_INTERVAL)
 
-        plcVarName = f"GVL.astAxes[{self.axisNum}].stConfig.fReadAxisParameter"
-        readAxisParam = self.plc.connection.read_by_name(
+        plcVarName = self.varName("stConfig.fReadAxisParameter")
+        readAxisParam = self.plc.readByName(
             plcVarName, pyads.PLCTYPE_LREAL
         )
-        print(f"{dateTimeObj.now()} {plcVarName}=?: {readAxisParam}")
+        variableLog.read(plcVarName, readAxisParam)
+        self.cacheNcAxisParam(axisParam, readAxisParam)
 
         return readAxisParam
 
     ###Functions useful for testing###
 
-    #This function disables, reset and enables the axis
-    def axisInit(self):
-        #Disable Axis
-        if self.getEnabledStatus():
-            print(f"    Disabling Axis...")
-            self.disableAxis()
-            time.sleep(1)
-            if self.waitForStatusBit(self.getEnabledStatus, False):
-                print(f"    Axis disabled")
-        else:
-            print("     Axis disabled")
-
-        #Reset Axis
-        print('     Resetting axis...')
-        self.resetAxis()
-        time.sleep(SLEEP_INTERVAL)
-
-        #Enable Axis
-        if not self.getEnabledStatus():
-            print(f"    Enabling Axis...")
-            self.enableAxis()
-            time.sleep(SLEEP_INTERVAL)
-            if self.waitForStatusBit(self.getEnabledStatus, True):
-                print(f"    Axis Enabled")
+    #This function disables, reset and enables the axis, see initAxes
+    #Returns True if the plc acknowledged every step
+    def axisInit(self, timeout=AXIS_INIT_TIMEOUT):
+        return not initAxes([self], timeout)
 
-    def waitForVariable(self, varName, plcVarType, expectedValue, timeout=30, sleepInterval=SLEEP_INTERVAL):
+    def waitForVariable(
+        self, varName, plcVarType, expectedValue, timeout=30, sleepInterval=None, expectedDuration=None
+    ):
          # If timeout is negative time then just use a default
         if timeout < 0:
             timeout = 1
 
-        timeLimit = time.time() + timeout
-        timeoutError = False
-        while True:
-            variableValue=self.plc.connection.read_by_name(varName, plcVarType)
+        notified = self.plc.waitForCondition(
+            [(varName, plcVarType)], lambda value: str(value) == str(expectedValue), timeout
+        )
+        if notified is not None:
+            timeoutError = not notified
+            variableValue = self.plc.getNotifiedValue(varName)
+        else:
+            lastValue = [None]
+
+            def hasExpectedValue():
+                lastValue[0] = self.plc.readByName(varName, plcVarType)
+                return str(lastValue[0]) == str(expectedValue)
 
-            if str(variableValue) == str(expectedValue):
-                break
-            if time.time() > timeLimit:
-                timeoutError = True
-                break
-            if sleepInterval > 0:
-                time.sleep(sleepInterval)
+            timeoutError = not self.plc.pollFor(
+                hasExpectedValue, timeout, sleepInterval, expectedDuration)
+            variableValue = lastValue[0]
 
         if timeoutError:
             print(
@@ -747,23 +1991,21 @@ class axis:
     # boolValue is the status you're waiting for
     # if you're waiting a bit to go high then this should be True
     def waitForStatusBit(
-        self, getStatusBitFunction, boolValue, timeout=30, sleepInterval=SLEEP_INTERVAL
+        self, getStatusBitFunction, boolValue, timeout=30, sleepInterval=None, expectedDuration=None
     ):
         # If timeout is negative time then just use a default
         if timeout < 0:
             timeout = 1
 
-        timeLimit = time.time() + timeout
-        timeoutError = False
-        while True:
-            statusBit = getStatusBitFunction()
-            if statusBit == boolValue:
-                break
-            if time.time() > timeLimit:
-                timeoutError = True
-                break
-            if sleepInterval > 0:
-                time.sleep(sleepInterval)
+        notified = self.plc.waitForGetter(
+            getStatusBitFunction, lambda statusBit: statusBit == boolValue, timeout
+        )
+        if notified is not None:
+            timeoutError = not notified
+        else:
+            timeoutError = not self.plc.pollFor(
+                lambda: getStatusBitFunction() == boolValue, timeout, sleepInterval, expectedDuration
+            )
 
         if timeoutError:
             print(
@@ -777,66 +2019,135 @@ class axis:
         return self.waitForStatusBit(self.getCommandAbortedStatus, True)
     
     # This ones a bit different to the previous generic waitForStatusBit
-    # It waits for bDone to go low, then bBusy high, then bDone high
+    # It follows bDone low, then bBusy high, then bDone high with a
+    # HandshakeTracker that gets bDone, bBusy, bError and bCommandAborted
+    # together, from notifications or from one status snapshot per poll
+    # Returns a CommandOutcome, which is True only if the command is done
+    # targetPosition lets a command that finished between two polls be recognised
     def waitForCommandDone(
         self,
         timeoutDoneFalse=5,
         timeoutBusyTrue=5,
         timeoutDoneTrue=30,
-        sleepInterval=SLEEP_INTERVAL,
+        sleepInterval=None,
+        expectedDuration=None,
+        targetPosition=None,
     ):
-        if not self.waitForStatusBit(
-            self.getDoneStatus,
-            False,
-            timeout=timeoutDoneFalse,
-            sleepInterval=sleepInterval,
-        ):
-            print(
-                f"  Axis {self.axisNum} Error: bDone status did not go low within {timeoutDoneFalse} seconds"
-            )
-            return False
-        if not self.waitForStatusBit(
-            self.getBusyStatus,
-            True,
-            timeout=timeoutBusyTrue,
-            sleepInterval=sleepInterval,
-        ):
-            print(
-                f"  Axis {self.axisNum} Error: bBusy status did not go high within {timeoutBusyTrue} seconds"
-            )
-            return False
-        if not self.waitForStatusBit(
-            self.getDoneStatus,
-            True,
-            timeout=timeoutDoneTrue,
-            sleepInterval=sleepInterval,
+        tracker = HandshakeTracker(
+            timeoutDoneFalse,
+            timeoutBusyTrue,
+            timeoutDoneTrue,
+            targetPosition,
+            self.getAxisTargetPositionWindow() if targetPosition is not None else 0.0,
+            self.getActPos,
+            self.plc.executeResetByPlc,
+            self.plc.commandLatency,
+        )
+        if self.plc.useNotifications and all(
+            self.plc.subscribe(self.varName(plcVarPath), plcVarType)
+            for plcVarPath, plcVarType in NOTIFIED_HANDSHAKE_VARIABLES.items()
         ):
-            print(
-                f"  Axis {self.axisNum} Error: bDone status did not go high within {timeoutDoneTrue} seconds"
+            outcome = self.trackCommandByNotification(tracker)
+        else:
+            outcome = self.trackCommandByPolling(tracker, sleepInterval, expectedDuration)
+        self.reportCommandOutcome(outcome, tracker)
+        return outcome
+
+    # Prints why the command followed by tracker didn't finish, if it didn't
+    def reportCommandOutcome(self, outcome, tracker):
+        if outcome.result == E_CommandResult.eTimeout:
+            message = {
+                E_HandshakePhase.eWaitDoneLow: "bDone status did not go low",
+                E_HandshakePhase.eWaitBusyHigh: "bBusy status did not go high",
+                E_HandshakePhase.eWaitDoneHigh: "bDone status did not go high",
+            }[outcome.phase] + f" within {tracker.timeouts[outcome.phase]} seconds"
+            print(f"  Axis {self.axisNum} Error: {message}")
+        elif outcome.result == E_CommandResult.eError:
+            print(f"  Axis {self.axisNum} Error: command failed with error ID {outcome.errorId:#x}")
+        elif outcome.result == E_CommandResult.eAborted:
+            print(f"  Axis {self.axisNum} Error: command aborted")
+
+    # Feeds every notified change of NOTIFIED_HANDSHAKE_VARIABLES to the tracker in order
+    def trackCommandByNotification(self, tracker):
+        plcVarPaths = {self.varName(plcVarPath): plcVarPath for plcVarPath in NOTIFIED_HANDSHAKE_VARIABLES}
+        changes = queue.Queue()
+
+        def listener(varName, value):
+            if varName in plcVarPaths:
+                changes.put((plcVarPaths[varName], value))
+
+        self.plc.notificationListeners.append(listener)
+        try:
+            status = {
+                plcVarPath: self.plc.getNotifiedValue(varName)
+                for varName, plcVarPath in plcVarPaths.items()
+            }
+            if None in status.values():
+                status.update(zip(
+                    NOTIFIED_HANDSHAKE_VARIABLES, self.getGenericVariables(NOTIFIED_HANDSHAKE_VARIABLES)))
+            while True:
+                now = time.monotonic()
+                outcome = tracker.update(status, now)
+                if outcome is not None:
+                    # The notification of nErrorID can come after the one of bError
+                    if outcome.result == E_CommandResult.eError and not outcome.errorId:
+                        outcome.errorId = self.getErrorId()
+                    return outcome
+                # Wake up now and then to look for a command that finished unnoticed
+                try:
+                    plcVarPath, value = changes.get(
+                        timeout=max(min(tracker.timeLeft(now), self.plc.pollIntervalMax), 0))
+                    status[plcVarPath] = value
+                except queue.Empty:
+                    pass
+        finally:
+            self.plc.notificationListeners.remove(listener)
+
+    # Feeds one status snapshot per poll to the tracker
+    def trackCommandByPolling(self, tracker, sleepInterval=None, expectedDuration=None):
+        schedule = None
+        if sleepInterval is None:
+            schedule = PollSchedule(
+                expectedDuration, self.plc.pollIntervalMin, self.plc.pollIntervalMax, self.plc.pollLeadTime
             )
-            return False
-        return True
+        while True:
+            snapshot = self.getStatusSnapshot()
+            now = time.monotonic()
+            outcome = tracker.update(
+                {f"stStatus.{name}": getattr(snapshot, name) for name, _ in ST_AxisStatus._fields_}, now)
+            if outcome is not None:
+                return outcome
+            interval = sleepInterval if schedule is None else schedule.nextInterval(now)
+            if interval > 0:
+                time.sleep(max(min(interval, tracker.timeLeft(now)), 0))
 
     # This one is also a bit special as I don't think we currently have a
     # stop bit in the ast.axisStruct
     # Therefore this function checks the actual velocity is 0
     def waitForStop(
-        self, timeout=30, sleepInterval=SLEEP_INTERVAL, roundVelDecimalPlaces=2
+        self, timeout=30, sleepInterval=None, roundVelDecimalPlaces=2, expectedDuration=None
     ):
         # If timeout is negative time then just use a default
         if timeout < 0:
             timeout = 1
 
-        timeLimit = time.time() + timeout
-        bTimeoutError = False
-        while True:
-            if round(self.getActVel(), roundVelDecimalPlaces) == 0 or not self.getMovingStatus():
-                break
-            if time.time() > timeLimit:
-                bTimeoutError = True
-                break
-            if sleepInterval > 0:
-                time.sleep(sleepInterval)
+        notified = self.plc.waitForCondition(
+            [
+                (self.varName("stStatus.fActVelocity"), pyads.PLCTYPE_LREAL),
+                (self.varName("stStatus.bMoving"), pyads.PLCTYPE_BOOL),
+            ],
+            lambda actVel, moving: round(actVel, roundVelDecimalPlaces) == 0 or not moving,
+            timeout,
+        )
+        if notified is not None:
+            bTimeoutError = not notified
+        else:
+            bTimeoutError = not self.plc.pollFor(
+                lambda: round(self.getActVel(), roundVelDecimalPlaces) == 0 or not self.getMovingStatus(),
+                timeout,
+                sleepInterval,
+                expectedDuration,
+            )
 
         if bTimeoutError:
             print(
@@ -866,83 +2177,66 @@ class axis:
         else:
             return False
 
-    def calcTravelTimeForMove(self, marginOfSafety=MARGIN_OF_SAFETY):
+    # Velocity, acceleration, deceleration and jerk the NC uses for a move
+    # An acceleration or deceleration of 0 makes the axis use its configured
+    # maximum (stConfig.fMaxAcc/fMaxDec), so that is returned instead
+    # The jerk is the NC parameter AxisDefaultJerk, 0 (no jerk limit) if it can't be read
+    def getMoveProfileParameters(self):
+        try:
+            jerk = self.getNcAxisParam(E_AxisParameters.AxisDefaultJerk)
+        except pyads.ADSError as e:
+            print(f"  Axis {self.axisNum}: Can't read AxisDefaultJerk ({e}), assuming no jerk limit")
+            jerk = 0.0
+        return (
+            self.getVelocity(),
+            self.getAcceleration() or self.getAccelMax(),
+            self.getDeceleration() or self.getDecelMax(),
+            jerk,
+        )
+
+    # Estimated times of moves to each of finalPositions as a NumPy array.
+    # Moves start from startPositions, or from the actual position if None, and
+    # use the current velocity, acceleration, deceleration and jerk of the axis.
+    def calcTravelTimes(self, finalPositions, startPositions=None, marginOfSafety=MOVE_TIME_MARGIN):
+        # NumPy is only imported once a move time is needed, see moveProfile
+        from moveProfile import moveTimes
+        if startPositions is None:
+            startPositions = self.getActPos()
+        vel, acc, dec, jerk = self.getMoveProfileParameters()
+        return moveTimes(startPositions, finalPositions, vel, acc, dec, jerk) * marginOfSafety
+
+    # Estimated time of the move from the actual position to finalPos
+    def calcTravelTimeForPosition(self, finalPos, marginOfSafety=MOVE_TIME_MARGIN):
         print(f"Calculating expected travel time for current move")
 
-        vel = self.getVelocity()
-        acc = self.getAcceleration()
-        dec = self.getDeceleration()
+        vel, acc, dec, jerk = self.getMoveProfileParameters()
         currentPos = self.getActPos()
-        finalPos = self.getPosition()
 
         print(
-            f"Vel={vel:.2f}, Acc={acc:.2f}, Dec={dec:.2f}, Curr Pos={currentPos:.2f},Final Pos={finalPos:.2f}"
+            f"Vel={vel:.2f}, Acc={acc:.2f}, Dec={dec:.2f}, Jerk={jerk:.2f}, Curr Pos={currentPos:.2f},Final Pos={finalPos:.2f}"
         )
 
-        timeToAcc = abs(vel / acc)
-        timeToDec = abs(vel / dec)
-
-        accDist = 0.5 * acc * timeToAcc * timeToAcc
-        decDist = 0.5 * acc * timeToDec * timeToDec
-
-        distToTravel = abs(currentPos - finalPos)
-
-        distForConstVel = distToTravel - accDist - decDist
-
         if vel == 0:
             print("  Error: Can't divide by a velocity of 0")
             return -1
 
-        timeAtConstVel = abs(distForConstVel / vel)
-
-        totalTravelTime = timeToAcc + timeAtConstVel + timeToDec
-
-        estTravelTime = totalTravelTime * marginOfSafety
-
-        print(
-            f"Estimated time for the move is: {estTravelTime:.2f}s with a safety factor of {marginOfSafety}"
+        from moveProfile import moveTimes
+        estTravelTime = float(
+            moveTimes(currentPos, finalPos, vel, acc, dec, jerk) * marginOfSafety
         )
 
-        return estTravelTime
-
-    def calcTravelTimeForPosition(self, finalPos,  marginOfSafety=MARGIN_OF_SAFETY):
-        print(f"Calculating expected travel time for current move")
-
-        vel = self.getVelocity()
-        acc = self.getAcceleration()
-        dec = self.getDeceleration()
-        currentPos = self.getActPos()
-        
-        print(
-            f"Vel={vel:.2f}, Acc={acc:.2f}, Dec={dec:.2f}, Curr Pos={currentPos:.2f},Final Pos={finalPos:.2f}"
-        )
-
-        timeToAcc = abs(vel / acc)
-        timeToDec = abs(vel / dec)
-
-        accDist = 0.5 * acc * timeToAcc * timeToAcc
-        decDist = 0.5 * acc * timeToDec * timeToDec
-
-        distToTravel = abs(currentPos - finalPos)
-
-        distForConstVel = distToTravel - accDist - decDist
-
-        if vel == 0:
-            print(" Error: Can't divide by a velocity of 0")
-            return -1
-
-        timeAtConstVel = abs(distForConstVel / vel)
-
-        totalTravelTime = timeToAcc + timeAtConstVel + timeToDec
-
-        estTravelTime = totalTravelTime * marginOfSafety
-
         print(
             f"Estimated time for the move is: {estTravelTime:.2f}s with a safety factor of {marginOfSafety}"
         )
 
         return estTravelTime
 
+    # Estimated time of the commanded absolute move (stControl.fPosition)
+    # For a relative move fPosition is a distance, use calcTravelTimeForPosition
+    # with the absolute target instead
+    def calcTravelTimeForMove(self, marginOfSafety=MOVE_TIME_MARGIN):
+        return self.calcTravelTimeForPosition(self.getPosition(), marginOfSafety)
+
     # This calculation uses the soft limits to calculate the max distance the
     # axis would have to move.
     # This distance divided by the homing speed estimates the max homing time
@@ -984,7 +2278,8 @@ class axis:
         setVel = (
             self.getVelocityHomeFromCam()
         )  # perhaps should be changed as it could be to cam as well
-        accel = self.getAcceleration()
+        # 0 is the configured maximum, see getMoveProfileParameters
+        accel = self.getAcceleration() or self.getAccelMax()
 
         if accel == 0:
             print(" Error: Can't divide by an acceleration of 0")
@@ -1009,7 +2304,7 @@ class axis:
         # instead of actVel as there were issues with delays and actVel
         # not always being accurate
         actVel = self.getVelocityMax()
-        decel = self.getDeceleration()
+        decel = self.getDeceleration() or self.getDecelMax()
 
         if decel == 0:
             print(" Error: Can't divide by a deceleration of 0")
@@ -1027,138 +2322,208 @@ class axis:
 
         return estTravelTime
 
+# Reads variables of several axes in one ADS round trip
+# axisVarPaths is a list of (axis, plcVarPath), e.g. [(axis6, "stStatus.bError"), (axis7, "stStatus.bError")]
+# All axes have to be on the same plc; works for axis and PneumaticAxis objects
+def readAxesVariables(axisVarPaths):
+    if not axisVarPaths:
+        return []
+    plcConnection = axisVarPaths[0][0].plc
+    return plcConnection.readMany(
+        [axisObj.varName(plcVarPath) for axisObj, plcVarPath in axisVarPaths])
+
+
+# Disables, resets and enables axes. Each step is written to all axes in one
+# sum write and followed with one sum read per poll until the plc acknowledged
+# it: bEnabled low, bReset cleared, bEnabled high. All axes have to be on the
+# same plc. Returns the axes that didn't acknowledge a step within timeout
+def initAxes(axes, timeout=AXIS_INIT_TIMEOUT):
+    axes = list(axes)
+    if not axes:
+        return []
+    plcConnection = axes[0].plc
+    failed = []
+
+    def initStep(message, stepAxes, plcVarPath, plcVarValue, ackVarPath, ackValue):
+        if not stepAxes:
+            return
+        print(f"    {message} axis {', '.join(str(axisObj.axisNum) for axisObj in stepAxes)}...")
+        writes = [(axisObj.varName(plcVarPath), plcVarValue, pyads.PLCTYPE_BOOL) for axisObj in stepAxes]
+        for plcVarName, value, _ in writes:
+            variableLog.write(plcVarName, value)
+        plcConnection.writeMany(writes)
+        pending = list(stepAxes)
+
+        def acknowledged():
+            values = plcConnection.readMany([axisObj.varName(ackVarPath) for axisObj in pending])
+            pending[:] = [axisObj for axisObj, value in zip(pending, values) if value != ackValue]
+            return not pending
+
+        plcConnection.pollFor(acknowledged, timeout)
+        for axisObj in pending:
+            print(f"  Axis {axisObj.axisNum}: Timeout error waiting for {ackVarPath} to be {ackValue}")
+            if axisObj not in failed:
+                failed.append(axisObj)
+
+    enabled = readAxesVariables([(axisObj, "stStatus.bEnabled") for axisObj in axes])
+    initStep("Disabling", [axisObj for axisObj, isEnabled in zip(axes, enabled) if isEnabled],
+             "stControl.bEnable", False, "stStatus.bEnabled", False)
+    initStep("Resetting", axes, "stControl.bReset", True, "stControl.bReset", False)
+    initStep("Enabling", axes, "stControl.bEnable", True, "stStatus.bEnabled", True)
+    if not failed:
+        print(f"    Axis {', '.join(str(axisObj.axisNum) for axisObj in axes)} enabled")
+    return failed
+
+
 class PneumaticAxis:
     def __init__(self, plcConnection, axisNum):
         print("Constructor for axis")
         self.plc = plcConnection
         self.axisNum = axisNum
+        # Full variable names keyed by the path inside the pneumatic axis struct
+        self.varNames = {}
 
     def __del__(self):
         print("Destructor for pneumatic axis: going to fail safe state")
         self.setValveOff()
 
+    # Full name of a variable of this axis, e.g. GVL.astPneumaticAxes[1].stPneumaticAxisStatus.bExtended
+    def varName(self, plcVarPath):
+        plcVarName = self.varNames.get(plcVarPath)
+        if plcVarName is None:
+            plcVarName = f"GVL.astPneumaticAxes[{self.axisNum}].{plcVarPath}"
+            self.varNames[plcVarPath] = plcVarName
+        return plcVarName
+
     # Generic function for getting any variable on the pneumatic axis
-    def getGenericVariable(self, plcVarPath, plcVarType):
-        plcVarName = f"GVL.astPneumaticAxes[{self.axisNum}].{plcVarPath}"
-        returnValue = self.plc.connection.read_by_name(plcVarName, plcVarType)
-        global prevPrintString
-        printString = f"{plcVarName}=: {returnValue}"
-        if prevPrintString != printString:
-            print(f"{dateTimeObj.now()} {printString}")
-        prevPrintString = printString
+    # plcVarType defaults to the type of the variable in PNEUMATIC_AXIS_VARIABLES
+    def getGenericVariable(self, plcVarPath, plcVarType=None):
+        if plcVarType is None:
+            plcVarType = PNEUMATIC_AXIS_VARIABLES[plcVarPath]
+        plcVarName = self.varName(plcVarPath)
+        returnValue = self.plc.readLatest(plcVarName, plcVarType)
+        variableLog.read(plcVarName, returnValue)
         return returnValue
     
+    # Reads the whole ST_PneumaticAxis in one request, laid out as in the PLC
+    # Needs the symbol table of the plc, raises KeyError without it
+    def readAxisStruct(self):
+        return self.plc.readStruct(f"GVL.astPneumaticAxes[{self.axisNum}]")
+
     # Get ST_PneumaticAxisStatus variables
     def getExtendingStatus(self):
-        return self.getGenericVariable("stPneumaticAxisStatus.bExtending", pyads.PLCTYPE_BOOL)
+        return self.getGenericVariable("stPneumaticAxisStatus.bExtending")
 
     def getRetractingStatus(self):
-        return self.getGenericVariable("stPneumaticAxisStatus.bRetracting", pyads.PLCTYPE_BOOL)
+        return self.getGenericVariable("stPneumaticAxisStatus.bRetracting")
     
     def getExtendedStatus(self):
-        return self.getGenericVariable("stPneumaticAxisStatus.bExtended", pyads.PLCTYPE_BOOL)
+        return self.getGenericVariable("stPneumaticAxisStatus.bExtended")
     
     def getRetractedStatus(self):
-        return self.getGenericVariable("stPneumaticAxisStatus.bRetracted", pyads.PLCTYPE_BOOL)
+        return self.getGenericVariable("stPneumaticAxisStatus.bRetracted")
 
     def getSolenoidActiveStatus(self):
-        return self.getGenericVariable("stPneumaticAxisStatus.bSolenoidActive", pyads.PLCTYPE_BOOL)
+        return self.getGenericVariable("stPneumaticAxisStatus.bSolenoidActive")
 
     def getInterlockedStatus(self):
-        return self.getGenericVariable("stPneumaticAxisStatus.bInterlocked", pyads.PLCTYPE_BOOL)
+        return self.getGenericVariable("stPneumaticAxisStatus.bInterlocked")
 
     def getPSSPermitOKStatus(self):
-        return self.getGenericVariable("stPneumaticAxisStatus.bPSSPermitOK", pyads.PLCTYPE_BOOL)
+        return self.getGenericVariable("stPneumaticAxisStatus.bPSSPermitOK")
     
     def getErrorStatus(self):
-        return self.getGenericVariable("stPneumaticAxisStatus.bError", pyads.PLCTYPE_BOOL)
+        return self.getGenericVariable("stPneumaticAxisStatus.bError")
     
     def getTimeElapsedExtend(self):
-         return self.getGenericVariable("stPneumaticAxisStatus.nTimeElapsedExtend", pyads.PLCTYPE_INT)
+         return self.getGenericVariable("stPneumaticAxisStatus.nTimeElapsedExtend")
 
     def getTimeElapsedRetract(self):
-        return self.getGenericVariable("stPneumaticAxisStatus.nTimeElapsedRetract", pyads.PLCTYPE_INT)
+        return self.getGenericVariable("stPneumaticAxisStatus.nTimeElapsedRetract")
 
     def getStatus(self):
-        return self.getGenericVariable("stPneumaticAxisStatus.sStatus", pyads.PLCTYPE_STRING)
+        return self.getGenericVariable("stPneumaticAxisStatus.sStatus")
 
     # Get ST_PneumaticAxisConfig variables
     def getTimeToExtend(self):
-         return self.getGenericVariable("stPneumaticAxisConfig.nTimeToExtend", pyads.PLCTYPE_INT)
+         return self.getGenericVariable("stPneumaticAxisConfig.nTimeToExtend")
 
     def getTimeToRetract(self):
-        return self.getGenericVariable("stPneumaticAxisConfig.nTimeToRetract", pyads.PLCTYPE_INT)
+        return self.getGenericVariable("stPneumaticAxisConfig.nTimeToRetract")
     
     # Get ST_PneumaticAxisInputs variables
     def getEndSwitchFwd(self):
-        return self.getGenericVariable("stPneumaticAxisInputs.bEndSwitchFwd", pyads.PLCTYPE_BOOL)
+        return self.getGenericVariable("stPneumaticAxisInputs.bEndSwitchFwd")
 
     def getEndSwitchBwd(self):
-        return self.getGenericVariable("stPneumaticAxisInputs.bEndSwitchBwd", pyads.PLCTYPE_BOOL)
+        return self.getGenericVariable("stPneumaticAxisInputs.bEndSwitchBwd")
 
     def getSolenoidActive(self):
-        return self.getGenericVariable("stPneumaticAxisInputs.bSolenoidActive", pyads.PLCTYPE_BOOL)
+        return self.getGenericVariable("stPneumaticAxisInputs.bSolenoidActive")
 
     def getPSSPermit(self):
-        return self.getGenericVariable("stPneumaticAxisInputs.bPSSPermit", pyads.PLCTYPE_BOOL)
+        return self.getGenericVariable("stPneumaticAxisInputs.bPSSPermit")
     
     def getPressureExtend(self):
-        return self.getGenericVariable("stPneumaticAxisInputs.bPressureExtend", pyads.PLCTYPE_BOOL)
+        return self.getGenericVariable("stPneumaticAxisInputs.bPressureExtend")
 
     def getPressureRetract(self):
-        return self.getGenericVariable("stPneumaticAxisInputs.bPressureRetract", pyads.PLCTYPE_BOOL)
+        return self.getGenericVariable("stPneumaticAxisInputs.bPressureRetract")
 
     def getOpenManual(self):
-        return self.getGenericVariable("stPneumaticAxisInputs.bOpenManual", pyads.PLCTYPE_BOOL)
+        return self.getGenericVariable("stPneumaticAxisInputs.bOpenManual")
 
     def getCloseManual(self):
-        return self.getGenericVariable("stPneumaticAxisInputs.bCloseManual", pyads.PLCTYPE_BOOL)
+        return self.getGenericVariable("stPneumaticAxisInputs.bCloseManual")
 
     def getAirPressureValve(self):
-        return self.getGenericVariable("stPneumaticAxisInputs.nAirPressureValve", pyads.PLCTYPE_INT)
+        return self.getGenericVariable("stPneumaticAxisInputs.nAirPressureValve")
 
     def getPressureValue(self):
-         return self.getGenericVariable("stPneumaticAxisInputs.nPressureValue", pyads.PLCTYPE_INT)
+         return self.getGenericVariable("stPneumaticAxisInputs.nPressureValue")
 
     # Get ST_PneumaticAxisOutputs variables
     def getValveState(self):
-        return self.getGenericVariable("stPneumaticAxisOutputs.bValveOn", pyads.PLCTYPE_BOOL)
+        return self.getGenericVariable("stPneumaticAxisOutputs.bValveOn")
 
     def getAirPressureOnState(self):
-        return self.getGenericVariable("stPneumaticAxisOutputs.bAirPressureOn", pyads.PLCTYPE_BOOL)
+        return self.getGenericVariable("stPneumaticAxisOutputs.bAirPressureOn")
 
     # Generic function for setting any variable on the plc
-    def setGenericVariable(self, plcVarPath, plcVarValue, plcVarType):
-        plcVarName = f"GVL.astPneumaticAxes[{self.axisNum}].{plcVarPath}"
-        print(f"{dateTimeObj.now()} {plcVarName}={plcVarValue}")
-        self.plc.connection.write_by_name(plcVarName, plcVarValue, plcVarType)
+    # plcVarType defaults to the type of the variable in PNEUMATIC_AXIS_VARIABLES
+    def setGenericVariable(self, plcVarPath, plcVarValue, plcVarType=None):
+        if plcVarType is None:
+            plcVarType = PNEUMATIC_AXIS_VARIABLES[plcVarPath]
+        plcVarName = self.varName(plcVarPath)
+        variableLog.write(plcVarName, plcVarValue)
+        self.plc.writeByName(plcVarName, plcVarValue, plcVarType)
     
     # Set ST_PneumaticAxisControl variables
     def extendPneumaticAxis(self):
-        self.setGenericVariable("stPneumaticAxisControl.bExtend", True, pyads.PLCTYPE_BOOL)
+        self.setGenericVariable("stPneumaticAxisControl.bExtend", True)
 
     def retractPneumaticAxis(self):
-        self.setGenericVariable("stPneumaticAxisControl.bRetract", True, pyads.PLCTYPE_BOOL)
+        self.setGenericVariable("stPneumaticAxisControl.bRetract", True)
 
     def interlockPneumaticAxis(self):
-        self.setGenericVariable("stPneumaticAxisControl.bInterlock", True, pyads.PLCTYPE_BOOL)
+        self.setGenericVariable("stPneumaticAxisControl.bInterlock", True)
     
     def resetPneumaticAxis(self):
-        self.setGenericVariable("stPneumaticAxisControl.bReset", True, pyads.PLCTYPE_BOOL)
+        self.setGenericVariable("stPneumaticAxisControl.bReset", True)
 
     # Set ST_PneumaticAxisConfig variables
     def setTimeToExtend(self, value):
-         return self.setGenericVariable("stPneumaticAxisConfig.nTimeToExtend", value, pyads.PLCTYPE_INT)
+         return self.setGenericVariable("stPneumaticAxisConfig.nTimeToExtend", value)
 
     def setTimeToRetract(self, value):
-        return self.setGenericVariable("stPneumaticAxisConfig.nTimeToRetract", value, pyads.PLCTYPE_INT)
+        return self.setGenericVariable("stPneumaticAxisConfig.nTimeToRetract", value)
 
      # Set ST_PneumaticAxisOutputs variables
     def setValveOn(self):
-        self.setGenericVariable("stPneumaticAxisOutputs.bValveOn", True, pyads.PLCTYPE_BOOL)
+        self.setGenericVariable("stPneumaticAxisOutputs.bValveOn", True)
     
     def setValveOff(self):
-        self.setGenericVariable("stPneumaticAxisOutputs.bValveOn", False, pyads.PLCTYPE_BOOL)
+        self.setGenericVariable("stPneumaticAxisOutputs.bValveOn", False)
     
     ###Motion commands###
     def extendAndWait(self):
@@ -1186,23 +2551,21 @@ class PneumaticAxis:
     # boolValue is the status you're waiting for
     # if you're waiting a bit to go high then this should be True
     def waitForStatusBit(
-        self, getStatusBitFunction, boolValue, timeout=30, sleepInterval=SLEEP_INTERVAL
+        self, getStatusBitFunction, boolValue, timeout=30, sleepInterval=None, expectedDuration=None
     ):
         # If timeout is negative time then just use a default
         if timeout < 0:
             timeout = 1
 
-        timeLimit = time.time() + timeout
-        timeoutError = False
-        while True:
-            statusBit = getStatusBitFunction()
-            if statusBit == boolValue:
-                break
-            if time.time() > timeLimit:
-                timeoutError = True
-                break
-            if sleepInterval > 0:
-                time.sleep(sleepInterval)
+        notified = self.plc.waitForGetter(
+            getStatusBitFunction, lambda statusBit: statusBit == boolValue, timeout
+        )
+        if notified is not None:
+            timeoutError = not notified
+        else:
+            timeoutError = not self.plc.pollFor(
+                lambda: getStatusBitFunction() == boolValue, timeout, sleepInterval, expectedDuration
+            )
 
         if timeoutError:
             print(
@@ -1216,7 +2579,7 @@ class PneumaticAxis:
         timeoutExtended=30,
         timeoutRetractedFalse=3,
         timeoutExtending=3,
-        sleepInterval=SLEEP_INTERVAL):
+        sleepInterval=None):
 
         if not self.waitForStatusBit(
             self.getRetractedStatus,
@@ -1254,7 +2617,7 @@ class PneumaticAxis:
         timeoutRetracted=30,
         timeoutExtendedFalse=3,
         timeoutRetracting=3,
-        sleepInterval=SLEEP_INTERVAL):
+        sleepInterval=None):
 
         if not self.waitForStatusBit(
             self.getExtendedStatus,
@@ -1292,7 +2655,7 @@ class PneumaticAxis:
         timeoutMovementDone=30,
         timeoutEndSwitchOff=3,
         timeoutMoving=3,
-        sleepInterval=SLEEP_INTERVAL):
+        sleepInterval=None):
 
         if self.getEndSwitchBwd():
             if not self.waitForStatusBit(
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+"""
+This file contains the move time estimation for point to point moves
+
+All functions take scalars or NumPy arrays (broadcast against each other) so the
+times of a whole list of moves can be calculated at once.
+"""
+import numpy as np
+
+# Iterations of the bisection for the peak velocity of jerk-limited moves that
+# do not reach the commanded velocity, 2**-60 of the velocity is far below
+# anything the NC can resolve
+PEAK_VELOCITY_ITERATIONS = 60
+
+
+# Time and distance to ramp from standstill to velocity (or back) with the
+# acceleration limited to acceleration and the jerk limited to jerk.
+# A jerk <= 0 means no jerk limit (the NC treats AxisDefaultJerk = 0 the same way),
+# the ramp is then linear. With a jerk limit the velocity profile is an S-curve
+# that is point symmetric about its middle, so the mean velocity is always
+# velocity/2. If velocity is too low to reach the full acceleration
+# (velocity*jerk < acceleration**2) the ramp is two jerk phases only.
+def rampTime(velocity, acceleration, jerk=0.0):
+    velocity = np.abs(np.asarray(velocity, dtype=float))
+    acceleration = np.abs(np.asarray(acceleration, dtype=float))
+    jerk = np.asarray(jerk, dtype=float)
+    jerk = np.where(jerk > 0, jerk, np.inf)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        reachesAcc = velocity * jerk >= acceleration * acceleration
+        time = np.where(
+            reachesAcc,
+            velocity / acceleration + acceleration / jerk,
+            2 * np.sqrt(velocity / jerk),
+        )
+    time = np.where(velocity == 0, 0.0, time)
+    return time, velocity * time / 2
+
+
+# Exact time of a trapezoidal move over distance.
+# If the acceleration and deceleration distances add up to more than the move
+# the profile is triangular: the axis turns around at the peak velocity
+# sqrt(2*d*acc*dec/(acc+dec)) without a constant velocity phase.
+# Moves with a velocity, acceleration or deceleration of 0 take np.inf
+def trapezoidalMoveTime(distance, velocity, acceleration, deceleration):
+    distance = np.abs(np.asarray(distance, dtype=float))
+    velocity = np.abs(np.asarray(velocity, dtype=float))
+    acceleration = np.abs(np.asarray(acceleration, dtype=float))
+    deceleration = np.abs(np.asarray(deceleration, dtype=float))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        accTime = velocity / acceleration
+        decTime = velocity / deceleration
+        rampDist = velocity * (accTime + decTime) / 2
+        trapezoidal = accTime + decTime + (distance - rampDist) / velocity
+
+        peakVelocity = np.sqrt(
+            2 * distance * acceleration * deceleration / (acceleration + deceleration)
+        )
+        triangular = peakVelocity / acceleration + peakVelocity / deceleration
+
+        time = np.where(distance >= rampDist, trapezoidal, triangular)
+    time = np.where(
+        (velocity == 0) | (acceleration == 0) | (deceleration == 0), np.inf, time
+    )
+    return np.where(distance == 0, 0.0, time)
+
+
+# Exact time of a jerk-limited (S-curve) move over distance.
+# If the acceleration and deceleration ramps to velocity are longer than the
+# move the axis never reaches velocity, the peak velocity is then found by
+# bisection since the ramp distances grow monotonically with it.
+# Moves without a jerk limit use the closed form of trapezoidalMoveTime
+def jerkLimitedMoveTime(distance, velocity, acceleration, deceleration, jerk=0.0):
+    distance, velocity, acceleration, deceleration, jerk = np.broadcast_arrays(
+        np.abs(np.asarray(distance, dtype=float)),
+        np.abs(np.asarray(velocity, dtype=float)),
+        np.abs(np.asarray(acceleration, dtype=float)),
+        np.abs(np.asarray(deceleration, dtype=float)),
+        np.asarray(jerk, dtype=float),
+    )
+    trapezoidal = trapezoidalMoveTime(distance, velocity, acceleration, deceleration)
+    limited = jerk > 0
+    if not np.any(limited):
+        return trapezoidal
+
+    accTime, accDist = rampTime(velocity, acceleration, jerk)
+    decTime, decDist = rampTime(velocity, deceleration, jerk)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        reachesVelocity = accDist + decDist <= distance
+        time = accTime + decTime + (distance - accDist - decDist) / velocity
+
+    # Bisection for the moves that do not reach the commanded velocity
+    low = np.zeros_like(velocity)
+    high = velocity.copy()
+    for _ in range(PEAK_VELOCITY_ITERATIONS):
+        peakVelocity = (low + high) / 2
+        _, peakAccDist = rampTime(peakVelocity, acceleration, jerk)
+        _, peakDecDist = rampTime(peakVelocity, deceleration, jerk)
+        tooFar = peakAccDist + peakDecDist > distance
+        high = np.where(tooFar, peakVelocity, high)
+        low = np.where(tooFar, low, peakVelocity)
+    peakAccTime, _ = rampTime(low, acceleration, jerk)
+    peakDecTime, _ = rampTime(low, deceleration, jerk)
+    time = np.where(reachesVelocity, time, peakAccTime + peakDecTime)
+
+    time = np.where(
+        (velocity == 0) | (acceleration == 0) | (deceleration == 0), np.inf, time
+    )
+    time = np.where(distance == 0, 0.0, time)
+    return np.where(limited, time, trapezoidal)
+
+
+# Times of the moves from startPositions to finalPositions, jerk-limited if jerk > 0
+def moveTimes(startPositions, finalPositions, velocity, acceleration, deceleration, jerk=0.0):
+    distance = np.asarray(finalPositions, dtype=float) - np.asarray(startPositions, dtype=float)
+    return jerkLimitedMoveTime(distance, velocity, acceleration, deceleration, jerk)
+
+
+# Time scale factors that stretch moves to take duration.
+# With velocity/k, acceleration/k**2 and deceleration/k**2 a move keeps its
+# shape and takes k times as long, so moves of different lengths arrive
+# together with lower peak dynamics on the shorter ones. The jerk is an NC
+# parameter the commands can't scale: with the full jerk the ramps are a little
+# shorter, so for jerk-limited moves k is found by bisection between
+# duration/time (jerk scaled as well) and duration/trapezoidal time (no jerk limit).
+# Moves without distance or that take duration or longer anyway get 1
+def synchronisationScales(distance, velocity, acceleration, deceleration, jerk, duration):
+    distance, velocity, acceleration, deceleration, jerk, duration = np.broadcast_arrays(
+        np.abs(np.asarray(distance, dtype=float)),
+        np.abs(np.asarray(velocity, dtype=float)),
+        np.abs(np.asarray(acceleration, dtype=float)),
+        np.abs(np.asarray(deceleration, dtype=float)),
+        np.asarray(jerk, dtype=float),
+        np.asarray(duration, dtype=float),
+    )
+    time = jerkLimitedMoveTime(distance, velocity, acceleration, deceleration, jerk)
+    trapezoidal = trapezoidalMoveTime(distance, velocity, acceleration, deceleration)
+    stretched = (distance > 0) & np.isfinite(time) & (time < duration)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        low = np.where(stretched, duration / time, 1.0)
+        high = np.where(stretched, np.maximum(duration / trapezoidal, low), 1.0)
+
+    if np.any(stretched & (jerk > 0)):
+        for _ in range(PEAK_VELOCITY_ITERATIONS):
+            scale = (low + high) / 2
+            tooSlow = jerkLimitedMoveTime(
+                distance, velocity / scale, acceleration / scale**2, deceleration / scale**2, jerk
+            ) > duration
+            high = np.where(tooSlow, scale, high)
+            low = np.where(tooSlow, low, scale)
+    return (low + high) / 2
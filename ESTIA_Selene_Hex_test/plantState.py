@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+"""
+This file contains the plant state service of a plc
+
+PlantState reads GVL.astAxes[1..nAXIS_NUM] and GVL.astPneumaticAxes in one ADS
+sum read at a fixed rate in a background thread and publishes every result as
+an immutable PlantSnapshot. Readers take their values from the latest snapshot,
+so the ADS load stays the same however many scripts or threads read.
+The layouts come from the symbol table of the plc (see symbolTable.py). The
+symbol version is read with every snapshot and the reads stop once it changed.
+"""
+import time
+import ctypes
+import threading
+import pyads
+
+PLANT_STATE_INTERVAL = 0.01  # s, one cycle of the motion task
+# Snapshots older than this are not used by the getters
+PLANT_STATE_MAX_AGE = 0.05  # s
+
+
+# The raw areas of one sum read, decoded on access with the layout of PlantState
+class PlantSnapshot:
+    __slots__ = ("sequence", "timestamp", "readTime", "areas", "plantState")
+
+    def __init__(self, sequence, timestamp, readTime, areas, plantState):
+        object.__setattr__(self, "sequence", sequence)
+        object.__setattr__(self, "timestamp", timestamp)
+        # time.monotonic() when the read was sent
+        object.__setattr__(self, "readTime", readTime)
+        object.__setattr__(self, "areas", areas)
+        object.__setattr__(self, "plantState", plantState)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PlantSnapshot is read only")
+
+    def __delattr__(self, name):
+        raise AttributeError("PlantSnapshot is read only")
+
+    def age(self):
+        return time.monotonic() - self.readTime
+
+    # Value of a variable, e.g. "GVL.astAxes[6].stStatus.bDone"
+    # Structs are returned as copies. Raises KeyError if it isn't in the snapshot
+    def get(self, varName):
+        location = self.plantState.locate(varName)
+        if location is None:
+            raise KeyError(f"{varName} is not part of the plant state")
+        area, offset, accessor = location
+        return accessor.value(accessor.dataType.from_buffer_copy(self.areas[area], offset))
+
+
+# Reads the axis arrays of plcConnection every interval in its own thread
+# get and latest only return snapshots younger than maxAge
+class PlantState:
+    def __init__(self, plcConnection, interval=PLANT_STATE_INTERVAL, maxAge=PLANT_STATE_MAX_AGE):
+        self.plc = plcConnection
+        self.interval = interval
+        self.maxAge = maxAge
+        # (indexGroup, indexOffset, size) of every area of the sum read
+        self.areas = []
+        # (area, offset in the area, TypedAccessor) by variable name, None if not covered
+        self.locations = {}
+        self.snapshot = None
+        self.sequence = 0
+        self.errorCount = 0
+        # Set when the symbol version differs from the one of the symbol table,
+        # the offsets of the areas can't be trusted any more
+        self.symbolVersionChanged = False
+        self.condition = threading.Condition()
+        self.stopEvent = threading.Event()
+        self.thread = None
+
+    # Areas of GVL.astAxes[1..nAXIS_NUM] and GVL.astPneumaticAxes
+    # Raises KeyError if the plc has no symbol table or neither array is in it
+    def prepareAreas(self):
+        if self.plc.symbolTable is None:
+            raise KeyError("The plant state needs the symbol table of the plc")
+        self.areas = []
+        firstAxis = self.plc.getAccessor("GVL.astAxes[1]")
+        if firstAxis is not None:
+            self.areas.append((
+                firstAxis.indexGroup,
+                firstAxis.indexOffset,
+                self.plc.noOfAxes * ctypes.sizeof(firstAxis.dataType),
+            ))
+        pneumaticAxes = self.plc.getAccessor("GVL.astPneumaticAxes")
+        if pneumaticAxes is not None:
+            self.areas.append((
+                pneumaticAxes.indexGroup,
+                pneumaticAxes.indexOffset,
+                ctypes.sizeof(pneumaticAxes.dataType),
+            ))
+        if not self.areas:
+            raise KeyError("Neither GVL.astAxes nor GVL.astPneumaticAxes is in the symbol table")
+        self.locations.clear()
+
+    # Where a variable is in the snapshots, None if it isn't in any area
+    def locate(self, varName):
+        if varName not in self.locations:
+            location = None
+            accessor = self.plc.getAccessor(varName)
+            if accessor is not None:
+                for area, (indexGroup, indexOffset, size) in enumerate(self.areas):
+                    offset = accessor.indexOffset - indexOffset
+                    if accessor.indexGroup == indexGroup and 0 <= offset \
+                            and offset + ctypes.sizeof(accessor.dataType) <= size:
+                        location = (area, offset, accessor)
+                        break
+            self.locations[varName] = location
+        return self.locations[varName]
+
+    def start(self):
+        if self.thread is not None:
+            return self
+        self.prepareAreas()
+        self.stopEvent.clear()
+        self.thread = threading.Thread(target=self.run, name="PlantState", daemon=True)
+        self.thread.start()
+        print(f"Plant state: reading {sum(size for _, _, size in self.areas)} bytes every {self.interval}s")
+        return self
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.stopEvent.set()
+        self.thread.join()
+        self.thread = None
+        self.snapshot = None
+
+    # The symbol version is read last in the same sum read as the areas
+    def run(self):
+        requests = [
+            (indexGroup, indexOffset, ctypes.c_ubyte * size)
+            for indexGroup, indexOffset, size in self.areas
+        ] + [(pyads.constants.ADSIGRP_SYM_VERSION, 0, ctypes.c_ubyte)]
+        symbolVersion = self.plc.symbolVersion
+        nextRead = time.monotonic()
+        while not self.stopEvent.is_set():
+            readTime = time.monotonic()
+            try:
+                *values, version = self.plc.sumRead(requests)
+            except pyads.ADSError as e:
+                self.errorCount += 1
+                if self.errorCount == 1:
+                    print(f"Plant state: read failed: {e}")
+            else:
+                if version.value != symbolVersion:
+                    print(f"Plant state: symbol version changed to {version.value}, stopped")
+                    with self.condition:
+                        self.symbolVersionChanged = True
+                        self.snapshot = None
+                        self.condition.notify_all()
+                    return
+                self.sequence += 1
+                snapshot = PlantSnapshot(
+                    self.sequence, time.time(), readTime,
+                    tuple(bytes(value) for value in values), self,
+                )
+                with self.condition:
+                    self.snapshot = snapshot
+                    self.condition.notify_all()
+            nextRead += self.interval
+            delay = nextRead - time.monotonic()
+            if delay > 0:
+                self.stopEvent.wait(delay)
+            else:
+                nextRead = time.monotonic()
+
+    # Latest snapshot, None if there is none younger than maxAge (default self.maxAge)
+    def latest(self, maxAge=None):
+        snapshot = self.snapshot
+        if maxAge is None:
+            maxAge = self.maxAge
+        if snapshot is None or snapshot.age() > maxAge:
+            return None
+        return snapshot
+
+    # Blocks until a snapshot read after readTime (time.monotonic()) is published
+    # Returns it, or None on timeout
+    def waitForSnapshot(self, readTime, timeout):
+        timeLimit = time.monotonic() + timeout
+        with self.condition:
+            while self.snapshot is None or self.snapshot.readTime < readTime:
+                remaining = timeLimit - time.monotonic()
+                if remaining <= 0 or self.thread is None:
+                    return None
+                self.condition.wait(remaining)
+            return self.snapshot
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+"""
+This file contains the append-only journal of the hex key campaign results
+
+Every measured position is appended as one CSV line and flushed to disk before
+the campaign moves on, so a crash loses at most the position being measured.
+loadJournal reads the journal back and applyJournal puts the results into the
+table of positions.
+"""
+import os
+import io
+import csv
+from datetime import datetime
+
+JOURNAL_COLUMNS = ["timestamp", "position", "axis", "range", "failure"]
+# Written in the range column of the table for a failed measurement
+JOURNAL_FAIL = "FAIL"
+
+
+class ResultJournal:
+    def __init__(self, path):
+        self.path = path
+        # A line cut by a crash is dropped so the next record starts on its own line
+        if os.path.exists(path):
+            with open(path, "r+b") as f:
+                data = f.read()
+                f.truncate(data.rfind(b"\n") + 1)
+        newFile = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", newline="")
+        self.writer = csv.writer(self.file)
+        if newFile:
+            self.writer.writerow(JOURNAL_COLUMNS)
+            self.sync()
+
+    # Appends the result of one position and waits until it is on disk
+    # totalRange is None when the measurement failed, failure says why
+    def append(self, position, axisNum, totalRange=None, failure=""):
+        self.writer.writerow([
+            datetime.now().isoformat(timespec="milliseconds"),
+            position,
+            axisNum,
+            "" if totalRange is None else repr(float(totalRange)),
+            failure,
+        ])
+        self.sync()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+# Reads a journal into a DataFrame with one row per record
+# An incomplete last line (crash while writing) is ignored
+def loadJournal(path):
+    # pandas takes a while to import and is only needed for reading the journal back
+    import pandas as pd
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=JOURNAL_COLUMNS)
+    with open(path, "rb") as f:
+        data = f.read()
+    data = data[:data.rfind(b"\n") + 1]
+    if not data:
+        return pd.DataFrame(columns=JOURNAL_COLUMNS)
+    return pd.read_csv(
+        io.BytesIO(data), keep_default_na=False, na_values={"range": [""]},
+        dtype={"position": int, "axis": int, "failure": str},
+    )
+
+
+# Writes the latest result of every position of the journal into table
+# The results go to the columns Range-Axis10/Range-Axis11 as range or JOURNAL_FAIL
+# The journal is kept across campaigns, since (an ISO timestamp like the ones of
+# the journal, e.g. the start of the campaign) leaves out the older records
+def applyJournal(table, records, since=None):
+    import pandas as pd
+    if since is not None:
+        records = records[records["timestamp"] >= since]
+    for record in records.itertuples(index=False):
+        column = f"Range-Axis{record.axis}"
+        # The columns hold numbers and JOURNAL_FAIL
+        if table[column].dtype != object:
+            table[column] = table[column].astype(object)
+        if pd.isna(record.range):
+            table.loc[record.position, column] = JOURNAL_FAIL
+        else:
+            table.loc[record.position, column] = record.range
+    return table
+
+
+# Writes the table to path without leaving a half written file behind
+def writeTable(table, path):
+    table.to_csv(path + ".tmp", mode="w")
+    os.replace(path + ".tmp", path)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+
+"""
+This file contains the route planner for visiting a list of positions with
+several axes that move simultaneously
+
+The cost of going from one position to the next is the time of the slowest
+axis, calculated with the move time model of moveProfile. The route is built
+with nearest neighbour and refined with 2-opt and Or-opt until neither finds
+an improvement.
+"""
+import numpy as np
+from moveProfile import moveTimes
+
+# Improvements smaller than this are ignored so the refinement always terminates
+ROUTE_EPSILON = 1e-9  # s
+# Longest segment that Or-opt tries to move somewhere else in the route
+OR_OPT_MAX_SEGMENT = 3
+
+
+# Matrix of the times between every pair of positions.
+# axisPositions has one array of positions per axis and profiles the matching
+# (velocity, acceleration, deceleration, jerk) of each axis. The axes move
+# simultaneously so the time of a move is the time of the slowest axis.
+def travelCostMatrix(axisPositions, profiles):
+    cost = None
+    for positions, profile in zip(axisPositions, profiles):
+        positions = np.asarray(positions, dtype=float)
+        axisCost = moveTimes(positions[:, None], positions[None, :], *profile)
+        cost = axisCost if cost is None else np.maximum(cost, axisCost)
+    return cost
+
+
+# Total time of the open route (no return to the first position)
+def routeTime(route, cost):
+    return float(sum(cost[route[k], route[k + 1]] for k in range(len(route) - 1)))
+
+
+# Route that always goes to the closest position not visited yet
+def nearestNeighbourRoute(cost, start=0):
+    route = [start]
+    unvisited = set(range(len(cost))) - {start}
+    while unvisited:
+        last = route[-1]
+        nearest = min(unvisited, key=lambda node: cost[last, node])
+        route.append(nearest)
+        unvisited.remove(nearest)
+    return route
+
+
+# Reverses parts of the route as long as that makes it shorter.
+# The first position is fixed (it's where the axes are now) and the route is
+# open so reversing up to the last position only changes one edge.
+# Move times don't depend on the direction so a reversed segment costs the same.
+def twoOpt(route, cost):
+    route = list(route)
+    n = len(route)
+    improved = False
+    changed = True
+    while changed:
+        changed = False
+        for i in range(1, n - 1):
+            for j in range(i + 1, n):
+                a, b, c = route[i - 1], route[i], route[j]
+                delta = cost[a, c] - cost[a, b]
+                if j + 1 < n:
+                    d = route[j + 1]
+                    delta += cost[b, d] - cost[c, d]
+                if delta < -ROUTE_EPSILON:
+                    route[i:j + 1] = reversed(route[i:j + 1])
+                    changed = improved = True
+    return route, improved
+
+
+# Moves segments of up to OR_OPT_MAX_SEGMENT positions, as they are or reversed,
+# to wherever in the route they are cheapest to visit
+def orOpt(route, cost):
+    route = list(route)
+    improved = False
+    changed = True
+    while changed:
+        changed = False
+        for segmentLength in range(1, OR_OPT_MAX_SEGMENT + 1):
+            i = 1
+            while i + segmentLength <= len(route):
+                segment = route[i:i + segmentLength]
+                rest = route[:i] + route[i + segmentLength:]
+                prev = route[i - 1]
+                nxt = route[i + segmentLength] if i + segmentLength < len(route) else None
+                removeGain = cost[prev, segment[0]]
+                if nxt is not None:
+                    removeGain += cost[segment[-1], nxt] - cost[prev, nxt]
+
+                bestDelta, bestRoute = -ROUTE_EPSILON, None
+                for k in range(1, len(rest) + 1):
+                    if k == i:
+                        continue
+                    p = rest[k - 1]
+                    q = rest[k] if k < len(rest) else None
+                    for candidate in (segment, segment[::-1]):
+                        insertCost = cost[p, candidate[0]]
+                        if q is not None:
+                            insertCost += cost[candidate[-1], q] - cost[p, q]
+                        if insertCost - removeGain < bestDelta:
+                            bestDelta = insertCost - removeGain
+                            bestRoute = rest[:k] + candidate + rest[k:]
+                if bestRoute is not None:
+                    route = bestRoute
+                    changed = improved = True
+                i += 1
+    return route, improved
+
+
+# Order in which to visit targetPositions starting from startPositions.
+# startPositions has the current position of each axis, targetPositions one
+# array of positions per axis and profiles the (velocity, acceleration,
+# deceleration, jerk) of each axis.
+# Returns the order as indices into the target arrays, the estimated time of
+# the planned route and the estimated time of visiting them in the given order
+def planRoute(startPositions, targetPositions, profiles):
+    axisPositions = [
+        np.concatenate(([start], np.asarray(targets, dtype=float)))
+        for start, targets in zip(startPositions, targetPositions)
+    ]
+    cost = travelCostMatrix(axisPositions, profiles)
+    givenRoute = list(range(len(cost)))
+
+    route = nearestNeighbourRoute(cost)
+    improved = True
+    while improved:
+        route, improvedTwoOpt = twoOpt(route, cost)
+        route, improvedOrOpt = orOpt(route, cost)
+        improved = improvedTwoOpt or improvedOrOpt
+
+    # Never do worse than the given order
+    if routeTime(givenRoute, cost) <= routeTime(route, cost):
+        route = givenRoute
+    order = [node - 1 for node in route[1:]]
+    return order, routeTime(route, cost), routeTime(givenRoute, cost)
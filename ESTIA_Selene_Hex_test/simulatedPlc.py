@@ -0,0 +1,1474 @@
+#!/usr/bin/env python
+
+"""
+This file contains a simulated TwinCAT PLC that can replace the real one
+
+SimulatedPlc models GVL.astAxes[], GVL.astPneumaticAxes[] and Hex_Screw_States_8_9
+of the tc_mca_std_lib application, including the eCommand/bExecute/bDone/bBusy
+handshake and a trapezoidal kinematic model per axis updated every cycle.
+
+SimulatedConnection has the subset of pyads.Connection used by motionFunctionsLib
+and can be injected directly:
+    plc1 = plc(plcAmsNetId=AMSNetId, plcPort=852, connection=SimulatedConnection(hexTestRig()))
+
+SimulatedPlcServer and RemoteSimulatedConnection give the same over a local TCP
+socket so the simulation can run in another process:
+    python simulatedPlc.py --port 48900
+    plc1 = plc(plcAmsNetId=AMSNetId, plcPort=852, connection=RemoteSimulatedConnection("localhost", 48900))
+"""
+import sys
+import re
+import json
+import bisect
+import struct
+import math
+import time
+import ctypes
+import socket
+import argparse
+import threading
+import socketserver
+import pyads as pyads
+from datetime import datetime
+from eAxisParameters import (
+    E_AxisParameters,
+    NC_AXIS_PARAMETER_ADDRESSES,
+    NC_AXIS_STATE_GROUP,
+)
+from motionFunctionsLib import (
+    E_MotionFunctions,
+    E_HomingRoutines,
+    ST_AxisStatus,
+    ST_AxisInputs,
+    ST_PneumaticAxisControl,
+    ST_PneumaticAxisStatus,
+    ST_PneumaticAxisConfig,
+    ST_PneumaticAxisInputs,
+    ST_PneumaticAxisOutputs,
+    ST_PneumaticAxis,
+    NC_PARAMETER_TYPES,
+    NC_PARAMETER_CONFIG_VARIABLES,
+)
+from symbolTable import SYMBOL_UPLOAD_INFO, SYMBOL_ENTRY, DATA_TYPE_ENTRY, ARRAY_INFO
+
+CYCLE_TIME = 0.01  # s
+
+# Error IDs raised by the simulation
+SIM_ERROR_NOT_ENABLED = 0x4260
+SIM_ERROR_ZERO_VELOCITY = 0x4358
+SIM_ERROR_SOFT_LIMIT = 0x4357
+SIM_ERROR_POSITION_LAG = 0x4550
+SIM_ERROR_PNEUMATIC_TIMEOUT = 1
+
+# ADS errors of the simulated connection
+ADSERR_SYMBOL_NOT_FOUND = 0x710
+ADSERR_INVALID_HANDLE = 0x711
+ADSERR_INVALID_OFFSET = 0x703
+
+# NC parameters by (index group base, index offset) of their ADS address
+NC_PARAMETERS_BY_READ_ADDRESS = {
+    (address.indexGroup, address.indexOffset): axisParam
+    for axisParam, address in NC_AXIS_PARAMETER_ADDRESSES.items()
+}
+NC_PARAMETERS_BY_WRITE_ADDRESS = {
+    (address.writeIndexGroup, address.writeIndexOffset) if address.writeIndexGroup is not None
+    else (address.indexGroup, address.indexOffset): axisParam
+    for axisParam, address in NC_AXIS_PARAMETER_ADDRESSES.items()
+    if address.writeIndexGroup is not None or address.indexGroup != NC_AXIS_STATE_GROUP
+}
+NC_INDEX_GROUP_BASES = {address.indexGroup for address in NC_AXIS_PARAMETER_ADDRESSES.values()} | {
+    address.writeIndexGroup for address in NC_AXIS_PARAMETER_ADDRESSES.values()
+    if address.writeIndexGroup is not None
+}
+
+AXIS_VAR_NAME = re.compile(r"GVL\.astAxes\[(\d+)\]\.(.+)")
+PNEUMATIC_AXIS_VAR_NAME = re.compile(r"GVL\.astPneumaticAxes\[(\d+)\]\.(.+)")
+
+# Index group of the PLC memory the simulated symbols live in
+SIM_SYMBOL_INDEX_GROUP = 0x4040
+
+
+###Data types of the simulated PLC project###
+# They are served as the symbol and data type tables of the PLC (see symbolTable.py)
+# _typeNames_ gives the PLC type of fields that aren't plain base types (enums)
+# and _lowerBounds_ the lower bound of array fields, 0 if not listed
+class ST_AxisControl(ctypes.Structure):
+    _fields_ = [
+        ("bEnable", ctypes.c_bool),
+        ("bReset", ctypes.c_bool),
+        ("bExecute", ctypes.c_bool),
+        ("bHalt", ctypes.c_bool),
+        ("bStop", ctypes.c_bool),
+        ("bJogFwd", ctypes.c_bool),
+        ("bJogBwd", ctypes.c_bool),
+        ("eCommand", ctypes.c_int16),
+        ("fVelocity", ctypes.c_double),
+        ("fJogVelocity", ctypes.c_double),
+        ("fAcceleration", ctypes.c_double),
+        ("fDeceleration", ctypes.c_double),
+        ("fPosition", ctypes.c_double),
+    ]
+    _typeNames_ = {"eCommand": "E_MotionFunctions"}
+
+
+class ST_MultiMasterAxis(ctypes.Structure):
+    _fields_ = [
+        ("nIndex", ctypes.c_uint16),
+        ("fRatio", ctypes.c_double),
+    ]
+
+
+class ST_AxisConfig(ctypes.Structure):
+    _fields_ = [
+        ("eHomeSeq", ctypes.c_int16),
+        ("fHomePosition", ctypes.c_double),
+        ("fHomeFinishDistance", ctypes.c_double),
+        ("fOveride", ctypes.c_double),
+        ("fHomingVelToCam", ctypes.c_double),
+        ("fHomingVelFromCam", ctypes.c_double),
+        ("fVeloMax", ctypes.c_double),
+        ("fMaxAcc", ctypes.c_double),
+        ("fMaxDec", ctypes.c_double),
+        ("fMaxSoftPosLimit", ctypes.c_double),
+        ("fMinSoftPosLimit", ctypes.c_double),
+        ("bEnMaxSoftPosLimit", ctypes.c_bool),
+        ("bEnMinSoftPosLimit", ctypes.c_bool),
+        ("fVelocityDefaultFast", ctypes.c_double),
+        ("fVelocityDefaultSlow", ctypes.c_double),
+        ("bEnPositionLagMonitoring", ctypes.c_bool),
+        ("fMaxPosLagValue", ctypes.c_double),
+        ("bEnTargetPositionMonitoring", ctypes.c_bool),
+        ("fTargetPositionWindow", ctypes.c_double),
+        ("eAxisParameters", ctypes.c_int16),
+        ("fWriteAxisParameter", ctypes.c_double),
+        ("fReadAxisParameter", ctypes.c_double),
+        ("astMultiMasterAxis", ST_MultiMasterAxis * 4),
+        ("astMultiMasterAxisLatched", ST_MultiMasterAxis * 4),
+        ("afMultiSlaveAxisRatio", ctypes.c_double * 4),
+    ]
+    _typeNames_ = {"eHomeSeq": "E_HomingRoutines", "eAxisParameters": "E_AxisParameters"}
+    _lowerBounds_ = {"astMultiMasterAxis": 1, "astMultiMasterAxisLatched": 1, "afMultiSlaveAxisRatio": 1}
+
+
+# Status of the NC axis (Tc2_MC2), only the bits the library reads
+class ST_McAxisStatus(ctypes.Structure):
+    _fields_ = [
+        ("ConstantVelocity", ctypes.c_bool),
+        ("Accelerating", ctypes.c_bool),
+        ("Decelerating", ctypes.c_bool),
+        ("Standstill", ctypes.c_bool),
+    ]
+
+
+class NCTOPLC_AXIS_REF(ctypes.Structure):
+    _fields_ = [
+        ("AxisId", ctypes.c_uint32),
+    ]
+
+
+class AXIS_REF(ctypes.Structure):
+    _fields_ = [
+        ("NcToPlc", NCTOPLC_AXIS_REF),
+        ("Status", ST_McAxisStatus),
+    ]
+
+
+class ST_AxisStruct(ctypes.Structure):
+    _fields_ = [
+        ("stControl", ST_AxisControl),
+        ("stConfig", ST_AxisConfig),
+        ("stStatus", ST_AxisStatus),
+        ("stInputs", ST_AxisInputs),
+        ("Axis", AXIS_REF),
+    ]
+
+
+# Enums of the project, all with base type INT
+SIM_ENUM_TYPES = ("E_MotionFunctions", "E_HomingRoutines", "E_AxisParameters")
+SIM_STRUCT_TYPES = (
+    ST_AxisControl, ST_MultiMasterAxis, ST_AxisConfig, ST_AxisStatus, ST_AxisInputs,
+    ST_McAxisStatus, NCTOPLC_AXIS_REF, AXIS_REF, ST_AxisStruct,
+    ST_PneumaticAxisControl, ST_PneumaticAxisStatus, ST_PneumaticAxisConfig,
+    ST_PneumaticAxisInputs, ST_PneumaticAxisOutputs, ST_PneumaticAxis,
+)
+SIM_BASE_TYPES = {
+    ctypes.c_bool: ("BOOL", pyads.constants.ADST_BIT),
+    ctypes.c_int16: ("INT", pyads.constants.ADST_INT16),
+    ctypes.c_uint16: ("UINT", pyads.constants.ADST_UINT16),
+    ctypes.c_uint32: ("UDINT", pyads.constants.ADST_UINT32),
+    ctypes.c_double: ("LREAL", pyads.constants.ADST_REAL64),
+}
+
+
+# PLC type name and ADS data type ID of a ctypes type of the simulated project
+def symbolTypeName(ctype, lowerBound=0):
+    if ctype in SIM_BASE_TYPES:
+        return SIM_BASE_TYPES[ctype]
+    if issubclass(ctype, ctypes.Array):
+        if ctype._type_ is ctypes.c_char:
+            return f"STRING({ctype._length_ - 1})", pyads.constants.ADST_STRING
+        elementName, _ = symbolTypeName(ctype._type_)
+        upperBound = lowerBound + ctype._length_ - 1
+        return f"ARRAY [{lowerBound}..{upperBound}] OF {elementName}", pyads.constants.ADST_BIGTYPE
+    return ctype.__name__, pyads.constants.ADST_BIGTYPE
+
+
+# One AdsDatatypeEntry, subItems are encoded entries
+def encodeDataTypeEntry(name, typeName, size, offset, dataTypeId, arrayInfo=(), subItems=()):
+    nameData, typeData = name.encode(), typeName.encode()
+    body = (nameData + b"\0" + typeData + b"\0" + b"\0"
+            + b"".join(ARRAY_INFO.pack(*info) for info in arrayInfo) + b"".join(subItems))
+    entryLength = DATA_TYPE_ENTRY.size + len(body)
+    return DATA_TYPE_ENTRY.pack(
+        entryLength, 1, 0, 0, size, offset, dataTypeId, 0,
+        len(nameData), len(typeData), 0, len(arrayInfo), len(subItems)) + body
+
+
+def encodeStructType(structType):
+    typeNames = getattr(structType, "_typeNames_", {})
+    lowerBounds = getattr(structType, "_lowerBounds_", {})
+    subItems = []
+    for name, ctype in structType._fields_:
+        typeName, dataTypeId = symbolTypeName(ctype, lowerBounds.get(name, 0))
+        typeName = typeNames.get(name, typeName)
+        arrayInfo = ()
+        if issubclass(ctype, ctypes.Array) and ctype._type_ is not ctypes.c_char:
+            arrayInfo = ((lowerBounds.get(name, 0), ctype._length_),)
+        subItems.append(encodeDataTypeEntry(
+            name, typeName, ctypes.sizeof(ctype), getattr(structType, name).offset,
+            dataTypeId, arrayInfo))
+    return encodeDataTypeEntry(
+        structType.__name__, "", ctypes.sizeof(structType), 0,
+        pyads.constants.ADST_BIGTYPE, subItems=subItems)
+
+
+def encodeSymbolEntry(name, indexGroup, indexOffset, size, typeName, dataTypeId):
+    nameData, typeData = name.encode(), typeName.encode()
+    body = nameData + b"\0" + typeData + b"\0" + b"\0"
+    return SYMBOL_ENTRY.pack(
+        SYMBOL_ENTRY.size + len(body), indexGroup, indexOffset, size, dataTypeId, 0,
+        len(nameData), len(typeData), 0) + body
+
+
+# Variables of a ctypes type as (path, offset, ctype), arrays and structs are expanded
+def leafVariables(ctype, path, offset, lowerBound=0):
+    if issubclass(ctype, ctypes.Structure):
+        lowerBounds = getattr(ctype, "_lowerBounds_", {})
+        for name, fieldType in ctype._fields_:
+            yield from leafVariables(
+                fieldType, f"{path}.{name}", offset + getattr(ctype, name).offset,
+                lowerBounds.get(name, 0))
+    elif issubclass(ctype, ctypes.Array) and ctype._type_ is not ctypes.c_char:
+        elementSize = ctypes.sizeof(ctype._type_)
+        for i in range(ctype._length_):
+            yield from leafVariables(ctype._type_, f"{path}[{lowerBound + i}]", offset + i * elementSize)
+    else:
+        yield path, offset, ctype
+
+
+# Raw data of a simulated value
+def leafBytes(ctype, value):
+    if issubclass(ctype, ctypes.Array):
+        return value.encode()[:ctypes.sizeof(ctype) - 1].ljust(ctypes.sizeof(ctype), b"\0")
+    return bytes(ctype(value))
+
+
+# Simulated value of raw data
+def leafValue(ctype, data):
+    if issubclass(ctype, ctypes.Array):
+        return data.split(b"\0", 1)[0].decode()
+    return ctype.from_buffer_copy(data).value
+
+
+class SimulatedAxis:
+    def __init__(
+        self,
+        axisNum,
+        position=0.0,
+        velocity=10.0,
+        acceleration=100.0,
+        deceleration=100.0,
+        jerk=0.0,
+        limitFwdPos=None,
+        limitBwdPos=None,
+        hardStopFwdPos=None,
+        hardStopBwdPos=None,
+        homed=False,
+        enabled=False,
+    ):
+        self.axisNum = axisNum
+        position, velocity = float(position), float(velocity)
+        acceleration, deceleration = float(acceleration), float(deceleration)
+        # Positions of the limit switches and mechanical end stops, None if there are none
+        self.limitFwdPos = limitFwdPos
+        self.limitBwdPos = limitBwdPos
+        self.hardStopFwdPos = hardStopFwdPos
+        self.hardStopBwdPos = hardStopBwdPos
+
+        self.mode = "idle"
+        self.targetPos = position
+        self.targetVel = 0.0
+        self.profileVel = velocity
+        self.homingStage = None
+        self.prevSpeed = 0.0
+
+        self.vars = {
+            "stControl.bEnable": enabled,
+            "stControl.bReset": False,
+            "stControl.bExecute": False,
+            "stControl.bHalt": False,
+            "stControl.bStop": False,
+            "stControl.bJogFwd": False,
+            "stControl.bJogBwd": False,
+            "stControl.eCommand": 0,
+            "stControl.fVelocity": velocity,
+            "stControl.fJogVelocity": velocity,
+            "stControl.fAcceleration": acceleration,
+            "stControl.fDeceleration": deceleration,
+            "stControl.fPosition": position,
+            "stConfig.eHomeSeq": E_HomingRoutines.eHomeDirect.value,
+            "stConfig.fHomePosition": 0.0,
+            "stConfig.fHomeFinishDistance": 0.0,
+            "stConfig.fOveride": 100.0,
+            "stConfig.fHomingVelToCam": velocity,
+            "stConfig.fHomingVelFromCam": velocity / 2,
+            "stConfig.fVeloMax": velocity * 2,
+            "stConfig.fMaxAcc": acceleration * 2,
+            "stConfig.fMaxDec": deceleration * 2,
+            "stConfig.fMaxSoftPosLimit": 0.0,
+            "stConfig.fMinSoftPosLimit": 0.0,
+            "stConfig.bEnMaxSoftPosLimit": False,
+            "stConfig.bEnMinSoftPosLimit": False,
+            "stConfig.fVelocityDefaultFast": velocity,
+            "stConfig.fVelocityDefaultSlow": velocity / 10,
+            "stConfig.bEnPositionLagMonitoring": True,
+            "stConfig.fMaxPosLagValue": 1.0,
+            "stConfig.bEnTargetPositionMonitoring": True,
+            "stConfig.fTargetPositionWindow": 0.1,
+            "stConfig.eAxisParameters": 0,
+            "stConfig.fWriteAxisParameter": 0.0,
+            "stConfig.fReadAxisParameter": 0.0,
+            "stInputs.bLimitFwd": True,
+            "stInputs.bLimitBwd": True,
+            "stInputs.bHome": False,
+            "Axis.Status.ConstantVelocity": False,
+            "Axis.Status.Accelerating": False,
+            "Axis.Status.Decelerating": False,
+            "Axis.Status.Standstill": True,
+            "Axis.NcToPlc.AxisId": axisNum,
+        }
+        for name, ctype in ST_AxisStatus._fields_:
+            self.vars["stStatus." + name] = ctype().value
+        self.vars["stStatus.fActPosition"] = position
+        self.vars["stStatus.bHomed"] = homed
+        self.vars["stStatus.bEnabled"] = enabled
+        self.vars["stStatus.bDone"] = True
+        for masterNum in range(1, 5):
+            for prefix in ("stConfig.astMultiMasterAxis", "stConfig.astMultiMasterAxisLatched"):
+                self.vars[f"{prefix}[{masterNum}].nIndex"] = 0
+                self.vars[f"{prefix}[{masterNum}].fRatio"] = 0.0
+            self.vars[f"stConfig.afMultiSlaveAxisRatio[{masterNum}]"] = 0.0
+
+        # NC parameters read and written with eReadParameter/eWriteParameter
+        self.ncParameters = {
+            E_AxisParameters.AxisId: float(axisNum),
+            E_AxisParameters.AxisDefaultAcceleration: acceleration,
+            E_AxisParameters.AxisDefaultDeceleration: deceleration,
+            E_AxisParameters.AxisDefaultJerk: jerk,
+            E_AxisParameters.AxisCycleTime: CYCLE_TIME,
+        }
+        for axisParam, plcVarPath in NC_PARAMETER_CONFIG_VARIABLES.items():
+            self.ncParameters[axisParam] = float(self.vars[plcVarPath])
+
+    def setError(self, errorId):
+        self.vars["stStatus.bError"] = True
+        self.vars["stStatus.nErrorID"] = errorId
+        self.endCommand(done=False)
+        self.mode = "idle"
+        self.vars["stStatus.fActVelocity"] = 0.0
+
+    def endCommand(self, done=True, aborted=False):
+        self.vars["stStatus.bBusy"] = False
+        self.vars["stStatus.bDone"] = done
+        self.vars["stStatus.bCommandAborted"] = aborted
+
+    def setNcParameter(self, axisParam, value):
+        self.ncParameters[axisParam] = value
+        plcVarPath = NC_PARAMETER_CONFIG_VARIABLES.get(axisParam)
+        if plcVarPath is not None:
+            if plcVarPath.split(".")[1].startswith("b"):
+                self.vars[plcVarPath] = bool(value)
+            else:
+                self.vars[plcVarPath] = value
+
+    def getNcParameter(self, axisParam):
+        if axisParam == E_AxisParameters.CommandedPosition:
+            return self.vars["stStatus.fActPosition"]
+        if axisParam in (E_AxisParameters.ActualVelocity, E_AxisParameters.CommandedVelocity):
+            return self.vars["stStatus.fActVelocity"]
+        plcVarPath = NC_PARAMETER_CONFIG_VARIABLES.get(axisParam)
+        if plcVarPath is not None:
+            return float(self.vars[plcVarPath])
+        return self.ncParameters.get(axisParam, 0.0)
+
+    def checkSoftLimits(self, position):
+        v = self.vars
+        if v["stConfig.bEnMaxSoftPosLimit"] and position > v["stConfig.fMaxSoftPosLimit"]:
+            return False
+        if v["stConfig.bEnMinSoftPosLimit"] and position < v["stConfig.fMinSoftPosLimit"]:
+            return False
+        return True
+
+    def startCommand(self, axes):
+        v = self.vars
+        command = E_MotionFunctions(v["stControl.eCommand"])
+        v["stStatus.bCommandAborted"] = False
+
+        if command == E_MotionFunctions.eWriteParameter:
+            self.setNcParameter(
+                E_AxisParameters(v["stConfig.eAxisParameters"]), v["stConfig.fWriteAxisParameter"]
+            )
+            self.endCommand()
+            return
+        if command == E_MotionFunctions.eReadParameter:
+            v["stConfig.fReadAxisParameter"] = self.getNcParameter(
+                E_AxisParameters(v["stConfig.eAxisParameters"])
+            )
+            self.endCommand()
+            return
+
+        if not v["stStatus.bEnabled"] or v["stStatus.bError"]:
+            self.setError(SIM_ERROR_NOT_ENABLED)
+            return
+
+        v["stStatus.bDone"] = False
+        v["stStatus.bBusy"] = True
+        position = v["stStatus.fActPosition"]
+        self.profileVel = abs(v["stControl.fVelocity"])
+
+        if command in (E_MotionFunctions.eMoveAbsolute, E_MotionFunctions.eMoveRelative):
+            target = v["stControl.fPosition"]
+            if command == E_MotionFunctions.eMoveRelative:
+                target += position
+            if self.profileVel == 0:
+                self.setError(SIM_ERROR_ZERO_VELOCITY)
+            elif not self.checkSoftLimits(target):
+                self.setError(SIM_ERROR_SOFT_LIMIT)
+            else:
+                self.targetPos = target
+                self.mode = "position"
+        elif command == E_MotionFunctions.eMoveVelocity:
+            self.targetVel = v["stControl.fVelocity"]
+            self.mode = "velocity"
+        elif command == E_MotionFunctions.eHome:
+            self.startHoming()
+        elif command == E_MotionFunctions.eGearInMultiMaster:
+            self.mode = "geared"
+            v["stStatus.bGeared"] = True
+            for masterNum in range(1, 5):
+                for field in ("nIndex", "fRatio"):
+                    v[f"stConfig.astMultiMasterAxisLatched[{masterNum}].{field}"] = v[
+                        f"stConfig.astMultiMasterAxis[{masterNum}].{field}"
+                    ]
+                v[f"stStatus.bCoupledGear{masterNum}"] = (
+                    v[f"stConfig.astMultiMasterAxis[{masterNum}].nIndex"] in axes
+                )
+            self.endCommand()
+        elif command == E_MotionFunctions.eGearOut:
+            self.mode = "halt"
+            v["stStatus.bGeared"] = False
+            for masterNum in range(1, 5):
+                v[f"stStatus.bCoupledGear{masterNum}"] = False
+        else:
+            self.endCommand()
+
+    # Homing to a switch runs towards it at fHomingVelToCam, then sets the
+    # position to fHomePosition and moves fHomeFinishDistance away from it
+    def startHoming(self):
+        v = self.vars
+        homeSeq = E_HomingRoutines(v["stConfig.eHomeSeq"])
+        v["stStatus.bHomed"] = False
+        if homeSeq in (E_HomingRoutines.eNoHoming, E_HomingRoutines.eHomeDirect):
+            self.finishHoming()
+            return
+        direction = 1 if homeSeq.name.endswith("Fwd") or homeSeq.name.endswith("FwdLimit") else -1
+        self.targetVel = direction * abs(v["stConfig.fHomingVelToCam"])
+        self.homingStage = "toSwitch"
+        self.mode = "homing"
+
+    def finishHoming(self):
+        v = self.vars
+        v["stStatus.fActPosition"] = v["stConfig.fHomePosition"]
+        v["stStatus.bHomed"] = True
+        if v["stConfig.fHomeFinishDistance"] != 0:
+            self.targetPos = v["stConfig.fHomePosition"] + v["stConfig.fHomeFinishDistance"]
+            self.profileVel = abs(v["stConfig.fHomingVelFromCam"])
+            self.homingStage = None
+            self.mode = "position"
+        else:
+            self.homingStage = None
+            self.mode = "idle"
+            self.endCommand()
+
+    def step(self, dt, axes):
+        v = self.vars
+        v["stStatus.bEnabled"] = v["stControl.bEnable"]
+
+        if v["stControl.bReset"]:
+            v["stControl.bReset"] = False
+            v["stStatus.bError"] = False
+            v["stStatus.nErrorID"] = 0
+
+        if v["stControl.bExecute"]:
+            v["stControl.bExecute"] = False
+            self.startCommand(axes)
+
+        if v["stControl.bHalt"] or v["stControl.bStop"]:
+            v["stControl.bHalt"] = False
+            v["stControl.bStop"] = False
+            if self.mode != "idle":
+                if self.mode != "halt" and v["stStatus.bBusy"]:
+                    v["stStatus.bCommandAborted"] = True
+                self.mode = "halt"
+                v["stStatus.bBusy"] = True
+                v["stStatus.bDone"] = False
+                v["stStatus.bGeared"] = False
+
+        if not v["stStatus.bEnabled"] and self.mode != "idle":
+            self.mode = "idle"
+            v["stStatus.fActVelocity"] = 0.0
+            self.endCommand(done=False, aborted=True)
+
+        self.move(dt, axes)
+        self.updateStatus(dt)
+
+    def move(self, dt, axes):
+        v = self.vars
+        position = v["stStatus.fActPosition"]
+        velocity = v["stStatus.fActVelocity"]
+        acc = abs(v["stControl.fAcceleration"]) or abs(v["stConfig.fMaxAcc"])
+        dec = abs(v["stControl.fDeceleration"]) or abs(v["stConfig.fMaxDec"])
+        override = v["stConfig.fOveride"] / 100
+
+        if self.mode == "position":
+            remaining = self.targetPos - position
+            direction = math.copysign(1, remaining)
+            if velocity * direction < 0:
+                velocity = self.ramp(velocity, 0.0, acc, dec, dt)
+            else:
+                speed = min(
+                    self.profileVel * override,
+                    abs(velocity) + acc * dt,
+                    math.sqrt(2 * dec * abs(remaining)),
+                )
+                velocity = direction * speed
+                if abs(velocity) * dt >= abs(remaining):
+                    position = self.targetPos
+                    velocity = 0.0
+                    self.mode = "idle"
+                    self.endCommand()
+        elif self.mode in ("velocity", "homing"):
+            velocity = self.ramp(velocity, self.targetVel * override, acc, dec, dt)
+            if self.mode == "velocity" and velocity == self.targetVel * override:
+                v["stStatus.bDone"] = True
+        elif self.mode == "halt":
+            velocity = self.ramp(velocity, 0.0, acc, dec, dt)
+            if velocity == 0:
+                self.mode = "idle"
+                self.endCommand()
+        elif self.mode == "geared":
+            velocity = 0.0
+            for masterNum in range(1, 5):
+                masterAxis = axes.get(v[f"stConfig.astMultiMasterAxisLatched[{masterNum}].nIndex"])
+                if masterAxis is not None and masterAxis is not self:
+                    velocity += (
+                        v[f"stConfig.astMultiMasterAxisLatched[{masterNum}].fRatio"]
+                        * masterAxis.vars["stStatus.fActVelocity"]
+                    )
+        else:
+            velocity = 0.0
+
+        position += velocity * dt
+        v["stStatus.fActPosition"] = position
+        v["stStatus.fActVelocity"] = velocity
+        self.checkLimits()
+
+    @staticmethod
+    def ramp(velocity, targetVelocity, acc, dec, dt):
+        if abs(targetVelocity) > abs(velocity) and velocity * targetVelocity >= 0:
+            step = acc * dt
+        else:
+            step = dec * dt
+        if abs(targetVelocity - velocity) <= step:
+            return targetVelocity
+        return velocity + math.copysign(step, targetVelocity - velocity)
+
+    # Limit switches are normally closed: bLimitFwd is False when the switch is hit
+    def checkLimits(self):
+        v = self.vars
+        position = v["stStatus.fActPosition"]
+        velocity = v["stStatus.fActVelocity"]
+        onLimitFwd = self.limitFwdPos is not None and position >= self.limitFwdPos
+        onLimitBwd = self.limitBwdPos is not None and position <= self.limitBwdPos
+        v["stInputs.bLimitFwd"] = not onLimitFwd
+        v["stInputs.bLimitBwd"] = not onLimitBwd
+        v["stStatus.bFwEnabled"] = v["stStatus.bEnabled"] and not onLimitFwd
+        v["stStatus.bBwEnabled"] = v["stStatus.bEnabled"] and not onLimitBwd
+
+        if self.mode == "homing" and ((onLimitFwd and velocity > 0) or (onLimitBwd and velocity < 0)):
+            v["stStatus.fActVelocity"] = 0.0
+            self.finishHoming()
+            return
+
+        if (onLimitFwd and velocity > 0) or (onLimitBwd and velocity < 0):
+            v["stStatus.fActVelocity"] = 0.0
+            if self.mode != "idle":
+                self.mode = "idle"
+                self.endCommand(done=False, aborted=True)
+
+        if self.hardStopFwdPos is not None and position >= self.hardStopFwdPos:
+            v["stStatus.fActPosition"] = self.hardStopFwdPos
+            if velocity > 0:
+                self.setError(SIM_ERROR_POSITION_LAG)
+        if self.hardStopBwdPos is not None and position <= self.hardStopBwdPos:
+            v["stStatus.fActPosition"] = self.hardStopBwdPos
+            if velocity < 0:
+                self.setError(SIM_ERROR_POSITION_LAG)
+
+    def updateStatus(self, dt):
+        v = self.vars
+        velocity = v["stStatus.fActVelocity"]
+        speed = abs(velocity)
+        v["stStatus.bMoving"] = speed > 0
+        v["stStatus.bMovingForward"] = velocity > 0
+        v["stStatus.bMovingBackward"] = velocity < 0
+        v["stStatus.bInTargetPosition"] = (
+            speed == 0
+            and abs(v["stStatus.fActPosition"] - self.targetPos) <= v["stConfig.fTargetPositionWindow"]
+        )
+        v["Axis.Status.Standstill"] = speed == 0
+        v["Axis.Status.Accelerating"] = speed > self.prevSpeed
+        v["Axis.Status.Decelerating"] = speed < self.prevSpeed
+        v["Axis.Status.ConstantVelocity"] = speed > 0 and speed == self.prevSpeed
+        self.prevSpeed = speed
+
+
+class SimulatedPneumaticAxis:
+    def __init__(self, axisNum, travelTime=1.0):
+        self.axisNum = axisNum
+        # Time the cylinder needs to go from one end switch to the other
+        self.travelTime = travelTime
+        self.elapsed = 0.0
+        self.vars = {
+            "stPneumaticAxisControl.bExtend": False,
+            "stPneumaticAxisControl.bRetract": False,
+            "stPneumaticAxisControl.bInterlock": False,
+            "stPneumaticAxisControl.bReset": False,
+            "stPneumaticAxisStatus.bExtending": False,
+            "stPneumaticAxisStatus.bRetracting": False,
+            "stPneumaticAxisStatus.bExtended": False,
+            "stPneumaticAxisStatus.bRetracted": True,
+            "stPneumaticAxisStatus.bSolenoidActive": False,
+            "stPneumaticAxisStatus.bInterlocked": False,
+            "stPneumaticAxisStatus.bPSSPermitOK": True,
+            "stPneumaticAxisStatus.bError": False,
+            "stPneumaticAxisStatus.nTimeElapsedExtend": 0,
+            "stPneumaticAxisStatus.nTimeElapsedRetract": 0,
+            "stPneumaticAxisStatus.sStatus": "Retracted",
+            "stPneumaticAxisConfig.nTimeToExtend": 10,
+            "stPneumaticAxisConfig.nTimeToRetract": 10,
+            "stPneumaticAxisInputs.bEndSwitchFwd": False,
+            "stPneumaticAxisInputs.bEndSwitchBwd": True,
+            "stPneumaticAxisInputs.bSolenoidActive": False,
+            "stPneumaticAxisInputs.bPSSPermit": True,
+            "stPneumaticAxisInputs.bPressureExtend": False,
+            "stPneumaticAxisInputs.bPressureRetract": True,
+            "stPneumaticAxisInputs.bOpenManual": False,
+            "stPneumaticAxisInputs.bCloseManual": False,
+            "stPneumaticAxisInputs.nAirPressureValve": 0,
+            "stPneumaticAxisInputs.nPressureValue": 6,
+            "stPneumaticAxisOutputs.bValveOn": False,
+            "stPneumaticAxisOutputs.bAirPressureOn": True,
+        }
+
+    def step(self, dt, axes):
+        v = self.vars
+        if v["stPneumaticAxisControl.bReset"]:
+            v["stPneumaticAxisControl.bReset"] = False
+            v["stPneumaticAxisStatus.bError"] = False
+        v["stPneumaticAxisStatus.bInterlocked"] = v["stPneumaticAxisControl.bInterlock"]
+
+        if v["stPneumaticAxisControl.bExtend"]:
+            v["stPneumaticAxisControl.bExtend"] = False
+            v["stPneumaticAxisOutputs.bValveOn"] = True
+        if v["stPneumaticAxisControl.bRetract"]:
+            v["stPneumaticAxisControl.bRetract"] = False
+            v["stPneumaticAxisOutputs.bValveOn"] = False
+
+        valveOn = v["stPneumaticAxisOutputs.bValveOn"] and not v["stPneumaticAxisStatus.bInterlocked"]
+        v["stPneumaticAxisStatus.bSolenoidActive"] = valveOn
+        v["stPneumaticAxisInputs.bSolenoidActive"] = valveOn
+        v["stPneumaticAxisInputs.bPressureExtend"] = valveOn
+        v["stPneumaticAxisInputs.bPressureRetract"] = not valveOn
+
+        if valveOn and not v["stPneumaticAxisStatus.bExtended"]:
+            self.travel(dt, "Extend", "bEndSwitchFwd", "bEndSwitchBwd", "bExtending", "bExtended", "bRetracted")
+        elif not valveOn and not v["stPneumaticAxisStatus.bRetracted"]:
+            self.travel(dt, "Retract", "bEndSwitchBwd", "bEndSwitchFwd", "bRetracting", "bRetracted", "bExtended")
+
+    def travel(self, dt, name, endSwitch, otherSwitch, movingBit, reachedBit, leftBit):
+        v = self.vars
+        if not v["stPneumaticAxisStatus." + movingBit]:
+            self.elapsed = 0.0
+            v["stPneumaticAxisStatus.bExtending"] = False
+            v["stPneumaticAxisStatus.bRetracting"] = False
+            v["stPneumaticAxisStatus." + movingBit] = True
+            v["stPneumaticAxisStatus." + leftBit] = False
+            v["stPneumaticAxisInputs." + otherSwitch] = False
+            v["stPneumaticAxisStatus.sStatus"] = name + "ing"
+        self.elapsed += dt
+        v[f"stPneumaticAxisStatus.nTimeElapsed{name}"] = int(self.elapsed * 1000)
+        if self.elapsed >= self.travelTime:
+            v["stPneumaticAxisStatus." + movingBit] = False
+            v["stPneumaticAxisStatus." + reachedBit] = True
+            v["stPneumaticAxisInputs." + endSwitch] = True
+            v["stPneumaticAxisStatus.sStatus"] = name + "ed"
+        elif self.elapsed >= v[f"stPneumaticAxisConfig.nTimeTo{name}"]:
+            v["stPneumaticAxisStatus.bError"] = True
+
+
+class SimulatedPlc:
+    def __init__(self, axes=(), pneumaticAxes=(), cycleTime=CYCLE_TIME):
+        self.cycleTime = cycleTime
+        self.axes = {simAxis.axisNum: simAxis for simAxis in axes}
+        self.pneumaticAxes = {simAxis.axisNum: simAxis for simAxis in pneumaticAxes}
+        self.globals = {
+            "GVL_APP.nAXIS_NUM": max(self.axes, default=0),
+        }
+        # Hex key axes 8 and 9 and their rotation axes 10 and 11
+        # hexScrewOutcome of an axis is "inserted", "collided" or "missed"
+        self.hexKeyAxes = {8: 10, 9: 11}
+        self.hexScrewFullyOutPos = 28.0
+        self.hexScrewInsertedPos = 0.0
+        self.hexScrewOutcome = {8: "inserted", 9: "inserted"}
+        self.hexScrewCollisionRotation = {}
+        self.updateHexScrewStates()
+        self.buildSymbols()
+
+        self.lock = threading.RLock()
+        self.cycleCount = 0
+        self.listeners = []
+        self.thread = None
+        self.running = False
+
+    ###Variable access###
+    def resolve(self, varName):
+        match = AXIS_VAR_NAME.fullmatch(varName)
+        if match:
+            simAxis = self.axes.get(int(match.group(1)))
+            if simAxis is not None and match.group(2) in simAxis.vars:
+                return simAxis.vars, match.group(2)
+        match = PNEUMATIC_AXIS_VAR_NAME.fullmatch(varName)
+        if match:
+            simAxis = self.pneumaticAxes.get(int(match.group(1)))
+            if simAxis is not None and match.group(2) in simAxis.vars:
+                return simAxis.vars, match.group(2)
+        if varName in self.globals:
+            return self.globals, varName
+        raise pyads.ADSError(ADSERR_SYMBOL_NOT_FOUND, f"Symbol {varName} not found")
+
+    def exists(self, varName):
+        try:
+            self.resolve(varName)
+        except pyads.ADSError:
+            return self.readStruct(varName) is not None
+        return True
+
+    def read(self, varName):
+        with self.lock:
+            store, key = self.resolve(varName)
+            return store[key]
+
+    def write(self, varName, value):
+        with self.lock:
+            store, key = self.resolve(varName)
+            store[key] = value
+
+    # Whole stStatus / stInputs structs of an axis as ctypes structures
+    def readStruct(self, varName):
+        match = AXIS_VAR_NAME.fullmatch(varName)
+        if not match or int(match.group(1)) not in self.axes:
+            return None
+        simAxis = self.axes[int(match.group(1))]
+        structType = {"stStatus": ST_AxisStatus, "stInputs": ST_AxisInputs}.get(match.group(2))
+        if structType is None:
+            return None
+        with self.lock:
+            return structType(
+                **{name: simAxis.vars[f"{match.group(2)}.{name}"] for name, _ in structType._fields_}
+            )
+
+    # NC parameter behind an ADS index group/offset and the axis it belongs to
+    # The simulated NC axis IDs are the axis numbers
+    def ncParameterAt(self, indexGroup, indexOffset, write=False):
+        addresses = NC_PARAMETERS_BY_WRITE_ADDRESS if write else NC_PARAMETERS_BY_READ_ADDRESS
+        for indexGroupBase in NC_INDEX_GROUP_BASES:
+            simAxis = self.axes.get(indexGroup - indexGroupBase)
+            axisParam = addresses.get((indexGroupBase, indexOffset))
+            if simAxis is not None and axisParam is not None:
+                return simAxis, axisParam
+        return None, None
+
+    ###Symbol and data type tables###
+    # Lays the symbols out one after the other in SIM_SYMBOL_INDEX_GROUP and
+    # encodes the tables uploaded with ADSIGRP_SYM_UPLOADINFO2/UPLOAD/DT_UPLOAD.
+    # Every variable of the memory is a leaf (offset, size, ctype, store, key)
+    # backed by the same dictionaries the variable names resolve to
+    def buildSymbols(self):
+        symbols = [
+            ("GVL.astAxes", ST_AxisStruct, self.axes),
+            ("GVL.astPneumaticAxes", ST_PneumaticAxis, self.pneumaticAxes),
+        ]
+        symbolData = b""
+        leaves = []
+        offset = 0
+        for name, elementType, simAxes in symbols:
+            arrayType = elementType * max(simAxes, default=1)
+            for axisNum, simAxis in simAxes.items():
+                elementOffset = offset + (axisNum - 1) * ctypes.sizeof(elementType)
+                for path, leafOffset, ctype in leafVariables(elementType, "", elementOffset):
+                    leaves.append((leafOffset, ctypes.sizeof(ctype), ctype, simAxis.vars, path[1:]))
+            symbolData += encodeSymbolEntry(
+                name, SIM_SYMBOL_INDEX_GROUP, offset, ctypes.sizeof(arrayType),
+                *symbolTypeName(arrayType, lowerBound=1))
+            offset += ctypes.sizeof(arrayType)
+        for name, value in self.globals.items():
+            ctype = ctypes.c_bool if isinstance(value, bool) else ctypes.c_int16
+            leaves.append((offset, ctypes.sizeof(ctype), ctype, self.globals, name))
+            symbolData += encodeSymbolEntry(
+                name, SIM_SYMBOL_INDEX_GROUP, offset, ctypes.sizeof(ctype), *symbolTypeName(ctype))
+            offset += ctypes.sizeof(ctype)
+
+        dataTypeData = b"".join(encodeStructType(structType) for structType in SIM_STRUCT_TYPES)
+        dataTypeData += b"".join(
+            encodeDataTypeEntry(enumName, "INT", 2, 0, pyads.constants.ADST_INT16)
+            for enumName in SIM_ENUM_TYPES
+        )
+        dataTypeCount = len(SIM_STRUCT_TYPES) + len(SIM_ENUM_TYPES)
+        symbolCount = len(symbols) + len(self.globals)
+
+        # Incremented by TwinCAT on every download and online change, see onlineChange
+        self.symbolVersion = 1
+        self.symbolUploadInfo = SYMBOL_UPLOAD_INFO.pack(
+            symbolCount, len(symbolData), dataTypeCount, len(dataTypeData), 0, 0)
+        self.symbolData = symbolData
+        self.dataTypeData = dataTypeData
+        self.memorySize = offset
+        self.leaves = sorted(leaves, key=lambda leaf: leaf[0])
+        self.leafOffsets = [leaf[0] for leaf in self.leaves]
+
+    # Stands in for an online change of the PLC program: only the symbol version
+    # changes, the layout stays the same
+    def onlineChange(self):
+        with self.lock:
+            self.symbolVersion = (self.symbolVersion + 1) % 256
+
+    # Leaves overlapping size bytes at offset
+    def leavesAt(self, offset, size):
+        i = max(bisect.bisect_right(self.leafOffsets, offset) - 1, 0)
+        while i < len(self.leaves) and self.leaves[i][0] < offset + size:
+            if self.leaves[i][0] + self.leaves[i][1] > offset:
+                yield self.leaves[i]
+            i += 1
+
+    def readMemory(self, offset, size):
+        if offset < 0 or offset + size > self.memorySize:
+            raise pyads.ADSError(ADSERR_INVALID_OFFSET, f"Offset {offset:#x} out of the symbol memory")
+        data = bytearray(size)
+        with self.lock:
+            for leafOffset, leafSize, ctype, store, key in self.leavesAt(offset, size):
+                leafData = leafBytes(ctype, store[key])
+                start, end = max(leafOffset, offset), min(leafOffset + leafSize, offset + size)
+                data[start - offset:end - offset] = leafData[start - leafOffset:end - leafOffset]
+        return bytes(data)
+
+    # Leaves written only in part keep the rest of their bytes
+    def writeMemory(self, offset, data):
+        if offset < 0 or offset + len(data) > self.memorySize:
+            raise pyads.ADSError(ADSERR_INVALID_OFFSET, f"Offset {offset:#x} out of the symbol memory")
+        with self.lock:
+            for leafOffset, leafSize, ctype, store, key in self.leavesAt(offset, len(data)):
+                leafData = bytearray(leafBytes(ctype, store[key]))
+                start, end = max(leafOffset, offset), min(leafOffset + leafSize, offset + len(data))
+                leafData[start - leafOffset:end - leafOffset] = data[start - offset:end - offset]
+                store[key] = leafValue(ctype, bytes(leafData))
+
+    ###Cyclic task###
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="SimulatedPlc", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        nextCycle = time.monotonic()
+        while self.running:
+            self.cycle()
+            nextCycle += self.cycleTime
+            delay = nextCycle - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                nextCycle = time.monotonic()
+
+    def cycle(self):
+        with self.lock:
+            for simAxis in self.axes.values():
+                simAxis.step(self.cycleTime, self.axes)
+            for simAxis in self.pneumaticAxes.values():
+                simAxis.step(self.cycleTime, self.axes)
+            self.updateHexScrewStates()
+            self.cycleCount += 1
+        for listener in list(self.listeners):
+            listener()
+
+    def updateHexScrewStates(self):
+        for hexAxisNum, rotationAxisNum in self.hexKeyAxes.items():
+            name = f"Hex_Screw_States_8_9.bHexScrew%s{hexAxisNum}"
+            simAxis = self.axes.get(hexAxisNum)
+            if simAxis is None:
+                continue
+            position = simAxis.vars["stStatus.fActPosition"]
+            atInsertion = position <= self.hexScrewInsertedPos + 0.5
+            outcome = self.hexScrewOutcome.get(hexAxisNum, "inserted")
+            rotationAxis = self.axes.get(rotationAxisNum)
+            if outcome == "collided" and atInsertion and rotationAxis is not None:
+                # A collided key slides in once the rotation axis turned a bit
+                rotation = rotationAxis.vars["stStatus.fActPosition"]
+                startRotation = self.hexScrewCollisionRotation.setdefault(hexAxisNum, rotation)
+                if abs(rotation - startRotation) >= 10:
+                    outcome = "inserted"
+            self.globals[name % "FullyOut"] = position >= self.hexScrewFullyOutPos - 0.5
+            self.globals[name % "Inserted"] = atInsertion and outcome == "inserted"
+            self.globals[name % "Collided"] = atInsertion and outcome == "collided"
+            self.globals[name % "Missed"] = atInsertion and outcome == "missed"
+
+
+# Simulated axes of the ESTIA Selene hex key test rig
+# Axes 6 and 7 position the key carriage (X, Z), 8 and 9 insert the keys
+# and 10 and 11 rotate them until they hit the end of the screw range.
+# Axes 6 and 7 are homed and enabled as on the machine, Test_HexKeys only
+# initialises axes 8 to 11
+def hexTestRig(cycleTime=CYCLE_TIME):
+    axes = [SimulatedAxis(axisNum) for axisNum in range(1, 6)]
+    axes += [
+        SimulatedAxis(6, position=6867.8, velocity=50, acceleration=100, deceleration=100,
+                      limitFwdPos=7500, limitBwdPos=-10, homed=True, enabled=True),
+        SimulatedAxis(7, position=474, velocity=20, acceleration=50, deceleration=50,
+                      limitFwdPos=600, limitBwdPos=-10, homed=True, enabled=True),
+        SimulatedAxis(8, position=28, velocity=10, acceleration=50, deceleration=50,
+                      limitFwdPos=40, limitBwdPos=-5),
+        SimulatedAxis(9, position=28, velocity=10, acceleration=50, deceleration=50,
+                      limitFwdPos=40, limitBwdPos=-5),
+        SimulatedAxis(10, velocity=60, acceleration=200, deceleration=200,
+                      hardStopFwdPos=180, hardStopBwdPos=-180),
+        SimulatedAxis(11, velocity=60, acceleration=200, deceleration=200,
+                      hardStopFwdPos=170, hardStopBwdPos=-175),
+    ]
+    for simAxis in axes[7:9]:
+        simAxis.vars["stConfig.eHomeSeq"] = E_HomingRoutines.eHomeToLimit_Fwd.value
+        simAxis.vars["stConfig.fHomePosition"] = 40.0
+        simAxis.vars["stConfig.fHomeFinishDistance"] = -12.0
+    return SimulatedPlc(axes, [SimulatedPneumaticAxis(1)], cycleTime=cycleTime)
+
+
+class SimulatedConnection:
+    def __init__(self, simPlc):
+        self.simPlc = simPlc
+        self.is_open = False
+        self.handles = {}
+        self.nextHandle = 1
+        self.notifications = {}
+        self.nextNotificationHandle = 1
+        self.notificationLock = threading.Lock()
+        # Number of ADS requests sent, to compare round trips between implementations
+        self.requestCount = 0
+        self.simPlc.listeners.append(self.checkNotifications)
+
+    def open(self):
+        self.simPlc.start()
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+        with self.notificationLock:
+            self.notifications.clear()
+
+    def read_device_info(self):
+        self.requestCount += 1
+        return ("Simulated TwinCAT PLC", "3.1.4024")
+
+    def read_state(self):
+        self.requestCount += 1
+        return (pyads.ADSSTATE_RUN, 0)
+
+    ###Symbols###
+    def get_handle(self, data_name):
+        self.requestCount += 1
+        if not self.simPlc.exists(data_name):
+            raise pyads.ADSError(ADSERR_SYMBOL_NOT_FOUND, f"Symbol {data_name} not found")
+        handle = self.nextHandle
+        self.nextHandle += 1
+        self.handles[handle] = data_name
+        return handle
+
+    def release_handle(self, handle):
+        self.requestCount += 1
+        self.handles.pop(handle, None)
+
+    def nameOfHandle(self, handle):
+        if handle not in self.handles:
+            raise pyads.ADSError(ADSERR_INVALID_HANDLE, f"Invalid handle {handle}")
+        return self.handles[handle]
+
+    def read_by_name(self, data_name, plc_datatype=None, return_ctypes=False, handle=None, **kwargs):
+        self.requestCount += 1
+        if handle is not None:
+            data_name = self.nameOfHandle(handle)
+        value = self.simPlc.read(data_name)
+        return toPlcType(value, plc_datatype)
+
+    def write_by_name(self, data_name, value, plc_datatype=None, handle=None, **kwargs):
+        self.requestCount += 1
+        if handle is not None:
+            data_name = self.nameOfHandle(handle)
+        self.simPlc.write(data_name, toPlcType(value, plc_datatype))
+
+    def read_list_by_name(self, data_names, **kwargs):
+        self.requestCount += 1
+        return {data_name: self.simPlc.read(data_name) for data_name in data_names}
+
+    def write_list_by_name(self, data_names_and_values, **kwargs):
+        self.requestCount += 1
+        with self.simPlc.lock:
+            for data_name in data_names_and_values:
+                self.simPlc.resolve(data_name)
+            for data_name, value in data_names_and_values.items():
+                self.simPlc.write(data_name, value)
+        return {data_name: "no error" for data_name in data_names_and_values}
+
+    ###Index group/offset access###
+    # Symbol and data type tables and the symbol memory, returned as ctypes
+    def read(self, index_group, index_offset, plc_datatype, return_ctypes=False, check_length=True):
+        self.requestCount += 1
+        size = ctypes.sizeof(plc_datatype)
+        if index_group == pyads.constants.ADSIGRP_SYM_UPLOADINFO2:
+            data = self.simPlc.symbolUploadInfo
+        elif index_group == pyads.constants.ADSIGRP_SYM_VERSION:
+            data = bytes([self.simPlc.symbolVersion])
+        elif index_group == pyads.constants.ADSIGRP_SYM_UPLOAD:
+            data = self.simPlc.symbolData
+        elif index_group == pyads.constants.ADSIGRP_SYM_DT_UPLOAD:
+            data = self.simPlc.dataTypeData
+        elif index_group == SIM_SYMBOL_INDEX_GROUP:
+            data = self.simPlc.readMemory(index_offset, size)
+        else:
+            raise pyads.ADSError(0x702, f"Index group {index_group:#x} not simulated")
+        value = plc_datatype.from_buffer_copy(data[:size].ljust(size, b"\0"))
+        if return_ctypes or not isinstance(value, ctypes._SimpleCData):
+            return value
+        return value.value
+
+    def write(self, index_group, index_offset, value, plc_datatype):
+        self.requestCount += 1
+        if index_group != SIM_SYMBOL_INDEX_GROUP:
+            raise pyads.ADSError(0x702, f"Index group {index_group:#x} not simulated")
+        if not isinstance(value, (ctypes._SimpleCData, ctypes.Structure, ctypes.Array)):
+            value = plc_datatype(value)
+        self.simPlc.writeMemory(index_offset, bytes(value))
+
+    def read_write(self, index_group, index_offset, plc_read_datatype, value, plc_write_datatype,
+                   return_ctypes=False, check_length=True):
+        self.requestCount += 1
+        errors = b""
+        data = b""
+        if index_group == pyads.constants.ADSIGRP_SUMUP_READ:
+            with self.simPlc.lock:
+                for request in value:
+                    errorCode, requestData = self.readArea(request.iGroup, request.iOffset, request.size)
+                    errors += errorCode.to_bytes(4, "little")
+                    data += requestData
+        elif index_group == pyads.constants.ADSIGRP_SUMUP_WRITE:
+            # value holds index_offset SAdsSumRequest headers followed by the data
+            value = bytes(value)
+            headerSize = ctypes.sizeof(pyads.structs.SAdsSumRequest)
+            dataOffset = index_offset * headerSize
+            with self.simPlc.lock:
+                for i in range(index_offset):
+                    request = pyads.structs.SAdsSumRequest.from_buffer_copy(value, i * headerSize)
+                    errorCode = self.writeArea(
+                        request.iGroup, request.iOffset, value[dataOffset:dataOffset + request.size])
+                    errors += errorCode.to_bytes(4, "little")
+                    dataOffset += request.size
+        else:
+            raise pyads.ADSError(0x702, f"Index group {index_group:#x} not simulated")
+        response = errors + data
+        return (ctypes.c_ubyte * len(response)).from_buffer_copy(response)
+
+    def readArea(self, indexGroup, indexOffset, size):
+        if indexGroup == SIM_SYMBOL_INDEX_GROUP:
+            try:
+                return 0, self.simPlc.readMemory(indexOffset, size)
+            except pyads.ADSError as e:
+                return e.err_code, bytes(size)
+        if indexGroup == pyads.constants.ADSIGRP_SYM_VERSION:
+            return 0, bytes([self.simPlc.symbolVersion]).ljust(size, b"\0")
+        simAxis, axisParam = self.simPlc.ncParameterAt(indexGroup, indexOffset)
+        if axisParam is not None:
+            dataType = NC_PARAMETER_TYPES[NC_AXIS_PARAMETER_ADDRESSES[axisParam].dataType]
+            value = simAxis.getNcParameter(axisParam)
+            if dataType is not ctypes.c_double:
+                value = int(value)
+            return 0, bytes(dataType(value))[:size].ljust(size, b"\0")
+        if indexGroup != pyads.constants.ADSIGRP_SYM_VALBYHND or indexOffset not in self.handles:
+            return ADSERR_INVALID_HANDLE, bytes(size)
+        data_name = self.handles[indexOffset]
+        struct = self.simPlc.readStruct(data_name)
+        if struct is None:
+            return 0, toBytes(self.simPlc.read(data_name), size)
+        return 0, bytes(struct)[:size].ljust(size, b"\0")
+
+    def writeArea(self, indexGroup, indexOffset, data):
+        if indexGroup == SIM_SYMBOL_INDEX_GROUP:
+            try:
+                self.simPlc.writeMemory(indexOffset, data)
+            except pyads.ADSError as e:
+                return e.err_code
+            return 0
+        if indexGroup == pyads.constants.ADSIGRP_SYM_VALBYHND:
+            if indexOffset not in self.handles:
+                return ADSERR_INVALID_HANDLE
+            data_name = self.handles[indexOffset]
+            self.simPlc.write(data_name, fromBytes(data, self.simPlc.read(data_name)))
+            return 0
+        simAxis, axisParam = self.simPlc.ncParameterAt(indexGroup, indexOffset, write=True)
+        if axisParam is None:
+            return ADSERR_INVALID_HANDLE
+        dataType = NC_PARAMETER_TYPES[NC_AXIS_PARAMETER_ADDRESSES[axisParam].dataType]
+        simAxis.setNcParameter(axisParam, float(dataType.from_buffer_copy(data).value))
+        return 0
+
+    ###Notifications###
+    def add_device_notification(self, data, attr, callback, user_handle=None):
+        self.requestCount += 1
+        if not self.simPlc.exists(data):
+            raise pyads.ADSError(ADSERR_SYMBOL_NOT_FOUND, f"Symbol {data} not found")
+        with self.notificationLock:
+            notificationHandle = self.nextNotificationHandle
+            self.nextNotificationHandle += 1
+            self.notifications[notificationHandle] = [data, callback, None]
+        # Like TwinCAT the current value is sent straight away
+        self.checkNotifications()
+        return notificationHandle, user_handle if user_handle is not None else notificationHandle
+
+    def del_device_notification(self, notification_handle, user_handle):
+        self.requestCount += 1
+        with self.notificationLock:
+            self.notifications.pop(notification_handle, None)
+
+    # The simulated notification is (handle, timestamp, value) already
+    def parse_notification(self, notification, plc_datatype, timestamp_as_filetime=False):
+        notificationHandle, timestamp, value = notification
+        return notificationHandle, timestamp, toPlcType(value, plc_datatype)
+
+    def checkNotifications(self):
+        changed = []
+        with self.notificationLock:
+            for notificationHandle, notification in self.notifications.items():
+                data, callback, lastValue = notification
+                value = self.simPlc.read(data)
+                if lastValue is None or value != lastValue[0]:
+                    notification[2] = (value,)
+                    changed.append((callback, (notificationHandle, datetime.now(), value), data))
+        for callback, notification, data in changed:
+            callback(notification, data)
+
+
+# Converts a simulated value to what pyads returns for plcVarType
+def toPlcType(value, plcVarType):
+    if plcVarType is None or plcVarType == pyads.PLCTYPE_STRING:
+        return value
+    if isinstance(plcVarType, type) and issubclass(plcVarType, ctypes._SimpleCData):
+        return plcVarType(value).value
+    return value
+
+
+# Raw data of size bytes of a simulated value read by handle
+def toBytes(value, size):
+    if isinstance(value, bool):
+        return bytes([value]).ljust(size, b"\0")
+    if isinstance(value, float):
+        return bytes(ctypes.c_double(value) if size == 8 else ctypes.c_float(value))
+    if isinstance(value, int):
+        return value.to_bytes(size, "little", signed=value < 0)
+    return value.encode()[:size - 1].ljust(size, b"\0")
+
+
+# Decodes raw data written to a simulated variable, whose type is that of its current value
+def fromBytes(data, currentValue):
+    if isinstance(currentValue, bool):
+        return bool(data[0])
+    if len(data) == 8:
+        return ctypes.c_double.from_buffer_copy(data).value
+    if isinstance(currentValue, float):
+        return ctypes.c_float.from_buffer_copy(data).value
+    if isinstance(currentValue, int):
+        return int.from_bytes(data, "little", signed=len(data) == 2)
+    return data.split(b"\0", 1)[0].decode()
+
+
+###TCP stand-in###
+# Requests and answers are JSON lines; notifications are pushed on the same socket
+# PLC types travel as their pyads PLCTYPE_* name
+PLC_TYPES_BY_NAME = {
+    name: getattr(pyads, name) for name in dir(pyads) if name.startswith("PLCTYPE_")
+    and isinstance(getattr(pyads, name), type)
+}
+
+
+def plcTypeName(plcVarType):
+    for name, namedType in PLC_TYPES_BY_NAME.items():
+        if namedType is plcVarType:
+            return name
+    return None
+
+
+class SimulatedPlcRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        connection = SimulatedConnection(self.server.simPlc)
+        connection.open()
+        sendLock = threading.Lock()
+
+        def send(message):
+            with sendLock:
+                self.wfile.write((json.dumps(message) + "\n").encode())
+                self.wfile.flush()
+
+        def notify(notification, data):
+            notificationHandle, timestamp, value = notification
+            send({"notification": notificationHandle, "data": data, "value": value,
+                  "timestamp": timestamp.isoformat()})
+
+        try:
+            for line in self.rfile:
+                request = json.loads(line)
+                try:
+                    result = self.call(connection, request, notify)
+                    send({"id": request["id"], "result": result})
+                except pyads.ADSError as e:
+                    send({"id": request["id"], "error": e.err_code, "text": str(e)})
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.server.simPlc.listeners.remove(connection.checkNotifications)
+            connection.close()
+
+    def call(self, connection, request, notify):
+        method = request["method"]
+        args = request.get("args", [])
+        if method in ("read_by_name", "write_by_name"):
+            plcVarType = PLC_TYPES_BY_NAME.get(request.get("plcType"))
+            if method == "read_by_name":
+                return connection.read_by_name(args[0], plcVarType, handle=request.get("handle"))
+            return connection.write_by_name(args[0], args[1], plcVarType, handle=request.get("handle"))
+        if method == "sum_read":
+            requests = (pyads.structs.SAdsSumRequest * len(args))(*[
+                pyads.structs.SAdsSumRequest(*request) for request in args
+            ])
+            return bytes(connection.read_write(
+                pyads.constants.ADSIGRP_SUMUP_READ, len(args), None, requests, None
+            )).hex()
+        if method == "sum_write":
+            return bytes(connection.read_write(
+                pyads.constants.ADSIGRP_SUMUP_WRITE, args[0], None, bytes.fromhex(args[1]), None
+            )).hex()
+        if method == "read":
+            dataType = ctypes.c_ubyte * args[2]
+            return bytes(connection.read(args[0], args[1], dataType, return_ctypes=True)).hex()
+        if method == "write":
+            data = bytes.fromhex(args[2])
+            return connection.write(args[0], args[1], (ctypes.c_ubyte * len(data)).from_buffer_copy(data), None)
+        if method == "add_device_notification":
+            return connection.add_device_notification(args[0], None, notify)
+        if method in ("open", "close", "read_device_info", "read_state", "get_handle",
+                      "release_handle", "read_list_by_name", "write_list_by_name",
+                      "del_device_notification"):
+            return getattr(connection, method)(*args)
+        raise pyads.ADSError(0x701, f"{method} not simulated")
+
+
+class SimulatedPlcServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, simPlc, host="localhost", port=48900):
+        self.simPlc = simPlc
+        super().__init__((host, port), SimulatedPlcRequestHandler)
+
+
+class RemoteSimulatedConnection:
+    def __init__(self, host="localhost", port=48900):
+        self.host = host
+        self.port = port
+        self.is_open = False
+        self.socket = None
+        self.nextId = 1
+        self.pending = {}
+        self.callbacks = {}
+        # Notifications that arrived before add_device_notification returned
+        self.unclaimed = {}
+        self.lock = threading.Lock()
+        self.requestCount = 0
+
+    def open(self):
+        self.socket = socket.create_connection((self.host, self.port))
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.socket.makefile("r")
+        self.writer = self.socket.makefile("w")
+        threading.Thread(target=self.receive, name="RemoteSimulatedConnection", daemon=True).start()
+        self.is_open = True
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            self.socket.close()
+
+    def receive(self):
+        try:
+            for line in self.reader:
+                message = json.loads(line)
+                if "notification" in message:
+                    notification = (
+                        message["notification"],
+                        datetime.fromisoformat(message["timestamp"]),
+                        message["value"],
+                    )
+                    with self.lock:
+                        callback = self.callbacks.get(message["notification"])
+                        if callback is None:
+                            self.unclaimed.setdefault(message["notification"], []).append(
+                                (notification, message["data"]))
+                    if callback is not None:
+                        callback(notification, message["data"])
+                    continue
+                waiter = self.pending.pop(message["id"])
+                waiter[1] = message
+                waiter[0].set()
+        except (ConnectionError, OSError, ValueError):
+            pass
+
+    def call(self, method, *args, **fields):
+        self.requestCount += 1
+        waiter = [threading.Event(), None]
+        with self.lock:
+            requestId = self.nextId
+            self.nextId += 1
+            self.pending[requestId] = waiter
+            self.writer.write(json.dumps(dict(id=requestId, method=method, args=args, **fields)) + "\n")
+            self.writer.flush()
+        waiter[0].wait()
+        answer = waiter[1]
+        if "error" in answer:
+            raise pyads.ADSError(answer["error"], answer["text"])
+        return answer["result"]
+
+    def read_device_info(self):
+        return tuple(self.call("read_device_info"))
+
+    def read_state(self):
+        return tuple(self.call("read_state"))
+
+    def get_handle(self, data_name):
+        return self.call("get_handle", data_name)
+
+    def release_handle(self, handle):
+        self.call("release_handle", handle)
+
+    def read_by_name(self, data_name, plc_datatype=None, return_ctypes=False, handle=None, **kwargs):
+        return self.call("read_by_name", data_name, plcType=plcTypeName(plc_datatype), handle=handle)
+
+    def write_by_name(self, data_name, value, plc_datatype=None, handle=None, **kwargs):
+        self.call("write_by_name", data_name, value, plcType=plcTypeName(plc_datatype), handle=handle)
+
+    def read_list_by_name(self, data_names, **kwargs):
+        return self.call("read_list_by_name", list(data_names))
+
+    def write_list_by_name(self, data_names_and_values, **kwargs):
+        return self.call("write_list_by_name", data_names_and_values)
+
+    # The data travels as hex and is decoded here with plc_datatype
+    def read(self, index_group, index_offset, plc_datatype, return_ctypes=False, check_length=True):
+        data = bytes.fromhex(self.call("read", index_group, index_offset, ctypes.sizeof(plc_datatype)))
+        value = plc_datatype.from_buffer_copy(data)
+        if return_ctypes or not isinstance(value, ctypes._SimpleCData):
+            return value
+        return value.value
+
+    def write(self, index_group, index_offset, value, plc_datatype):
+        if not isinstance(value, (ctypes._SimpleCData, ctypes.Structure, ctypes.Array)):
+            value = plc_datatype(value)
+        self.call("write", index_group, index_offset, bytes(value).hex())
+
+    def read_write(self, index_group, index_offset, plc_read_datatype, value, plc_write_datatype,
+                   return_ctypes=False, check_length=True):
+        if index_group == pyads.constants.ADSIGRP_SUMUP_READ:
+            response = bytes.fromhex(self.call(
+                "sum_read", *[(request.iGroup, request.iOffset, request.size) for request in value]
+            ))
+        elif index_group == pyads.constants.ADSIGRP_SUMUP_WRITE:
+            response = bytes.fromhex(self.call("sum_write", index_offset, bytes(value).hex()))
+        else:
+            raise pyads.ADSError(0x702, f"Index group {index_group:#x} not simulated")
+        return (ctypes.c_ubyte * len(response)).from_buffer_copy(response)
+
+    def add_device_notification(self, data, attr, callback, user_handle=None):
+        notificationHandle, userHandle = self.call("add_device_notification", data)
+        # The first value is sent before the answer so it has to be replayed
+        with self.lock:
+            self.callbacks[notificationHandle] = callback
+            unclaimed = self.unclaimed.pop(notificationHandle, [])
+        for notification, notificationData in unclaimed:
+            callback(notification, notificationData)
+        return notificationHandle, userHandle
+
+    def del_device_notification(self, notification_handle, user_handle):
+        self.callbacks.pop(notification_handle, None)
+        self.call("del_device_notification", notification_handle, user_handle)
+
+    def parse_notification(self, notification, plc_datatype, timestamp_as_filetime=False):
+        notificationHandle, timestamp, value = notification
+        return notificationHandle, timestamp, toPlcType(value, plc_datatype)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the simulated hex key test rig PLC on a TCP port")
+    parser.add_argument("--host", default="localhost", help="Interface to listen on")
+    parser.add_argument("--port", default=48900, type=int, help="TCP port to listen on")
+    parser.add_argument("--cycle-time", default=CYCLE_TIME, type=float, help="PLC cycle time in s")
+    args = parser.parse_args()
+
+    simPlc = hexTestRig(cycleTime=args.cycle_time).start()
+    with SimulatedPlcServer(simPlc, args.host, args.port) as server:
+        print(f"Simulated PLC listening on {args.host}:{args.port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            sys.exit()
@@ -0,0 +1,418 @@
+#!/usr/bin/env python
+
+"""
+This file contains the symbol and data type table of a PLC
+
+uploadSymbolTable reads the tables of all PLC symbols and data types once.
+SymbolTable builds ctypes layouts of the PLC data types from it (e.g. of
+ST_AxisStruct and ST_PneumaticAxis) and resolves variable names such as
+GVL.astAxes[6].stStatus.bDone to a TypedAccessor: the index group/offset of
+the variable and its ctypes type as declared in the PLC.
+
+saveManifest keeps the tables on disk with the key of the PLC they came from
+(device info, symbol version and table sizes). loadManifest only returns them
+if the key still matches, so later sessions skip the upload.
+"""
+import os
+import re
+import json
+import struct
+import ctypes
+import collections
+import pyads
+
+# Symbols of the PLC by name: index group/offset, size and PLC type name
+SymbolInfo = collections.namedtuple("SymbolInfo", "name indexGroup indexOffset size typeName")
+# Data types of the PLC by name
+# arrayInfo is a tuple of (lowerBound, elements), subItems a tuple of DataTypeInfo
+# whose offset is relative to the start of the parent type
+DataTypeInfo = collections.namedtuple(
+    "DataTypeInfo", "name typeName size offset dataTypeId arrayInfo subItems"
+)
+
+# Header of AdsSymbolUploadInfo2: symbols, symbol table size, data types,
+# data type table size, max and used dynamic symbols
+SYMBOL_UPLOAD_INFO = struct.Struct("<6I")
+# Header of AdsSymbolEntry: entryLength, indexGroup, indexOffset, size,
+# dataType, flags, nameLength, typeLength, commentLength
+SYMBOL_ENTRY = struct.Struct("<6I3H")
+# Header of AdsDatatypeEntry: entryLength, version, hashValue, typeHashValue,
+# size, offset, dataType, flags, nameLength, typeLength, commentLength,
+# arrayDim, subItems
+DATA_TYPE_ENTRY = struct.Struct("<8I5H")
+ARRAY_INFO = struct.Struct("<iI")
+
+# ctypes of the PLC base types
+BASE_TYPES = {
+    "BOOL": ctypes.c_bool,
+    "BIT": ctypes.c_bool,
+    "BYTE": ctypes.c_uint8,
+    "USINT": ctypes.c_uint8,
+    "SINT": ctypes.c_int8,
+    "WORD": ctypes.c_uint16,
+    "UINT": ctypes.c_uint16,
+    "INT": ctypes.c_int16,
+    "DWORD": ctypes.c_uint32,
+    "UDINT": ctypes.c_uint32,
+    "DINT": ctypes.c_int32,
+    "LWORD": ctypes.c_uint64,
+    "ULINT": ctypes.c_uint64,
+    "LINT": ctypes.c_int64,
+    "REAL": ctypes.c_float,
+    "LREAL": ctypes.c_double,
+    "TIME": ctypes.c_uint32,
+    "TOD": ctypes.c_uint32,
+    "TIME_OF_DAY": ctypes.c_uint32,
+    "DATE": ctypes.c_uint32,
+    "DT": ctypes.c_uint32,
+    "DATE_AND_TIME": ctypes.c_uint32,
+    "LTIME": ctypes.c_uint64,
+}
+# ctypes of the ADS data type IDs, for enums and aliases given only by their ID
+ADS_DATA_TYPES = {
+    pyads.constants.ADST_INT8: ctypes.c_int8,
+    pyads.constants.ADST_UINT8: ctypes.c_uint8,
+    pyads.constants.ADST_INT16: ctypes.c_int16,
+    pyads.constants.ADST_UINT16: ctypes.c_uint16,
+    pyads.constants.ADST_INT32: ctypes.c_int32,
+    pyads.constants.ADST_UINT32: ctypes.c_uint32,
+    pyads.constants.ADST_INT64: ctypes.c_int64,
+    pyads.constants.ADST_UINT64: ctypes.c_uint64,
+    pyads.constants.ADST_REAL32: ctypes.c_float,
+    pyads.constants.ADST_REAL64: ctypes.c_double,
+    pyads.constants.ADST_BIT: ctypes.c_bool,
+}
+# Length of a STRING without a length
+STRING_DEFAULT_LENGTH = 80
+# TwinCAT strings are Windows-1252
+STRING_ENCODING = "cp1252"
+# Format of the manifest files, manifests of other versions are ignored
+SYMBOL_MANIFEST_VERSION = 1
+
+STRING_TYPE = re.compile(r"STRING(?:\((\d+)\))?", re.IGNORECASE)
+ARRAY_TYPE = re.compile(r"ARRAY\s*\[(.+?)\]\s*OF\s+(.+)", re.IGNORECASE)
+# Name parts of a variable name: identifiers and [indices]
+VAR_NAME_PARTS = re.compile(r"\[[^\]]*\]|[^.\[]+")
+
+
+# Splits "ARRAY [1..4, 0..2] OF ST_X" into ([(1, 4), (0, 3)], "ST_X")
+# The bounds are returned as (lowerBound, elements)
+def parseArrayType(typeName):
+    match = ARRAY_TYPE.fullmatch(typeName.strip())
+    if not match:
+        return None, None
+    dims = []
+    for dim in match.group(1).split(","):
+        lower, upper = dim.split("..")
+        dims.append((int(lower), int(upper) - int(lower) + 1))
+    return dims, match.group(2).strip()
+
+
+def readCString(data, pos, length):
+    return data[pos:pos + length].decode(STRING_ENCODING), pos + length + 1
+
+
+# Symbols of the ADSIGRP_SYM_UPLOAD table
+def parseSymbols(data):
+    symbols = {}
+    pos = 0
+    while pos + SYMBOL_ENTRY.size <= len(data):
+        (entryLength, indexGroup, indexOffset, size, _, _,
+         nameLength, typeLength, _) = SYMBOL_ENTRY.unpack_from(data, pos)
+        if entryLength == 0:
+            break
+        name, namePos = readCString(data, pos + SYMBOL_ENTRY.size, nameLength)
+        typeName, _ = readCString(data, namePos, typeLength)
+        symbols[name] = SymbolInfo(name, indexGroup, indexOffset, size, typeName)
+        pos += entryLength
+    return symbols
+
+
+# One data type entry and its sub items, returns the entry and the position after it
+def parseDataTypeEntry(data, pos):
+    (entryLength, _, _, _, size, offset, dataTypeId, _,
+     nameLength, typeLength, commentLength, arrayDim, subItemCount) = DATA_TYPE_ENTRY.unpack_from(data, pos)
+    name, itemPos = readCString(data, pos + DATA_TYPE_ENTRY.size, nameLength)
+    typeName, itemPos = readCString(data, itemPos, typeLength)
+    itemPos += commentLength + 1
+    arrayInfo = []
+    for _ in range(arrayDim):
+        arrayInfo.append(ARRAY_INFO.unpack_from(data, itemPos))
+        itemPos += ARRAY_INFO.size
+    subItems = []
+    for _ in range(subItemCount):
+        subItem, itemPos = parseDataTypeEntry(data, itemPos)
+        subItems.append(subItem)
+    entry = DataTypeInfo(name, typeName, size, offset, dataTypeId, tuple(arrayInfo), tuple(subItems))
+    return entry, pos + entryLength
+
+
+# Data types of the ADSIGRP_SYM_DT_UPLOAD table
+def parseDataTypes(data):
+    dataTypes = {}
+    pos = 0
+    while pos + DATA_TYPE_ENTRY.size <= len(data):
+        if int.from_bytes(data[pos:pos + 4], "little") == 0:
+            break
+        entry, pos = parseDataTypeEntry(data, pos)
+        dataTypes[entry.name] = entry
+    return dataTypes
+
+
+def readBytes(connection, indexGroup, size):
+    if size == 0:
+        return b""
+    return bytes(connection.read(indexGroup, 0, ctypes.c_ubyte * size, return_ctypes=True))
+
+
+# Symbol version of the PLC, incremented on every download and online change
+# The index offsets of a symbol table are only valid for the version it was
+# uploaded with
+def readSymbolVersion(connection):
+    return connection.read(
+        pyads.constants.ADSIGRP_SYM_VERSION, 0, ctypes.c_ubyte, return_ctypes=True).value
+
+
+# Identifies the symbol tables of a PLC: deviceInfo, the symbol version and the
+# AdsSymbolUploadInfo2 (numbers and sizes of the tables), two small ADS requests
+def symbolTableKey(connection, deviceInfo):
+    symbolVersion = readSymbolVersion(connection)
+    info = readBytes(connection, pyads.constants.ADSIGRP_SYM_UPLOADINFO2, SYMBOL_UPLOAD_INFO.size)
+    return {
+        "deviceInfo": deviceInfo,
+        "symbolVersion": symbolVersion,
+        "uploadInfo": list(SYMBOL_UPLOAD_INFO.unpack(info)),
+    }
+
+
+# Reads the symbol and data type tables of the PLC, three ADS requests
+def uploadSymbolTable(connection):
+    info = readBytes(connection, pyads.constants.ADSIGRP_SYM_UPLOADINFO2, SYMBOL_UPLOAD_INFO.size)
+    _, symbolSize, _, dataTypeSize, _, _ = SYMBOL_UPLOAD_INFO.unpack(info)
+    return SymbolTable(
+        parseSymbols(readBytes(connection, pyads.constants.ADSIGRP_SYM_UPLOAD, symbolSize)),
+        parseDataTypes(readBytes(connection, pyads.constants.ADSIGRP_SYM_DT_UPLOAD, dataTypeSize)),
+    )
+
+
+def dataTypeToJson(dataType):
+    return [
+        dataType.name, dataType.typeName, dataType.size, dataType.offset, dataType.dataTypeId,
+        [list(info) for info in dataType.arrayInfo],
+        [dataTypeToJson(subItem) for subItem in dataType.subItems],
+    ]
+
+
+def dataTypeFromJson(item):
+    name, typeName, size, offset, dataTypeId, arrayInfo, subItems = item
+    return DataTypeInfo(
+        name, typeName, size, offset, dataTypeId,
+        tuple(tuple(info) for info in arrayInfo),
+        tuple(dataTypeFromJson(subItem) for subItem in subItems),
+    )
+
+
+# Writes the tables to path as JSON together with key (see symbolTableKey)
+# The file is replaced atomically so a crash never leaves half a manifest
+def saveManifest(symbolTable, path, key):
+    manifest = {
+        "version": SYMBOL_MANIFEST_VERSION,
+        "key": key,
+        "symbols": [list(symbol) for symbol in symbolTable.symbols.values()],
+        "dataTypes": [dataTypeToJson(dataType) for dataType in symbolTable.dataTypes.values()],
+    }
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(path + ".tmp", path)
+
+
+# SymbolTable of the manifest at path, None if there is none, it can't be read
+# or it was saved for another key
+def loadManifest(path, key):
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != SYMBOL_MANIFEST_VERSION or manifest.get("key") != key:
+        return None
+    symbols = {symbol[0]: SymbolInfo(*symbol) for symbol in manifest["symbols"]}
+    dataTypes = {item[0]: dataTypeFromJson(item) for item in manifest["dataTypes"]}
+    return SymbolTable(symbols, dataTypes)
+
+
+# A variable by index group/offset with its ctypes type from the symbol table
+# read and write need no symbol handle and no type lookup
+class TypedAccessor:
+    __slots__ = ("indexGroup", "indexOffset", "dataType", "typeName")
+
+    def __init__(self, indexGroup, indexOffset, dataType, typeName):
+        self.indexGroup = indexGroup
+        self.indexOffset = indexOffset
+        self.dataType = dataType
+        self.typeName = typeName
+
+    def __repr__(self):
+        return f"TypedAccessor({self.indexGroup:#x}, {self.indexOffset:#x}, {self.typeName})"
+
+    # Python value of a ctypes value of dataType, structs and arrays are returned as they are
+    def value(self, data):
+        if isinstance(data, ctypes._SimpleCData):
+            return data.value
+        if isinstance(data, ctypes.Array) and self.dataType._type_ is ctypes.c_char:
+            return bytes(data).split(b"\0", 1)[0].decode(STRING_ENCODING)
+        return data
+
+    # ctypes value of dataType for a Python value
+    def encode(self, value):
+        if isinstance(value, self.dataType):
+            return value
+        if issubclass(self.dataType, ctypes.Array) and self.dataType._type_ is ctypes.c_char:
+            data = value.encode(STRING_ENCODING)[:ctypes.sizeof(self.dataType) - 1]
+            return self.dataType.from_buffer_copy(data.ljust(ctypes.sizeof(self.dataType), b"\0"))
+        return self.dataType(value)
+
+    def read(self, connection):
+        return self.value(connection.read(
+            self.indexGroup, self.indexOffset, self.dataType, return_ctypes=True))
+
+    def write(self, connection, value):
+        connection.write(self.indexGroup, self.indexOffset, self.encode(value), self.dataType)
+
+
+class SymbolTable:
+    def __init__(self, symbols, dataTypes):
+        self.symbols = symbols
+        self.dataTypes = dataTypes
+        # PLC names are not case sensitive
+        self.symbolsLower = {name.lower(): symbol for name, symbol in symbols.items()}
+        self.dataTypesLower = {name.lower(): dataType for name, dataType in dataTypes.items()}
+        self.types = {}
+
+    def dataType(self, typeName):
+        return self.dataTypesLower.get(typeName.strip().lower())
+
+    # ctypes type of a PLC type, structs are built with the offsets of the PLC
+    # Raises KeyError for a type that is not in the table
+    def ctypesType(self, typeName):
+        ctype = self.types.get(typeName)
+        if ctype is None:
+            ctype = self.buildType(typeName)
+            self.types[typeName] = ctype
+        return ctype
+
+    def buildType(self, typeName):
+        name = typeName.strip()
+        if name.upper() in BASE_TYPES:
+            return BASE_TYPES[name.upper()]
+        match = STRING_TYPE.fullmatch(name)
+        if match:
+            return ctypes.c_char * (int(match.group(1) or STRING_DEFAULT_LENGTH) + 1)
+        dims, elementTypeName = parseArrayType(name)
+        if dims is not None:
+            ctype = self.ctypesType(elementTypeName)
+            for _, elements in reversed(dims):
+                ctype = ctype * elements
+            return ctype
+
+        dataType = self.dataType(name)
+        if dataType is None:
+            raise KeyError(f"PLC type {typeName} not in the symbol table")
+        if dataType.subItems:
+            return self.buildStruct(dataType)
+        # Enums and aliases
+        if dataType.typeName and dataType.typeName.strip().lower() != name.lower():
+            return self.ctypesType(dataType.typeName)
+        if dataType.dataTypeId in ADS_DATA_TYPES:
+            return ADS_DATA_TYPES[dataType.dataTypeId]
+        return ctypes.c_ubyte * dataType.size
+
+    # Packed ctypes structure with explicit padding so every field is at its PLC offset
+    # Fields of unknown types (pointers, interfaces, ...) are kept as opaque bytes
+    def buildStruct(self, dataType):
+        fields = []
+        pos = 0
+        for subItem in sorted(dataType.subItems, key=lambda item: item.offset):
+            if subItem.offset < pos:
+                continue
+            if subItem.offset > pos:
+                fields.append((f"_pad{pos}", ctypes.c_ubyte * (subItem.offset - pos)))
+            try:
+                ctype = self.ctypesType(subItem.typeName)
+            except KeyError:
+                ctype = ctypes.c_ubyte * subItem.size
+            if ctypes.sizeof(ctype) != subItem.size:
+                ctype = ctypes.c_ubyte * subItem.size
+            fields.append((subItem.name, ctype))
+            pos = subItem.offset + subItem.size
+        if dataType.size > pos:
+            fields.append((f"_pad{pos}", ctypes.c_ubyte * (dataType.size - pos)))
+        return type(dataType.name, (ctypes.Structure,), {"_pack_": 1, "_fields_": fields})
+
+    # Fields of structType, a ctypes structure that mirrors the PLC type typeName,
+    # that the PLC doesn't have at the same offset with the same size
+    # Raises KeyError if the type isn't in the table
+    def layoutMismatches(self, typeName, structType):
+        dataType = self.dataType(typeName)
+        if dataType is None:
+            raise KeyError(f"PLC type {typeName} not in the symbol table")
+        plcFields = {subItem.name.lower(): subItem for subItem in dataType.subItems}
+        mismatches = []
+        for name, _ in structType._fields_:
+            field = getattr(structType, name)
+            subItem = plcFields.get(name.lower())
+            if subItem is None or (subItem.offset, subItem.size) != (field.offset, field.size):
+                mismatches.append(name)
+        return mismatches
+
+    # NumPy dtype of a PLC type, e.g. to map an array of structs read in one go
+    def numpyDtype(self, typeName):
+        import numpy as np
+        return np.dtype(self.ctypesType(typeName))
+
+    # TypedAccessor of a variable, e.g. "GVL.astAxes[6].stStatus.bDone"
+    # Raises KeyError if the variable isn't in the symbol table
+    def resolve(self, varName):
+        parts = VAR_NAME_PARTS.findall(varName)
+        symbol = None
+        for i in range(len(parts), 0, -1):
+            if any(part.startswith("[") for part in parts[:i]):
+                continue
+            symbol = self.symbolsLower.get(".".join(parts[:i]).lower())
+            if symbol is not None:
+                parts = parts[i:]
+                break
+        if symbol is None:
+            raise KeyError(f"{varName} not in the symbol table")
+
+        typeName = symbol.typeName
+        offset = symbol.indexOffset
+        for part in parts:
+            if part.startswith("["):
+                dims, elementTypeName = parseArrayType(typeName)
+                indices = [int(index) for index in part[1:-1].split(",")]
+                if dims is None or len(indices) != len(dims):
+                    raise KeyError(f"{varName}: {typeName} can't be indexed with {part}")
+                linearIndex = 0
+                for index, (lowerBound, elements) in zip(indices, dims):
+                    if not lowerBound <= index < lowerBound + elements:
+                        raise KeyError(f"{varName}: index {index} out of range")
+                    linearIndex = linearIndex * elements + index - lowerBound
+                offset += linearIndex * ctypes.sizeof(self.ctypesType(elementTypeName))
+                typeName = elementTypeName
+            else:
+                dataType = self.dataType(typeName)
+                # Aliases of structs
+                while dataType is not None and not dataType.subItems and dataType.typeName \
+                        and dataType.typeName.strip().lower() != dataType.name.lower():
+                    dataType = self.dataType(dataType.typeName)
+                subItem = None
+                if dataType is not None:
+                    subItem = next(
+                        (item for item in dataType.subItems if item.name.lower() == part.lower()), None
+                    )
+                if subItem is None:
+                    raise KeyError(f"{varName}: {typeName} has no member {part}")
+                offset += subItem.offset
+                typeName = subItem.typeName
+        return TypedAccessor(symbol.indexGroup, offset, self.ctypesType(typeName), typeName)
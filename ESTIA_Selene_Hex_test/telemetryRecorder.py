@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+
+"""
+This file contains a recorder that samples status variables of a set of axes
+in the background and streams them to memory-mapped column files
+
+Every sample is one ADS sum read of stStatus and stInputs of all the axes, so
+the number of axes doesn't change the number of round trips. The raw responses
+are copied into preallocated blocks and a writer thread scatters full blocks
+into one file per column. A recording is opened again with openTelemetry.
+The structs are read by index group/offset with their layout from the symbol
+table of the plc, so recording needs the symbol table. Every sample also reads
+the symbol version, recording stops if it changes (online change).
+"""
+import os
+import json
+import time
+import ctypes
+import queue
+import threading
+import numpy as np
+import pyads
+
+# Variables recorded for every axis when no list is given
+TELEMETRY_VARIABLES = (
+    "stStatus.fActPosition",
+    "stStatus.fActVelocity",
+    "stStatus.bError",
+    "stStatus.nErrorID",
+    "stInputs.bLimitFwd",
+    "stInputs.bLimitBwd",
+)
+# Structs of an axis that can be recorded
+TELEMETRY_STRUCTS = ("stStatus", "stInputs")
+TELEMETRY_SAMPLE_INTERVAL = 0.001  # s
+# Samples per block handed from the sampling thread to the writer thread
+TELEMETRY_BLOCK_SIZE = 1000
+# Blocks that can be waiting for the writer before sampling has to wait for it
+TELEMETRY_BLOCKS = 8
+# Column files grow by this many samples at a time
+TELEMETRY_FILE_GROWTH = 1 << 20
+TELEMETRY_MANIFEST = "telemetry.json"
+
+
+# One column of a recording in its own memory-mapped file
+class TelemetryColumn:
+    def __init__(self, name, dtype, directory):
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        self.fileName = f"{name}.dat"
+        self.path = os.path.join(directory, self.fileName)
+        self.capacity = 0
+        self.memmap = None
+        open(self.path, "wb").close()
+
+    # Makes the file hold at least capacity samples
+    def reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        if self.memmap is not None:
+            self.memmap.flush()
+            self.memmap = None
+        with open(self.path, "r+b") as f:
+            f.truncate(capacity * self.dtype.itemsize)
+        self.memmap = np.memmap(self.path, self.dtype, "r+", shape=(capacity,))
+        self.capacity = capacity
+
+    # Flushes the samples and cuts the file down to count samples
+    def close(self, count):
+        if self.memmap is not None:
+            self.memmap.flush()
+            self.memmap = None
+        with open(self.path, "r+b") as f:
+            f.truncate(count * self.dtype.itemsize)
+        self.capacity = count
+
+    def describe(self):
+        return {"name": self.name, "dtype": self.dtype.str, "file": self.fileName}
+
+
+# Preallocated raw sum read responses and their timestamps
+class TelemetryBlock:
+    def __init__(self, responseDtype, size):
+        self.records = np.zeros(size, responseDtype)
+        self.timestamps = np.zeros(size, np.float64)
+        self.address = self.records.ctypes.data
+        self.count = 0
+
+
+# Records variables of axes to memory-mapped column files in directory
+# The variables are paths in stStatus or stInputs, see TELEMETRY_VARIABLES.
+# Columns are named e.g. "axis6.fActPosition" plus the shared "timestamp".
+# Sampling runs in its own thread and only ever waits for the PLC or, if the
+# disk can't keep up, for a free block. Samples that could not be taken on
+# time or failed are counted in missedSamples, samples with an error code of
+# one of the reads in errorSamples
+# Raises KeyError if the plc has no symbol table or a variable can't be recorded
+class TelemetryRecorder:
+    def __init__(
+        self,
+        plcConnection,
+        axes,
+        directory,
+        variables=TELEMETRY_VARIABLES,
+        sampleInterval=TELEMETRY_SAMPLE_INTERVAL,
+        blockSize=TELEMETRY_BLOCK_SIZE,
+        blocks=TELEMETRY_BLOCKS,
+    ):
+        self.plc = plcConnection
+        self.axes = list(axes)
+        self.directory = directory
+        self.sampleInterval = sampleInterval
+        self.blockSize = blockSize
+        self.blocks = blocks
+
+        if self.plc.symbolTable is None:
+            raise KeyError("Recording telemetry needs the symbol table of the plc")
+        # TypedAccessor of every struct, {(axisNum, structName): accessor}
+        self.accessors = {}
+        for axis in self.axes:
+            for structName in TELEMETRY_STRUCTS:
+                accessor = self.plc.getAccessor(axis.varName(structName))
+                if accessor is None:
+                    raise KeyError(f"{axis.varName(structName)} not in the symbol table")
+                self.accessors[(axis.axisNum, structName)] = accessor
+
+        self.variables = []
+        for plcVarPath in variables:
+            structName, _, varName = plcVarPath.partition(".")
+            if structName not in TELEMETRY_STRUCTS or any(
+                varName not in np.dtype(self.accessors[(axis.axisNum, structName)].dataType).fields
+                for axis in self.axes
+            ):
+                raise KeyError(f"{plcVarPath} can't be recorded")
+            self.variables.append((structName, varName))
+        self.structNames = [
+            structName for structName in TELEMETRY_STRUCTS
+            if any(structName == recorded for recorded, _ in self.variables)
+        ]
+
+        # The sum read response is the error codes followed by the structs and
+        # the symbol version
+        requestCount = len(self.axes) * len(self.structNames) + 1
+        fields = [("errors", "<u4", (requestCount,))]
+        for axis in self.axes:
+            for structName in self.structNames:
+                fields.append(
+                    (f"{axis.axisNum}.{structName}", np.dtype(self.accessors[(axis.axisNum, structName)].dataType))
+                )
+        fields.append(("symbolVersion", "u1"))
+        self.responseDtype = np.dtype(fields)
+
+        self.sumRequests = None
+        self.columns = []
+        self.sampleCount = 0
+        self.missedSamples = 0
+        self.errorSamples = 0
+        self.thread = None
+        self.writerThread = None
+        self.stopEvent = threading.Event()
+
+    # Builds the sum read request once
+    def prepareRequest(self):
+        requests = [
+            (accessor.indexGroup, accessor.indexOffset, ctypes.sizeof(accessor.dataType))
+            for accessor in (
+                self.accessors[(axis.axisNum, structName)]
+                for axis in self.axes
+                for structName in self.structNames
+            )
+        ] + [(pyads.constants.ADSIGRP_SYM_VERSION, 0, 1)]
+        self.sumRequests = (pyads.structs.SAdsSumRequest * len(requests))()
+        for i, (indexGroup, indexOffset, size) in enumerate(requests):
+            self.sumRequests[i].iGroup = indexGroup
+            self.sumRequests[i].iOffset = indexOffset
+            self.sumRequests[i].size = size
+
+    def start(self):
+        if self.thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.prepareRequest()
+
+        self.columns = [TelemetryColumn("timestamp", np.float64, self.directory)]
+        self.columnSources = [None]
+        for axis in self.axes:
+            for structName, varName in self.variables:
+                dtype = np.dtype(self.accessors[(axis.axisNum, structName)].dataType).fields[varName][0]
+                self.columns.append(TelemetryColumn(f"axis{axis.axisNum}.{varName}", dtype, self.directory))
+                self.columnSources.append((f"{axis.axisNum}.{structName}", varName))
+        for column in self.columns:
+            column.reserve(TELEMETRY_FILE_GROWTH)
+        self.sampleCount = 0
+        self.missedSamples = 0
+        self.errorSamples = 0
+        self.writeManifest()
+
+        self.freeBlocks = queue.Queue()
+        for _ in range(self.blocks):
+            self.freeBlocks.put(TelemetryBlock(self.responseDtype, self.blockSize))
+        self.filledBlocks = queue.Queue()
+        self.stopEvent.clear()
+        self.writerThread = threading.Thread(target=self.writeBlocks, daemon=True)
+        self.writerThread.start()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        print(f"Recording telemetry of {len(self.axes)} axes to {self.directory}")
+
+    # Stops sampling and waits until every sample is on disk
+    def stop(self):
+        if self.thread is None:
+            return
+        self.stopEvent.set()
+        self.thread.join()
+        self.writerThread.join()
+        self.thread = None
+        self.writerThread = None
+        for column in self.columns:
+            column.close(self.sampleCount)
+        self.writeManifest()
+        print(
+            f"Telemetry recorded: {self.sampleCount} samples, "
+            f"{self.missedSamples} missed, {self.errorSamples} with read errors"
+        )
+
+    # Sampling thread, takes one sum read every sampleInterval
+    def sample(self):
+        connection = self.plc.connection
+        responseSize = self.responseDtype.itemsize
+        requestCount = len(self.sumRequests)
+        symbolVersion = self.plc.symbolVersion
+        interval = self.sampleInterval
+        block = self.freeBlocks.get()
+        nextSample = time.perf_counter()
+        while not self.stopEvent.is_set():
+            now = time.perf_counter()
+            if now < nextSample:
+                time.sleep(nextSample - now)
+                now = time.perf_counter()
+            elif now - nextSample >= interval:
+                missed = int((now - nextSample) / interval)
+                self.missedSamples += missed
+                nextSample += missed * interval
+            nextSample += interval
+
+            try:
+                response = connection.read_write(
+                    pyads.constants.ADSIGRP_SUMUP_READ,
+                    requestCount,
+                    None,
+                    self.sumRequests,
+                    None,
+                    return_ctypes=True,
+                )
+            except pyads.ADSError:
+                self.missedSamples += 1
+                continue
+            if response[responseSize - 1] != symbolVersion:
+                print(f"Telemetry: symbol version changed to {response[responseSize - 1]}, recording stopped")
+                break
+            ctypes.memmove(block.address + block.count * responseSize, response, responseSize)
+            block.timestamps[block.count] = time.time()
+            block.count += 1
+            if block.count == self.blockSize:
+                self.filledBlocks.put(block)
+                block = self.freeBlocks.get()
+
+        if block.count:
+            self.filledBlocks.put(block)
+        self.filledBlocks.put(None)
+
+    # Writer thread, scatters full blocks into the column files
+    def writeBlocks(self):
+        while True:
+            block = self.filledBlocks.get()
+            if block is None:
+                return
+            self.writeBlock(block)
+            block.count = 0
+            self.freeBlocks.put(block)
+
+    def writeBlock(self, block):
+        count = block.count
+        start = self.sampleCount
+        if start + count > self.columns[0].capacity:
+            for column in self.columns:
+                column.reserve(column.capacity + TELEMETRY_FILE_GROWTH)
+        records = block.records[:count]
+        for column, source in zip(self.columns, self.columnSources):
+            if source is None:
+                column.memmap[start:start + count] = block.timestamps[:count]
+            else:
+                structField, varName = source
+                column.memmap[start:start + count] = records[structField][varName]
+        self.errorSamples += int(np.count_nonzero(records["errors"].any(axis=1)))
+        self.sampleCount = start + count
+        self.writeManifest()
+
+    # The manifest is replaced atomically so it never claims samples that aren't written
+    def writeManifest(self):
+        manifest = {
+            "sampleInterval": self.sampleInterval,
+            "count": self.sampleCount,
+            "missedSamples": self.missedSamples,
+            "errorSamples": self.errorSamples,
+            "columns": [column.describe() for column in self.columns],
+        }
+        path = os.path.join(self.directory, TELEMETRY_MANIFEST)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(path + ".tmp", path)
+
+
+# Opens a recording read only, returns {columnName: numpy.memmap}
+def openTelemetry(directory):
+    with open(os.path.join(directory, TELEMETRY_MANIFEST)) as f:
+        manifest = json.load(f)
+    count = manifest["count"]
+    columns = {}
+    for column in manifest["columns"]:
+        dtype = np.dtype(column["dtype"])
+        if count == 0:
+            columns[column["name"]] = np.zeros(0, dtype)
+        else:
+            columns[column["name"]] = np.memmap(
+                os.path.join(directory, column["file"]), dtype, "r", shape=(count,)
+            )
+    return columns